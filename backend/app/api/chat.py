@@ -1,16 +1,29 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Response, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse
 from datetime import datetime
 from typing import Optional
 import shutil
 import os
 import json
+import uuid
+import time
+import asyncio
+import base64
 from pymongo import MongoClient, DESCENDING
 from bson import ObjectId
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
 # Import your LLM & voice pipeline
-from app.llm.my_voice_api import analyze, speech_to_text, text_to_speech, save_and_convert_audio
+from app.llm.my_voice_api import analyze_async, build_prompt, cache_reply, cached_reply, fallback_reply, speech_to_text, save_and_convert_audio
+from app.llm.conversation import conversation_store
+from app.llm.response_cache import response_cache
+from app.llm.gateway import LlmError, LlmOverloaded, llm_gateway
+from app.llm.prompts import prompt_builder
+from app.llm.tts import DONE, FAILED, TtsSaturated, TtsUnavailable, tts_service
+from app.core.config import settings
+from app.core.write_buffer import WriteBehindBuffer
 
 load_dotenv()
 
@@ -24,90 +37,502 @@ db = client[os.getenv("MONGODB_DB")]
 UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+audio_cleanup_task = None
+
+# Reply analytics (latency, token usage) are written behind the response, in batches
+chat_metrics = WriteBehindBuffer(
+    "chat_metrics", lambda: db.chat_metrics,
+    max_batch=settings.CHAT_WRITE_BATCH,
+    max_delay=settings.CHAT_WRITE_FLUSH_MS / 1000,
+    max_queue=settings.CHAT_WRITE_MAX_QUEUE,
+)
+
+def load_conversation(session_id: str, limit: int) -> list:
+    """Last turns of a session from the chats collection, oldest first"""
+    docs = db.chats.find({"session_id": session_id, "response_text": {"$ne": None}, "reply_error": None},
+                         {"text": 1, "response_text": 1}).sort("created_at", DESCENDING).limit(limit)
+    return [(doc.get("text") or "", doc.get("response_text") or "") for doc in reversed(list(docs))]
+
+# Sessions evicted from memory (or from before a restart) are rebuilt from the stored chats
+if settings.CHAT_MEMORY_PERSIST:
+    conversation_store.loader = load_conversation
+
 class ChatMessage(BaseModel):
     sender: str
     timestamp: str
+    session_id: Optional[str] = None
     text: Optional[str] = None
     file: Optional[dict] = None
     audio: Optional[dict] = None
     response_text: Optional[str] = None
     response_audio: Optional[str] = None
 
+def sse_event(event: str, data) -> str:
+    """One server-sent event frame"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def pending_audio_url(job_id: str) -> str:
+    """Stable URL of a reply's audio; redirects to the cached file, synthesizing it again if it was evicted"""
+    return f"/api/chat/audio/{job_id}"
+
+def start_response_audio(job_id: str, text: str) -> Optional[str]:
+    """Queue the speech of a reply; returns its audio URL, or None when there will be no audio"""
+    try:
+        tts_service.submit(text, job_id=job_id)
+    except TtsSaturated as e:
+        print(f"⚠️ TTS not queued for job {job_id}, it runs when the audio is requested: {e}")
+    except TtsUnavailable as e:
+        print(f"❌ TTS unavailable for job {job_id}: {e}")
+        return None
+    return pending_audio_url(job_id)
+
+async def store_message(chat_message: dict) -> dict:
+    """Insert a chat message; returns it as the API sends it, without reading it back"""
+    chat_message["_id"] = ObjectId()
+    # Written before the response so history polls with ``since`` see it, in any worker
+    chat_message["created_at"] = datetime.now()
+    await run_in_threadpool(db.chats.insert_one, chat_message)
+    return {**chat_message, "_id": str(chat_message["_id"])}
+
+def record_reply_metrics(chat_message: dict, seconds: float, usage: dict, streamed: bool):
+    """Queue the analytics of a reply; the response does not wait for them to be written"""
+    chat_metrics.add({
+        "message_id": str(chat_message["_id"]),
+        "sender": chat_message["sender"],
+        "session_id": chat_message["session_id"],
+        "streamed": streamed,
+        "reply_seconds": round(seconds, 3),
+        "prompt_tokens": usage.get("prompt_tokens"),
+        "completion_tokens": usage.get("completion_tokens"),
+        "created_at": chat_message["created_at"],
+    })
+
+def referenced_audio_urls(urls) -> set:
+    """The given /responses/ URLs that chat messages still point to (audio stored before the cache)"""
+    docs = db.chats.find({"response_audio": {"$in": list(urls)}}, {"response_audio": 1})
+    return {doc["response_audio"] for doc in docs}
+
+async def clean_audio_directory():
+    """Periodically remove orphaned files from responses/"""
+    while True:
+        try:
+            await run_in_threadpool(tts_service.audio_cache.cleanup, referenced_audio_urls,
+                                    settings.TTS_ORPHAN_GRACE_SECONDS)
+        except Exception as e:
+            print(f"⚠️ Audio cleanup failed: {e}")
+        await asyncio.sleep(settings.TTS_CLEANUP_INTERVAL_SECONDS)
+
+def prepare_user_input(text, file, audio) -> tuple:
+    """Save the attachments of a chat request; returns (user text, file data, audio data)"""
+    file_data = None
+    audio_data = None
+    user_text = text
+
+    # Process file upload
+    if file:
+        filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{file.filename}"
+        file_path = os.path.join(UPLOAD_DIR, filename)
+        with open(file_path, "wb") as buffer:
+            shutil.copyfileobj(file.file, buffer)
+        file_data = {
+            "type": file.content_type,
+            "name": file.filename,
+            "path": f"/uploads/{filename}"
+        }
+
+    # Process audio upload
+    if audio:
+        print(f"🎙 Saving and converting audio: {audio.filename}")
+        try:
+            audio_data, wav_path = save_and_convert_audio(audio)
+            print("🎙 Transcribing audio...")
+            user_text = speech_to_text(wav_path)
+            
+            # Check if transcription contains error message
+            if not user_text or "couldn't process" in user_text or "couldn't understand" in user_text:
+                print("❌ Audio processing failed, using fallback message")
+                user_text = "I sent a voice message but there was an issue processing it. Could you help me with general health advice?"
+                
+        except Exception as e:
+            print(f"❌ Audio processing error: {str(e)}")
+            user_text = "I tried to send a voice message but encountered an error. Could you help me with general health advice?"
+            audio_data = None
+
+    return user_text, file_data, audio_data
+
 @router.post("/")
-def chat(
+async def chat(
     sender: str = Form(...),
     timestamp: str = Form(...),
     text: Optional[str] = Form(None),
+    session_id: Optional[str] = Form(None),
     file: Optional[UploadFile] = File(None),
     audio: Optional[UploadFile] = File(None)
 ):
     try:
         print("🔹 Received chat request")
-        file_data = None
-        audio_data = None
-        user_text = text
-
-        # Process file upload
-        if file:
-            filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{file.filename}"
-            file_path = os.path.join(UPLOAD_DIR, filename)
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            file_data = {
-                "type": file.content_type,
-                "name": file.filename,
-                "path": f"/uploads/{filename}"
-            }
-
-        # Process audio upload
-        if audio:
-            print(f"🎙 Saving and converting audio: {audio.filename}")
-            try:
-                audio_data, wav_path = save_and_convert_audio(audio)
-                print("🎙 Transcribing audio...")
-                user_text = speech_to_text(wav_path)
-                
-                # Check if transcription contains error message
-                if not user_text or "couldn't process" in user_text or "couldn't understand" in user_text:
-                    print("❌ Audio processing failed, using fallback message")
-                    user_text = "I sent a voice message but there was an issue processing it. Could you help me with general health advice?"
-                    
-            except Exception as e:
-                print(f"❌ Audio processing error: {str(e)}")
-                user_text = "I tried to send a voice message but encountered an error. Could you help me with general health advice?"
-                audio_data = None
+        # Shed before anything is saved, like /stream
+        llm_gateway.check_capacity()
+        session_id = session_id or sender
+        user_text, file_data, audio_data = await run_in_threadpool(prepare_user_input, text, file, audio)
 
         print(f"Analyzing input: {user_text}")
-        response_text = analyze(user_text)
-        _, response_audio_url = text_to_speech(response_text)
+        usage = {}
+        reply_error = None
+        started = time.monotonic()
+        try:
+            response_text = await analyze_async(user_text, session_id, usage)
+        except LlmOverloaded:
+            raise
+        except LlmError as e:
+            # Shown to the user, but kept out of the conversation context
+            response_text, reply_error = fallback_reply(e), str(e)
+        reply_seconds = time.monotonic() - started
+        audio_job = uuid.uuid4().hex
 
         chat_message = {
             "sender": sender,
+            "session_id": session_id,
             "timestamp": timestamp,
             "text": user_text,
             "file": file_data,
             "audio": audio_data,
             "response_text": response_text,
-            "response_audio": response_audio_url,
-            "created_at": datetime.now()
+            "response_audio": start_response_audio(audio_job, response_text),
+            "reply_error": reply_error
         }
 
-        result = db.chats.insert_one(chat_message)
-        stored_message = db.chats.find_one({"_id": result.inserted_id})
-        stored_message["_id"] = str(stored_message["_id"])
-
+        stored_message = await store_message(chat_message)
+        record_reply_metrics(chat_message, reply_seconds, usage, streamed=False)
         return stored_message
 
+    except HTTPException:
+        raise
+    except LlmOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
     except Exception as e:
         print(f"Error in chat endpoint: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Streaming chat
+async def stream_reply(sender, session_id, timestamp, user_text, file_data, audio_data, state: dict):
+    """Yield (event, data) while the LLM generates the reply; the message is stored once it is complete.
+
+    The speech of the reply is queued once the message is stored; ``state``
+    receives the message id and the TTS job id.
+    """
+    query_text, prompt = await run_in_threadpool(build_prompt, user_text, session_id)
+    cached = cached_reply(user_text)
+    yield "start", {"text": user_text, "cached": cached is not None}
+
+    parts = []
+    usage = {}
+    reply_error = None
+    started = time.monotonic()
+    try:
+        if cached is not None:
+            parts.append(cached)
+            yield "token", {"text": cached}
+        else:
+            # Closing this generator (client went away) closes the upstream stream
+            async for delta in llm_gateway.stream(prompt.messages, temperature=0.6, max_tokens=prompt.max_tokens,
+                                                  top_p=1, usage=usage):
+                parts.append(delta)
+                yield "token", {"text": delta}
+            prompt_builder.record(prompt, usage, time.monotonic() - started)
+            cache_reply(user_text, "".join(parts))
+    except Exception as e:
+        print(f"❌ Streaming error: {e}")
+        reply_error = str(e)
+        if not parts:
+            # Same reply as the non-streaming endpoint when the LLM is unavailable
+            fallback = fallback_reply(e)
+            parts.append(fallback)
+            yield "token", {"text": fallback}
+        yield "error", {"detail": str(e)}
+
+    response_text = "".join(parts)
+    if reply_error is None:
+        # A fallback or cut-off reply must not go back to the model as an assistant turn
+        conversation_store.append(session_id, query_text, response_text)
+    audio_job = uuid.uuid4().hex
+    chat_message = {
+        "sender": sender,
+        "session_id": session_id,
+        "timestamp": timestamp,
+        "text": user_text,
+        "file": file_data,
+        "audio": audio_data,
+        "response_text": response_text,
+        "response_audio": start_response_audio(audio_job, response_text),
+        "reply_error": reply_error
+    }
+    stored_message = await store_message(chat_message)
+    record_reply_metrics(chat_message, time.monotonic() - started, usage, streamed=True)
+    state.update({"message_id": chat_message["_id"], "audio_job": audio_job})
+    yield "done", stored_message
+
+@router.post("/stream")
+async def chat_stream(
+    sender: str = Form(...),
+    timestamp: str = Form(...),
+    text: Optional[str] = Form(None),
+    session_id: Optional[str] = Form(None),
+    file: Optional[UploadFile] = File(None),
+    audio: Optional[UploadFile] = File(None)
+):
+    """Chat reply as server-sent events: "start", one "token" per delta, then "done" with the stored message.
+
+    The audio of the reply is synthesized after the stream completes; the
+    message's response_audio URL resolves once it is ready.
+    """
+    print("🔹 Received streaming chat request")
+    user_text, file_data, audio_data = await run_in_threadpool(prepare_user_input, text, file, audio)
+    if not user_text or not user_text.strip():
+        raise HTTPException(status_code=400, detail="Message text or audio is required")
+    try:
+        llm_gateway.check_capacity()
+    except LlmOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+    async def events():
+        async for event, data in stream_reply(sender, session_id or sender, timestamp, user_text,
+                                              file_data, audio_data, {}):
+            yield sse_event(event, data)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.websocket("/ws")
+async def chat_websocket(websocket: WebSocket):
+    """Streaming chat over a WebSocket.
+
+    Each client message is JSON {"sender", "session_id", "timestamp", "text"}; the server
+    answers with {"type": "start" | "token" | "error" | "done", ...} frames
+    and, once the speech is synthesized, {"type": "audio", "response_audio"}.
+    """
+    await websocket.accept()
+    # Audio frames are sent by their own tasks so the next message is read at once
+    audio_tasks = set()
+    try:
+        while True:
+            request = await websocket.receive_json()
+            user_text = (request.get("text") or "").strip()
+            if not user_text:
+                await websocket.send_text(json.dumps({"type": "error", "detail": "Message text is required"}))
+                continue
+
+            state = {}
+            sender = request.get("sender", "user")
+            try:
+                async for event, data in stream_reply(sender, request.get("session_id") or sender,
+                                                      request.get("timestamp", datetime.now().isoformat()),
+                                                      user_text, None, None, state):
+                    await websocket.send_text(json.dumps({"type": event, **data}, default=str))
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                print(f"❌ WebSocket chat error: {e}")
+                await websocket.send_text(json.dumps({"type": "error", "detail": str(e)}))
+
+            if state.get("audio_job"):
+                task = asyncio.create_task(send_reply_audio(websocket, state["message_id"], state["audio_job"]))
+                audio_tasks.add(task)
+                task.add_done_callback(audio_tasks.discard)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in audio_tasks:
+            task.cancel()
+
+async def send_reply_audio(websocket: WebSocket, message_id, audio_job: str):
+    """Send the {"type": "audio"} frame of a reply once its speech is synthesized"""
+    job = await tts_service.wait_async(audio_job)
+    try:
+        await websocket.send_text(json.dumps({"type": "audio", "message_id": str(message_id),
+                                              "response_audio": job["url"] if job else None}))
+    except Exception as e:
+        # The client went away meanwhile
+        print(f"⚠️ Could not send reply audio {audio_job}: {e}")
+
+# Largest page the history returns
+MAX_HISTORY_PAGE = 200
+
+def encode_chat_cursor(message) -> str:
+    """Opaque keyset cursor at this message in (created_at, _id) order"""
+    created_at = message.get("created_at")
+    raw = json.dumps([created_at.isoformat() if isinstance(created_at, datetime) else created_at,
+                      str(message["_id"])])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_chat_cursor(cursor: str) -> tuple:
+    """(created_at, _id) of a cursor; a plain ISO timestamp is accepted too. Raises ValueError."""
+    try:
+        return datetime.fromisoformat(cursor), None
+    except ValueError:
+        pass
+    try:
+        created_at, message_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        created_at = datetime.fromisoformat(created_at)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return created_at, ObjectId(message_id) if ObjectId.is_valid(message_id) else message_id
+
+def keyset_query(cursor: str, operator: str) -> dict:
+    """Messages strictly before ("$lt") or after ("$gt") a cursor in (created_at, _id) order"""
+    created_at, message_id = decode_chat_cursor(cursor)
+    if message_id is None:
+        return {"created_at": {operator: created_at}}
+    return {"$or": [
+        {"created_at": {operator: created_at}},
+        {"created_at": created_at, "_id": {operator: message_id}},
+    ]}
+
+def list_messages(query: dict, limit: int, newest_first: bool) -> list:
+    docs = db.chats.find(query)
+    if isinstance(docs, list):
+        # The mock DB returns a plain list
+        return sorted(docs, key=lambda d: (d.get("created_at"), str(d["_id"])), reverse=newest_first)[:limit]
+    direction = DESCENDING if newest_first else 1
+    return list(docs.sort([("created_at", direction), ("_id", direction)]).limit(limit))
+
 @router.get("/")
-def get_chat_messages():
+def get_chat_messages(
+    response: Response,
+    sender: Optional[str] = None,
+    session_id: Optional[str] = None,
+    limit: int = 100,
+    before: Optional[str] = None,
+    since: Optional[str] = None
+):
+    """Chat history of a sender and/or session, one page at a time.
+
+    Without ``since`` the newest messages come first; pass the X-Next-Cursor
+    header as ``before`` to page back. With ``since`` (an ISO timestamp or
+    the X-Since-Cursor header of an earlier response) only messages created
+    after it are returned, oldest first, so clients can poll incrementally.
+    """
     try:
-        messages = list(db.chats.find().sort("created_at", DESCENDING).limit(100))
+        limit = max(1, min(limit, MAX_HISTORY_PAGE))
+        conditions = []
+        if sender:
+            conditions.append({"sender": sender})
+        if session_id:
+            conditions.append({"session_id": session_id})
+        try:
+            if before:
+                conditions.append(keyset_query(before, "$lt"))
+            if since:
+                conditions.append(keyset_query(since, "$gt"))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        # Conditions may constrain the same field (before and since timestamps): never merge them
+        query = {"$and": conditions} if len(conditions) > 1 else (conditions[0] if conditions else {})
+
+        # One extra message tells whether there is another page
+        messages = list_messages(query, limit + 1, newest_first=not since)
+        more = len(messages) > limit
+        messages = messages[:limit]
+        if more and not since:
+            response.headers["X-Next-Cursor"] = encode_chat_cursor(messages[-1])
+        if messages:
+            newest = messages[-1] if since else messages[0]
+            response.headers["X-Since-Cursor"] = encode_chat_cursor(newest)
+        elif since:
+            response.headers["X-Since-Cursor"] = since
         for message in messages:
             message["_id"] = str(message["_id"])
         return messages
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/audio/{job_id}")
+async def get_response_audio(job_id: str, wait: bool = True):
+    """Audio of a reply: redirects to the cached file once synthesized.
+
+    While the speech is still being synthesized the request waits up to
+    TTS_WAIT_SECONDS (so it can be used directly as an <audio> source), then
+    answers 202 {"status": "pending"} with Retry-After. ``wait=false``
+    returns the status at once.
+    """
+    timeout = settings.TTS_WAIT_SECONDS if wait else 0
+    job = tts_service.status(job_id)
+    if job is not None and job["status"] == DONE and not os.path.exists(
+            os.path.join(tts_service.audio_cache.directory, os.path.basename(job["url"]))):
+        job = None  # File evicted from the audio cache since
+    if job is not None:
+        job = await tts_service.wait_async(job_id, timeout)
+    else:
+        # Job forgotten (older message, restart) or its file evicted: the audio cache
+        # answers at once when the same text is still cached, otherwise it is synthesized again
+        message = await run_in_threadpool(db.chats.find_one, {"response_audio": pending_audio_url(job_id)})
+        if not message or not message.get("response_text"):
+            raise HTTPException(status_code=404, detail="Audio not found")
+        try:
+            tts_service.submit(message["response_text"], job_id=job_id)
+        except (TtsSaturated, TtsUnavailable) as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+        job = await tts_service.wait_async(job_id, timeout)
+    if job is None or job["status"] == FAILED:
+        raise HTTPException(status_code=500, detail=f"Speech synthesis failed: {job['error'] if job else 'not queued'}")
+    if job["status"] == DONE:
+        return RedirectResponse(job["url"])
+    return JSONResponse({"status": job["status"]}, status_code=202, headers={"Retry-After": "1"})
+
+@router.get("/tts/stats")
+def get_tts_stats():
+    """Queue and worker counters of the text-to-speech service, audio cache hits and disk usage"""
+    return {**tts_service.stats(), "audio_cache": tts_service.audio_cache.stats()}
+
+@router.get("/llm/stats")
+def get_llm_stats():
+    """Concurrency, retry and latency counters of the LLM gateway"""
+    return llm_gateway.stats()
+
+@router.get("/cache/stats")
+def get_cache_stats():
+    """Hit rate and size of the chat response cache"""
+    return response_cache.stats()
+
+@router.get("/writes/stats")
+def get_write_stats():
+    """Queued and written records, batches and the longest flush delay of the reply analytics buffer"""
+    return chat_metrics.stats()
+
+@router.get("/prompt/stats")
+def get_prompt_stats():
+    """Token usage per intent and the reply tokens saved by adaptive max_tokens"""
+    return prompt_builder.stats()
+
+@router.get("/memory/stats")
+def get_memory_stats():
+    """Sessions and turns held by the conversation memory"""
+    return conversation_store.stats()
+
+def ensure_chat_indexes():
+    # History pages per sender / session (and the conversation memory reload) are keyset scans
+    db.chats.create_index([("sender", 1), ("created_at", -1), ("_id", -1)])
+    db.chats.create_index([("session_id", 1), ("created_at", -1), ("_id", -1)])
+    # Audio requests of older messages look the message up by its audio URL
+    db.chats.create_index("response_audio")
+
+@router.on_event("startup")
+async def start_chat_services():
+    global audio_cleanup_task
+    try:
+        await run_in_threadpool(ensure_chat_indexes)
+    except Exception as e:
+        print(f"⚠️ Could not create chat indexes: {e}")
+    audio_cleanup_task = asyncio.create_task(clean_audio_directory())
+    chat_metrics.start()
+
+@router.on_event("shutdown")
+async def shutdown_chat_services():
+    if audio_cleanup_task is not None:
+        audio_cleanup_task.cancel()
+    # Write the analytics still buffered before the process exits
+    await chat_metrics.stop()
+    llm_gateway.close()
+    tts_service.shutdown()
@@ -1,10 +1,10 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-import google.generativeai as genai
 import json
-import os
 from typing import List, Optional
 import logging
+from app.llm.config import GEMINI_API_KEY
+from app.llm.gateway import LlmError, llm_gateway
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -12,14 +12,12 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Configure Gemini API
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-    model = genai.GenerativeModel('gemini-1.5-flash')
-else:
+# Gemini is called through the shared LLM gateway
+if not GEMINI_API_KEY:
     logger.warning("GEMINI_API_KEY not found in environment variables")
-    model = None
+
+# Hospital lookups must answer quickly; past this the mock list is returned
+EMERGENCY_LLM_DEADLINE_SECONDS = 15
 
 class EmergencyRequest(BaseModel):
     location: str
@@ -92,7 +90,7 @@ async def find_nearest_hospitals(request: EmergencyRequest):
     """Find nearest hospitals using Gemini AI based on location"""
     
     try:
-        if not model:
+        if not GEMINI_API_KEY:
             # Fallback: Return mock data if Gemini is not available
             logger.warning("Gemini API not available, returning mock data")
             return get_mock_hospitals(request.location)
@@ -145,7 +143,12 @@ async def find_nearest_hospitals(request: EmergencyRequest):
         """
         
         # Generate response using Gemini
-        response = model.generate_content(prompt)
+        try:
+            response = await llm_gateway.gemini(prompt, deadline=EMERGENCY_LLM_DEADLINE_SECONDS)
+        except LlmError as e:
+            # Includes load shedding and deadline expiry in the gateway
+            logger.error(f"Gemini request failed: {e}")
+            return get_mock_hospitals(request.location)
         response_text = response.text
         
         # Clean the response text
@@ -324,7 +327,7 @@ async def send_emergency_alert(request: EmergencyRequest):
 @router.get("/health")
 async def emergency_health_check():
     """Health check for emergency service"""
-    gemini_status = "available" if model else "unavailable"
+    gemini_status = "available" if GEMINI_API_KEY else "unavailable"
     
     return {
         "status": "healthy",
@@ -1,37 +1,23 @@
-from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Form
+from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Form, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
-from pymongo import MongoClient
 from bson import ObjectId
-import os
-import shutil
-from datetime import datetime
 import json
-from PIL import Image
-import re
+import asyncio
+from app.core.compression import compressed_json_response
 from app.core.auth import decode_access_token, get_current_user
 from app.core.config import settings
+from app.core.database import db
+from app.core.job_queue import JobQueue, PROCESSING, DONE, FAILED
+from app.reports.analytes import catalog as analyte_catalog
+from app.reports.observations import normalize_date
+from app.reports.service import (FILE_TYPES, LIST_FIELDS, ocr_pool, pdf_ocr_pool, report_filter,
+                                 report_service)
 
 router = APIRouter()
 
-# MongoDB connection
-MONGODB_URL = os.getenv("MONGODB_URL", settings.MONGODB_URL)
-MONGODB_DB = os.getenv("MONGODB_DB", settings.MONGODB_DB)
-
-try:
-    client = MongoClient(MONGODB_URL, serverSelectionTimeoutMS=3000)
-    client.server_info()
-    db = client[MONGODB_DB]
-except Exception:
-    from app.core.mock_db import get_mock_db
-    mock = get_mock_db()
-    class MockDB:
-        def __init__(self, _mock):
-            self._mock = _mock
-        def __getitem__(self, collection_name):
-            return self._mock.get_collection(collection_name)
-    db = MockDB(mock)
-
 # Models
 class LabReportAnalysis(BaseModel):
     test_name: str
@@ -67,202 +53,26 @@ def get_current_user(authorization: str = Depends(lambda: None)):
     
     return user
 
-# OCR Text Extraction
-def extract_text_from_image(image_path):
-    """Extract text from uploaded image using OCR"""
-    try:
-        # Try to use pytesseract for OCR
-        import pytesseract
-        from PIL import Image
-        
-        # Set tesseract path for Windows (if needed)
-        # pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-        
-        # Open and process image
-        img = Image.open(image_path)
-        
-        # Extract text using OCR
-        text = pytesseract.image_to_string(img, lang='eng')
-        
-        if text.strip():
-            print(f"✅ OCR extracted {len(text)} characters from {image_path}")
-            return text.strip()
-        else:
-            print(f"⚠️ OCR found no text in {image_path}")
-            return "No text detected in the image. Please ensure the image is clear and contains readable text."
-            
-    except ImportError:
-        print("❌ pytesseract not installed. Install with: pip install pytesseract")
-        return generate_mock_lab_report_text()
-    except FileNotFoundError:
-        print("❌ Tesseract OCR engine not found. Please install Tesseract OCR.")
-        return generate_mock_lab_report_text()
-    except Exception as e:
-        print(f"❌ OCR Error: {e}")
-        print("🔄 Using mock analysis instead")
-        return generate_mock_lab_report_text()
-
-def generate_mock_lab_report_text():
-    """Generate mock lab report text for demonstration"""
-    return """
-    LAB REPORT ANALYSIS
-    
-    Blood Glucose: 95 mg/dL
-    Total Cholesterol: 180 mg/dL  
-    Hemoglobin: 13.5 g/dL
-    Creatinine: 1.0 mg/dL
-    
-    Note: This is a mock analysis as OCR service is not fully configured.
-    Please install Tesseract OCR for real text extraction.
-    """
-
-# AI Analysis Functions
-def analyze_blood_sugar(value, unit="mg/dL"):
-    """Analyze blood sugar levels"""
-    try:
-        val = float(value)
-        if unit == "mmol/L":
-            val = val * 18  # Convert to mg/dL
-        
-        if val < 70:
-            return "low", "Low blood sugar - consult doctor immediately. Have some glucose/sugar."
-        elif val <= 100:
-            return "normal", "Normal fasting blood sugar level. Maintain healthy diet."
-        elif val <= 125:
-            return "high", "Pre-diabetic range. Consider lifestyle changes and doctor consultation."
-        else:
-            return "critical", "Diabetic range. Immediate medical attention required."
-    except:
-        return "unknown", "Unable to analyze this value."
-
-def analyze_blood_pressure(systolic, diastolic):
-    """Analyze blood pressure readings"""
-    try:
-        sys_val = float(systolic)
-        dia_val = float(diastolic)
-        
-        if sys_val < 90 or dia_val < 60:
-            return "low", "Low blood pressure. Monitor and consult doctor if symptoms persist."
-        elif sys_val <= 120 and dia_val <= 80:
-            return "normal", "Normal blood pressure. Maintain healthy lifestyle."
-        elif sys_val <= 139 or dia_val <= 89:
-            return "high", "Pre-hypertension. Consider lifestyle modifications."
-        else:
-            return "critical", "High blood pressure. Medical attention recommended."
-    except:
-        return "unknown", "Unable to analyze blood pressure values."
+# Background processing: OCR, storage and analysis live in the report service
+report_queue = JobQueue(
+    "Lab report",
+    lambda: report_service.collection,
+    report_service.process,
+    concurrency=settings.LAB_REPORT_WORKERS,
+    max_attempts=settings.LAB_REPORT_MAX_ATTEMPTS,
+    lease_seconds=settings.LAB_REPORT_LEASE_SECONDS,
+)
 
-def analyze_cholesterol(total_chol, hdl=None, ldl=None):
-    """Analyze cholesterol levels"""
-    try:
-        total = float(total_chol)
-        
-        if total < 200:
-            status = "normal"
-            recommendation = "Good cholesterol level. Maintain healthy diet."
-        elif total <= 239:
-            status = "high"
-            recommendation = "Borderline high cholesterol. Consider dietary changes."
-        else:
-            status = "critical"
-            recommendation = "High cholesterol. Medical consultation recommended."
-        
-        return status, recommendation
-    except:
-        return "unknown", "Unable to analyze cholesterol values."
+@router.on_event("startup")
+async def start_report_queue():
+    await run_in_threadpool(report_service.ensure_indexes)
+    await report_queue.start()
 
-def smart_analysis(extracted_text):
-    """AI-powered analysis of lab report text"""
-    analysis_results = []
-    text_lines = extracted_text.split('\n')
-    
-    # Common test patterns
-    patterns = {
-        'blood_sugar': [
-            r'glucose.*?(\d+\.?\d*)\s*(mg/dl|mmol/l)',
-            r'sugar.*?(\d+\.?\d*)\s*(mg/dl|mmol/l)',
-            r'fbs.*?(\d+\.?\d*)\s*(mg/dl|mmol/l)',
-            r'rbs.*?(\d+\.?\d*)\s*(mg/dl|mmol/l)'
-        ],
-        'cholesterol': [
-            r'cholesterol.*?(\d+\.?\d*)\s*(mg/dl)',
-            r'total cholesterol.*?(\d+\.?\d*)\s*(mg/dl)'
-        ],
-        'hemoglobin': [
-            r'hemoglobin.*?(\d+\.?\d*)\s*(g/dl|gm/dl)',
-            r'hb.*?(\d+\.?\d*)\s*(g/dl|gm/dl)'
-        ],
-        'creatinine': [
-            r'creatinine.*?(\d+\.?\d*)\s*(mg/dl)',
-            r'serum creatinine.*?(\d+\.?\d*)\s*(mg/dl)'
-        ]
-    }
-    
-    for line in text_lines:
-        line = line.lower().strip()
-        
-        # Blood Sugar Analysis
-        for pattern in patterns['blood_sugar']:
-            match = re.search(pattern, line, re.IGNORECASE)
-            if match:
-                value = match.group(1)
-                unit = match.group(2)
-                status, recommendation = analyze_blood_sugar(value, unit)
-                
-                analysis_results.append({
-                    "test_name": "Blood Glucose",
-                    "value": f"{value} {unit}",
-                    "unit": unit,
-                    "reference_range": "70-100 mg/dL (fasting)",
-                    "status": status,
-                    "recommendation": recommendation
-                })
-        
-        # Cholesterol Analysis
-        for pattern in patterns['cholesterol']:
-            match = re.search(pattern, line, re.IGNORECASE)
-            if match:
-                value = match.group(1)
-                unit = match.group(2)
-                status, recommendation = analyze_cholesterol(value)
-                
-                analysis_results.append({
-                    "test_name": "Total Cholesterol",
-                    "value": f"{value} {unit}",
-                    "unit": unit,
-                    "reference_range": "<200 mg/dL",
-                    "status": status,
-                    "recommendation": recommendation
-                })
-        
-        # Hemoglobin Analysis
-        for pattern in patterns['hemoglobin']:
-            match = re.search(pattern, line, re.IGNORECASE)
-            if match:
-                value = match.group(1)
-                unit = match.group(2)
-                val = float(value)
-                
-                if val < 12:
-                    status = "low"
-                    recommendation = "Low hemoglobin. Iron-rich foods and medical consultation recommended."
-                elif val <= 15:
-                    status = "normal"
-                    recommendation = "Normal hemoglobin level."
-                else:
-                    status = "high"
-                    recommendation = "High hemoglobin. Further investigation may be needed."
-                
-                analysis_results.append({
-                    "test_name": "Hemoglobin",
-                    "value": f"{value} {unit}",
-                    "unit": unit,
-                    "reference_range": "12-15 g/dL",
-                    "status": status,
-                    "recommendation": recommendation
-                })
-    
-    return analysis_results
+@router.on_event("shutdown")
+async def stop_report_queue():
+    await report_queue.stop()
+    await run_in_threadpool(pdf_ocr_pool.shutdown)
+    await run_in_threadpool(ocr_pool.shutdown)
 
 # API Endpoints
 @router.post("/upload")
@@ -272,9 +82,11 @@ async def upload_lab_report(
     test_date: str = Form(...),
     lab_name: Optional[str] = Form(None),
     doctor_name: Optional[str] = Form(None),
-    notes: Optional[str] = Form(None)
+    notes: Optional[str] = Form(None),
+    patient_sex: Optional[str] = Form(None),
+    patient_age: Optional[int] = Form(None)
 ):
-    """Upload and analyze lab report - temporarily without auth"""
+    """Upload a lab report and queue it for OCR/analysis - temporarily without auth"""
     try:
         print(f"📋 Upload request received:")
         print(f"   - File: {file.filename} ({file.content_type})")
@@ -283,116 +95,200 @@ async def upload_lab_report(
         print(f"   - Lab Name: {lab_name}")
         print(f"   - Doctor Name: {doctor_name}")
         
-        # Create uploads directory
-        uploads_dir = "uploaded_reports"
-        os.makedirs(uploads_dir, exist_ok=True)
-        
         # Save uploaded file
         file_extension = file.filename.split('.')[-1].lower()
-        if file_extension not in ['jpg', 'jpeg', 'png', 'pdf']:
-            raise HTTPException(status_code=400, detail="Only JPG, PNG, and PDF files are allowed")
-        
-        filename = f"temp_user_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{file_extension}"
-        file_path = os.path.join(uploads_dir, filename)
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Extract text using OCR (for images)
-        extracted_text = ""
-        analysis_results = []
+        if file_extension not in FILE_TYPES:
+            raise HTTPException(status_code=400, detail="Only JPG, PNG, PDF and TXT files are allowed")
         
-        if file_extension in ['jpg', 'jpeg', 'png']:
-            extracted_text = extract_text_from_image(file_path)
-            analysis_results = smart_analysis(extracted_text)
-        
-        # Save to database
-        report_data = {
-            "user_id": "temp_user_id",  # Temporary user ID
+        metadata = {
             "report_name": report_name,
             "test_date": test_date,
             "lab_name": lab_name,
             "doctor_name": doctor_name,
             "notes": notes,
-            "file_path": file_path,
-            "file_type": file_extension,
-            "extracted_text": extracted_text,
-            "analysis_results": analysis_results,
-            "upload_date": datetime.utcnow().isoformat(),
-            "status": "processed"
+            "patient_sex": patient_sex,
+            "patient_age": patient_age,
         }
-        
-        result = db.lab_reports.insert_one(report_data)
+        # Stored by content hash; OCR and analysis run in the background queue
+        report_data, duplicate = await run_in_threadpool(
+            report_service.ingest, file.file, file_extension, metadata, "temp_user_id")  # Temporary user ID
+        if not duplicate:
+            report_queue.enqueue(report_data["_id"])
         
         return {
-            "message": "Lab report uploaded and analyzed successfully",
-            "report_id": str(result.inserted_id),
+            "message": "Lab report uploaded (duplicate of an analyzed report)" if duplicate
+                else "Lab report uploaded and queued for analysis",
+            "report_id": str(report_data["_id"]),
             "report_name": report_name,
             "test_date": test_date,
             "lab_name": lab_name,
             "doctor_name": doctor_name,
             "notes": notes,
-            "analysis_results": analysis_results,
-            "extracted_text": extracted_text[:500] + "..." if len(extracted_text) > 500 else extracted_text,
-            "upload_date": datetime.utcnow().isoformat(),
-            "status": "processed"
+            "analysis_results": report_data["analysis_results"],
+            "extracted_text": report_data["extracted_text"],
+            "upload_date": report_data["upload_date"],
+            "status": report_data["status"],
+            "deduplicated": report_data.get("deduplicated", False),
+            "bytes_saved": report_data.get("bytes_saved", 0),
+            "ocr_seconds_saved": report_data.get("ocr_seconds_saved", 0),
+            "status_url": f"/api/lab-reports/report/{report_data['_id']}/status"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error uploading report: {str(e)}")
 
+def report_status_payload(report) -> dict:
+    payload = {
+        "id": str(report["_id"]),
+        "status": report.get("status", DONE),
+        "progress": report.get("progress"),
+        "error": report.get("error"),
+    }
+    if report.get("pages"):
+        payload["pages"] = {k: v for k, v in report["pages"].items() if k != "detail"}
+    if payload["status"] == DONE:
+        payload["analysis_results"] = report.get("analysis_results", [])
+    elif payload["status"] == PROCESSING and report.get("analysis_results"):
+        # Multi-page reports publish results page by page
+        payload["analysis_results"] = report["analysis_results"]
+        payload["partial"] = True
+    return payload
+
+@router.get("/report/{report_id}/status")
+async def get_report_status(report_id: str):
+    """Poll the processing status of an uploaded report"""
+    report = await run_in_threadpool(report_service.get, report_id)
+    if not report:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return report_status_payload(report)
+
+@router.get("/report/{report_id}/events")
+async def stream_report_status(report_id: str, timeout: int = 300):
+    """Server-sent events with processing progress until the report is done"""
+    report = await run_in_threadpool(report_service.get, report_id)
+    if not report:
+        raise HTTPException(status_code=404, detail="Report not found")
+
+    async def events():
+        last = None
+        deadline = asyncio.get_event_loop().time() + timeout
+        current = report
+        while True:
+            payload = report_status_payload(current)
+            if payload != last:
+                yield f"event: status\ndata: {json.dumps(payload)}\n\n"
+                last = payload
+            if payload["status"] in (DONE, FAILED) or asyncio.get_event_loop().time() > deadline:
+                break
+            await asyncio.sleep(0.5)
+            current = await run_in_threadpool(report_service.get, report_id)
+            if current is None:
+                yield "event: deleted\ndata: {}\n\n"
+                break
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.get("/queue/stats")
+async def report_queue_stats():
+    """Worker pool status for background report processing"""
+    return {**report_queue.stats(), "ocr": ocr_pool.stats(), "pdf_ocr": pdf_ocr_pool.stats()}
+
+@router.get("/ocr/health")
+async def ocr_health():
+    """Ping the idle OCR workers and replace any that stopped responding"""
+    return {**await run_in_threadpool(ocr_pool.health), **ocr_pool.stats()}
+
+@router.post("/reanalyze")
+async def reanalyze_reports(stages: Optional[str] = None, force: bool = False):
+    """Re-run stale analysis stages for all processed reports (e.g. after changing the analyte catalog)
+
+    ``stages`` limits the run to some analyzers (comma separated); ``force``
+    re-runs them even when their version and inputs are unchanged.
+    """
+    try:
+        only = [name.strip() for name in stages.split(",")] if stages else None
+        unknown = [name for name in only or [] if name not in report_service.pipeline.names]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown stages: {', '.join(unknown)}. "
+                                                        f"Enabled: {', '.join(report_service.pipeline.names)}")
+        result = await run_in_threadpool(report_service.reprocess, only=only,
+                                         force=(only or report_service.pipeline.names) if force else ())
+        print(f"🔁 Re-analyzed {result['reports']} reports ({result['values']} values, {result['updated']} changed)")
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error re-analyzing reports: {str(e)}")
+
+@router.get("/dedup/stats")
+async def dedup_stats():
+    """Storage and OCR time saved by content-hash deduplication of uploads"""
+    return await run_in_threadpool(report_service.dedup_stats)
+
 @router.get("/test")
 async def test_endpoint():
     """Test endpoint to check if lab reports API is working"""
     return {"message": "Lab Reports API is working!", "status": "success"}
 
+# Largest page the report list returns
+MAX_PAGE_SIZE = 100
+
 @router.get("/my-reports")
-async def get_my_reports():
-    """Get all reports for current user - temporarily without auth"""
+async def get_my_reports(
+    response: Response,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """Get the current user's reports, newest first, one page at a time - temporarily without auth
+
+    The body is a list of report summaries; the cursor for the next page is
+    returned in the X-Next-Cursor header (absent on the last page).
+    """
     try:
-        # Fetch all reports from database
-        reports_cursor = db.lab_reports.find({})
-        reports = []
-        
-        for report in reports_cursor:
-            report_dict = {
-                "id": str(report["_id"]),
-                "report_name": report.get("report_name", ""),
-                "test_date": report.get("test_date", ""),
-                "lab_name": report.get("lab_name", ""),
-                "doctor_name": report.get("doctor_name", ""),
-                "notes": report.get("notes", ""),
-                "file_path": report.get("file_path", ""),
-                "file_type": report.get("file_type", ""),
-                "extracted_text": report.get("extracted_text", ""),
-                "analysis_results": report.get("analysis_results", []),
-                "upload_date": report.get("upload_date", ""),
-                "status": report.get("status", "processed")
-            }
-            reports.append(report_dict)
-        
+        selected = LIST_FIELDS
+        if fields:
+            selected = tuple(f.strip() for f in fields.split(",") if f.strip())
+            unknown = [f for f in selected if f not in LIST_FIELDS]
+            if unknown:
+                raise HTTPException(status_code=400,
+                                    detail=f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(LIST_FIELDS)}")
+        limit = min(max(limit, 1), MAX_PAGE_SIZE)
+        
+        try:
+            reports, next_cursor = await run_in_threadpool(report_service.list_page, "temp_user_id", limit, cursor, selected)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
         return reports
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Error fetching reports: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error fetching reports: {str(e)}")
 
 @router.get("/report/{report_id}")
-async def get_report_details(report_id: str):
-    """Get detailed report with analysis - temporarily without auth"""
+async def get_report_details(report_id: str, request: Request):
+    """Get detailed report with analysis and extracted text - temporarily without auth"""
     try:
-        report = db.lab_reports.find_one({
-            "_id": ObjectId(report_id)
-        })
+        report = await run_in_threadpool(report_service.get, report_id)
         
         if not report:
             raise HTTPException(status_code=404, detail="Report not found")
         
-        report["id"] = str(report["_id"])
-        del report["_id"]
+        report = dict(report)
+        report["id"] = str(report.pop("_id"))
         
-        return report
+        # Extracted text and word boxes make this payload large; compress it
+        return compressed_json_response(request, report)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching report details: {str(e)}")
 
@@ -400,59 +296,40 @@ async def get_report_details(report_id: str):
 async def delete_report(report_id: str):
     """Delete a lab report - temporarily without auth"""
     try:
-        report = db.lab_reports.find_one({
-            "_id": ObjectId(report_id)
-        })
+        deleted = await run_in_threadpool(report_service.delete, report_id)
         
-        if not report:
+        if not deleted:
             raise HTTPException(status_code=404, detail="Report not found")
         
-        # Delete file
-        if os.path.exists(report["file_path"]):
-            os.remove(report["file_path"])
-        
-        # Delete from database
-        db.lab_reports.delete_one({"_id": ObjectId(report_id)})
-        
         return {"message": "Report deleted successfully"}
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting report: {str(e)}")
 
+@router.get("/trends/{analyte}")
+async def get_lab_trend(analyte: str, start: Optional[str] = None, end: Optional[str] = None,
+                        max_points: int = 200):
+    """Time series of one analyte, optionally limited to [start, end] and downsampled - temporarily without auth"""
+    if analyte not in analyte_catalog.catalog:
+        raise HTTPException(status_code=404, detail=f"Unknown analyte '{analyte}'")
+    start_date, end_date = normalize_date(start), normalize_date(end)
+    if (start and not start_date) or (end and not end_date):
+        raise HTTPException(status_code=400, detail="start and end must be dates (YYYY-MM-DD)")
+    max_points = min(max(max_points, 2), 1000)
+    return await run_in_threadpool(report_service.observations.trend, "temp_user_id", analyte,
+                                   start_date, end_date, max_points)
+
 @router.get("/analytics")
 async def get_health_analytics():
     """Get health analytics - temporarily without auth"""
     try:
-        # Fetch all reports from database
-        reports_cursor = db.lab_reports.find({})
-        reports = list(reports_cursor)
-        
-        total_reports = len(reports)
-        critical_alerts = 0
-        normal_results = 0
-        
-        # Count critical and normal results
-        for report in reports:
-            analysis_results = report.get("analysis_results", [])
-            for analysis in analysis_results:
-                if analysis.get("status") == "critical":
-                    critical_alerts += 1
-                elif analysis.get("status") == "normal":
-                    normal_results += 1
-        
-        # Calculate health score (percentage of normal results)
-        total_tests = critical_alerts + normal_results
-        health_score = round((normal_results / total_tests * 100) if total_tests > 0 else 0)
-        
-        trends = {
-            "blood_sugar": [],
-            "cholesterol": [],
-            "hemoglobin": [],
-            "total_reports": total_reports,
-            "critical_alerts": critical_alerts,
-            "normal_results": normal_results,
-            "health_score": health_score
-        }
+        trends = await run_in_threadpool(report_service.analytics, "temp_user_id")
+        total_reports = trends["total_reports"]
+        critical_alerts = trends["critical_alerts"]
+        normal_results = trends["normal_results"]
+        health_score = trends["health_score"]
         
         print(f"📊 Analytics calculated:")
         print(f"   - Total Reports: {total_reports}")
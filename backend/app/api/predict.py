@@ -1,200 +1,172 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File
-from app.schemas.disease import HeartInput
-from app.schemas.disease import DiabetesInput
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from typing import List
+from fastapi.concurrency import run_in_threadpool
 from app.schemas.disease import SkinDiseaseInput
 
-import joblib
 import numpy as np
 import os
-# import tensorflow as tf
-# from tensorflow.keras.preprocessing import image
-import base64
-import io
-from PIL import Image
+from app.core.config import settings
+from app.api.admin import get_admin_user
+from app.ml_models.registry import registry
+from app.ml_models.inference import INPUT_SCHEMAS, feature_vector, predict_features
+from app.ml_models.prediction_cache import PredictionCache
+from app.ml_models.inference_pool import InferencePool, PoolSaturated, PredictionTimeout
+from app.ml_models.skin_classifier import SkinClassifier, SkinModelUnavailable, decode_base64_image
 
 router = APIRouter()
 
 base_path = os.path.join(os.path.dirname(__file__), "..", "ml_models")
 
 # Load models and scalers with error handling
-models = {}
-scalers = {}
-
-try:
-    models["heart"] = joblib.load(os.path.join(base_path, "heart_disease_model.pkl"))
-    scalers["heart"] = joblib.load(os.path.join(base_path, "heart_scaler.pkl"))
-    print("✅ Heart disease model loaded successfully")
-except Exception as e:
-    print(f"❌ Failed to load heart disease model: {e}")
-
-try:
-    models["diabetes"] = joblib.load(os.path.join(base_path, "diabetes_model_.pkl"))
-    scalers["diabetes"] = joblib.load(os.path.join(base_path, "scaler.pkl"))
-    print("✅ Diabetes model loaded successfully")
-except Exception as e:
-    print(f"❌ Failed to load diabetes model: {e}")
-
-try:
-    # models["skin"] = tf.keras.models.load_model(os.path.join(base_path, "skindisease.h5"))
-    print("⚠️ Skin disease model temporarily disabled (TensorFlow not available)")
-except Exception as e:
-    print(f"❌ Failed to load skin disease model: {e}")
+registry.load()
+models = registry.models
+scalers = registry.scalers
+
+# Skin model is loaded lazily on the first skin request
+skin_classifier = SkinClassifier(
+    model_path=os.path.join(base_path, "skindisease.onnx"),
+    threads=settings.SKIN_MODEL_THREADS,
+    max_batch=settings.SKIN_MAX_BATCH,
+)
+
+DISEASE_NAMES = {"heart": "Heart disease", "diabetes": "Diabetes"}
+
+# Cache of recent predictions, flushed whenever the registry reloads
+prediction_cache = PredictionCache(
+    max_entries=settings.PREDICTION_CACHE_MAX_ENTRIES,
+    max_bytes=settings.PREDICTION_CACHE_MAX_BYTES,
+)
+registry.on_reload(prediction_cache.invalidate)
+
+# Optional process pool so CPU-bound inference does not run on the request threadpool
+inference_pool = None
+if settings.PREDICTION_BACKEND == "process":
+    inference_pool = InferencePool(
+        workers=settings.PREDICTION_WORKERS,
+        max_pending=settings.PREDICTION_MAX_PENDING,
+        timeout=settings.PREDICTION_TIMEOUT_SECONDS,
+        start_timeout=settings.PREDICTION_START_TIMEOUT_SECONDS,
+    )
+    # Workers hold their own copy of the models, so replace them on reload
+    registry.on_reload(inference_pool.restart)
+    print(f"⚙️ Prediction backend: process pool ({settings.PREDICTION_WORKERS} workers)")
+
+@router.on_event("shutdown")
+def shutdown_inference_pool():
+    if inference_pool is not None:
+        inference_pool.shutdown()
+
+@router.get("/backend/stats")
+def prediction_backend_stats():
+    """Current prediction backend and, for the process pool, its queue counters"""
+    if inference_pool is None:
+        return {"backend": "thread"}
+    return {"backend": "process", **inference_pool.stats()}
+
+@router.get("/cache/stats")
+def prediction_cache_stats():
+    """Hit/miss counters and size of the prediction result cache"""
+    return {"model_versions": registry.available(), **prediction_cache.stats()}
+
+@router.post("/models/reload")
+def reload_models(admin: dict = Depends(get_admin_user)):
+    """Reload the model files from disk (admins only); cached predictions are invalidated"""
+    registry.reload()
+    return {"message": "Models reloaded", "model_versions": registry.available()}
+
+async def predict_tabular(disease: str, input_data: dict) -> dict:
+    """Validate input, run the model for a tabular disease and cache the result"""
+    data_obj = INPUT_SCHEMAS[disease](**input_data)
+
+    # Check if model is loaded
+    loaded = registry.get(disease)
+    if loaded is None:
+        raise HTTPException(status_code=503, detail=f"{DISEASE_NAMES[disease]} model not available")
+    model, scaler, scorer, version = loaded
+
+    features = feature_vector(disease, data_obj)
+    cache_key = prediction_cache.make_key(disease, version, features)
+    result = prediction_cache.get(cache_key)
+    if result is not None:
+        return result
+
+    if inference_pool is None:
+        result = await run_in_threadpool(predict_features, disease, model, scaler, features, scorer)
+    else:
+        try:
+            worker_version, result = await inference_pool.predict(disease, features)
+        except PoolSaturated as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except PredictionTimeout as e:
+            raise HTTPException(status_code=504, detail=str(e))
+        if worker_version != version:
+            # Worker is still on a previous model version, don't cache its answer
+            return result
+
+    prediction_cache.put(cache_key, result)
+    return result
 
 @router.post("/{disease}")
-def predict_disease(disease: str, input_data: dict):
+async def predict_disease(disease: str, input_data: dict):
     print(f"🔍 Received prediction request for: {disease}")
     print(f"📊 Input data: {input_data}")
     
-    if disease == "heart":
+    if disease in DISEASE_NAMES:
+        label = DISEASE_NAMES[disease]
         try:
-            data_obj = HeartInput(**input_data)
-            
-            # Check if model is loaded
-            if "heart" not in models or "heart" not in scalers:
-                raise HTTPException(status_code=503, detail="Heart disease model not available")
-            
-            # Convert to numpy array and scale
-            features = np.array([[
-                data_obj.age, data_obj.sex, data_obj.chest_pain_type, data_obj.resting_bp,
-                data_obj.cholesterol, data_obj.fasting_blood_sugar, data_obj.rest_ecg, data_obj.max_heart_rate,
-                data_obj.exercise_angina, data_obj.oldpeak, data_obj.slope, data_obj.major_vessels, data_obj.thal
-            ]])
-            
-            features_scaled = scalers["heart"].transform(features)
-            prediction = models["heart"].predict(features_scaled)[0]
-            
-            # Check if the model supports predict_proba
-            try:
-                if hasattr(models["heart"], 'predict_proba'):
-                    probability = models["heart"].predict_proba(features_scaled)[0]
-                    result = {
-                        "prediction": "Heart Disease Detected" if prediction == 1 else "No Heart Disease",
-                        "probability": {
-                            "no_disease": float(probability[0]),
-                            "disease": float(probability[1])
-                        }
-                    }
-                elif hasattr(models["heart"], 'decision_function'):
-                    # For SVC models, use decision_function to get confidence scores
-                    decision_score = models["heart"].decision_function(features_scaled)[0]
-                    # Convert decision score to probability-like score (0-1 range)
-                    confidence = 1 / (1 + np.exp(-decision_score))  # Sigmoid transformation
-                    result = {
-                        "prediction": "Heart Disease Detected" if prediction == 1 else "No Heart Disease",
-                        "probability": {
-                            "no_disease": float(1 - confidence) if prediction == 1 else float(confidence),
-                            "disease": float(confidence) if prediction == 1 else float(1 - confidence)
-                        },
-                        "confidence_score": float(abs(decision_score)),
-                        "model_type": "SVC"
-                    }
-                else:
-                    # Fallback for models without probability estimates
-                    result = {
-                        "prediction": "Heart Disease Detected" if prediction == 1 else "No Heart Disease",
-                        "probability": {
-                            "no_disease": 0.25 if prediction == 1 else 0.75,
-                            "disease": 0.75 if prediction == 1 else 0.25
-                        },
-                        "note": "Probability estimates not available for this model type"
-                    }
-            except Exception as prob_error:
-                print(f"⚠️ Could not get probability estimates: {prob_error}")
-                result = {
-                    "prediction": "Heart Disease Detected" if prediction == 1 else "No Heart Disease",
-                    "probability": {
-                        "no_disease": 0.25 if prediction == 1 else 0.75,
-                        "disease": 0.75 if prediction == 1 else 0.25
-                    },
-                    "note": "Probability estimates not available"
-                }
-            
-            print(f"✅ Heart disease prediction successful: {result}")
-            
+            result = await predict_tabular(disease, input_data)
+            print(f"✅ {label} prediction successful: {result}")
+        except HTTPException:
+            raise
         except Exception as e:
-            print(f"❌ Heart disease prediction error: {str(e)}")
-            raise HTTPException(status_code=422, detail=f"Error in heart disease prediction: {str(e)}")
+            print(f"❌ {label} prediction error: {str(e)}")
+            raise HTTPException(status_code=422, detail=f"Error in {label.lower()} prediction: {str(e)}")
 
-    elif disease == "diabetes":
+    elif disease == "skin":
         try:
-            data_obj = DiabetesInput(**input_data)
-            
-            # Check if model is loaded
-            if "diabetes" not in models or "diabetes" not in scalers:
-                raise HTTPException(status_code=503, detail="Diabetes model not available")
-            
-            # Convert to numpy array and scale
-            features = np.array([[
-                data_obj.Pregnancies, data_obj.Glucose, data_obj.BloodPressure,
-                data_obj.SkinThickness, data_obj.Insulin, data_obj.BMI,
-                data_obj.DiabetesPedigreeFunction, data_obj.Age
-            ]])
-            
-            features_scaled = scalers["diabetes"].transform(features)
-            prediction = models["diabetes"].predict(features_scaled)[0]
-            
-            # Check if the model supports predict_proba
-            try:
-                if hasattr(models["diabetes"], 'predict_proba'):
-                    probability = models["diabetes"].predict_proba(features_scaled)[0]
-                    result = {
-                        "prediction": "Diabetes Detected" if prediction == 1 else "No Diabetes",
-                        "probability": {
-                            "no_diabetes": float(probability[0]),
-                            "diabetes": float(probability[1])
-                        }
-                    }
-                elif hasattr(models["diabetes"], 'decision_function'):
-                    # For SVC models, use decision_function to get confidence scores
-                    decision_score = models["diabetes"].decision_function(features_scaled)[0]
-                    # Convert decision score to probability-like score (0-1 range)
-                    confidence = 1 / (1 + np.exp(-decision_score))  # Sigmoid transformation
-                    result = {
-                        "prediction": "Diabetes Detected" if prediction == 1 else "No Diabetes",
-                        "probability": {
-                            "no_diabetes": float(1 - confidence) if prediction == 1 else float(confidence),
-                            "diabetes": float(confidence) if prediction == 1 else float(1 - confidence)
-                        },
-                        "confidence_score": float(abs(decision_score)),
-                        "model_type": "SVC"
-                    }
-                else:
-                    # Fallback for models without probability estimates
-                    result = {
-                        "prediction": "Diabetes Detected" if prediction == 1 else "No Diabetes",
-                        "probability": {
-                            "no_diabetes": 0.25 if prediction == 1 else 0.75,
-                            "diabetes": 0.75 if prediction == 1 else 0.25
-                        },
-                        "note": "Probability estimates not available for this model type"
-                    }
-            except Exception as prob_error:
-                print(f"⚠️ Could not get probability estimates: {prob_error}")
-                result = {
-                    "prediction": "Diabetes Detected" if prediction == 1 else "No Diabetes",
-                    "probability": {
-                        "no_diabetes": 0.25 if prediction == 1 else 0.75,
-                        "diabetes": 0.75 if prediction == 1 else 0.25
-                    },
-                    "note": "Probability estimates not available"
-                }
-            
-            print(f"✅ Diabetes prediction successful: {result}")
-            
+            data_obj = SkinDiseaseInput(**input_data)
+            if not data_obj.image:
+                raise HTTPException(status_code=422, detail="Image is required for skin disease prediction")
+            image_bytes = decode_base64_image(data_obj.image)
+        except HTTPException:
+            raise
         except Exception as e:
-            print(f"❌ Diabetes prediction error: {str(e)}")
-            raise HTTPException(status_code=422, detail=f"Error in diabetes prediction: {str(e)}")
-
-    elif disease == "skin":
-        # Temporarily disabled due to TensorFlow issues
-        raise HTTPException(status_code=503, detail="Skin disease prediction temporarily unavailable (TensorFlow not installed)")
+            raise HTTPException(status_code=422, detail=f"Invalid image: {str(e)}")
+        result = (await predict_skin_images([image_bytes]))[0]
+        print(f"✅ Skin disease prediction successful: {result['prediction']}")
 
     else:
         raise HTTPException(status_code=404, detail=f"Model not found for disease: {disease}")
 
     return {"disease": disease, "result": result}
 
+async def predict_skin_images(images: List[bytes]) -> List[dict]:
+    """Run the skin classifier on encoded images without blocking the event loop"""
+    try:
+        return await run_in_threadpool(skin_classifier.predict_batch, images)
+    except SkinModelUnavailable as e:
+        raise HTTPException(status_code=503, detail=f"Skin disease prediction unavailable ({e})")
+    except Exception as e:
+        print(f"❌ Skin disease prediction error: {str(e)}")
+        raise HTTPException(status_code=422, detail=f"Error in skin disease prediction: {str(e)}")
+
+@router.get("/skin/status")
+def skin_model_status():
+    """Whether the skin model is present and already loaded in this worker"""
+    return skin_classifier.status()
+
 @router.post("/skin/upload")
 async def predict_skin_disease_upload(file: UploadFile = File(...)):
-    """Alternative endpoint for direct file upload - temporarily disabled"""
-    raise HTTPException(status_code=503, detail="Skin disease prediction temporarily unavailable (TensorFlow not installed)")
+    """Alternative endpoint for direct file upload, decoded in memory"""
+    result = (await predict_skin_images([await file.read()]))[0]
+    return {"disease": "skin", "result": result}
+
+@router.post("/skin/batch")
+async def predict_skin_disease_batch(files: List[UploadFile] = File(...)):
+    """Classify several uploaded images in one batched model call"""
+    images = [await f.read() for f in files]
+    results = await predict_skin_images(images)
+    return {
+        "disease": "skin",
+        "results": [{"filename": f.filename, "result": r} for f, r in zip(files, results)]
+    }
@@ -0,0 +1,46 @@
+import gzip
+import json
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+# Bodies smaller than this are sent as is; compressing them costs more than it saves
+MIN_COMPRESS_BYTES = 1024
+
+
+def accepted_encodings(request: Request) -> set:
+    encodings = set()
+    for part in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip().replace(" ", "")
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name and quality > 0:
+            encodings.add(name.strip().lower())
+    return encodings
+
+
+def compressed_json_response(request: Request, payload, min_size: int = MIN_COMPRESS_BYTES) -> Response:
+    """JSON response compressed with brotli or gzip when the client accepts it"""
+    body = json.dumps(jsonable_encoder(payload), separators=(",", ":")).encode("utf-8")
+    headers = {"Vary": "Accept-Encoding"}
+    if len(body) >= min_size:
+        encodings = accepted_encodings(request)
+        if BROTLI_AVAILABLE and "br" in encodings:
+            body = brotli.compress(body, quality=5)
+            headers["Content-Encoding"] = "br"
+        elif "gzip" in encodings:
+            body = gzip.compress(body, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
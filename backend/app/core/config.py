@@ -18,4 +18,89 @@ class Settings(BaseModel):
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 
+    # Disease prediction
+    PREDICTION_CACHE_MAX_ENTRIES: int = int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", "4096"))
+    PREDICTION_CACHE_MAX_BYTES: int = int(os.getenv("PREDICTION_CACHE_MAX_BYTES", str(4 * 1024 * 1024)))
+    PREDICTION_FAST_PATH: bool = os.getenv("PREDICTION_FAST_PATH", "true").lower() == "true"
+    PREDICTION_BACKEND: str = os.getenv("PREDICTION_BACKEND", "thread")  # "thread" or "process"
+    PREDICTION_WORKERS: int = int(os.getenv("PREDICTION_WORKERS", "2"))
+    PREDICTION_MAX_PENDING: int = int(os.getenv("PREDICTION_MAX_PENDING", "64"))
+    PREDICTION_TIMEOUT_SECONDS: float = float(os.getenv("PREDICTION_TIMEOUT_SECONDS", "5"))
+    PREDICTION_START_TIMEOUT_SECONDS: float = float(os.getenv("PREDICTION_START_TIMEOUT_SECONDS", "60"))  # wait for a ready worker
+    SKIN_MODEL_THREADS: int = int(os.getenv("SKIN_MODEL_THREADS", "1"))
+    SKIN_MAX_BATCH: int = int(os.getenv("SKIN_MAX_BATCH", "16"))
+
+    # Lab report processing
+    LAB_REPORT_WORKERS: int = int(os.getenv("LAB_REPORT_WORKERS", "2"))
+    LAB_REPORT_MAX_ATTEMPTS: int = int(os.getenv("LAB_REPORT_MAX_ATTEMPTS", "3"))
+    LAB_REPORT_LEASE_SECONDS: float = float(os.getenv("LAB_REPORT_LEASE_SECONDS", "60"))  # requeued if not renewed
+    LAB_REPORT_STORAGE_DIR: str = os.getenv("LAB_REPORT_STORAGE_DIR", "uploaded_reports")
+    LAB_REPORT_ANALYZERS: str = os.getenv("LAB_REPORT_ANALYZERS", "regex,rules")  # add "llm" for Groq summaries
+    PDF_MAX_PAGES: int = int(os.getenv("PDF_MAX_PAGES", "20"))
+    PDF_OCR_WORKERS: int = int(os.getenv("PDF_OCR_WORKERS", "2"))
+    PDF_PAGE_TIMEOUT_SECONDS: float = float(os.getenv("PDF_PAGE_TIMEOUT_SECONDS", "30"))
+    PDF_RENDER_DPI: int = int(os.getenv("PDF_RENDER_DPI", "200"))
+    OCR_ENGINE: str = os.getenv("OCR_ENGINE", "auto")  # "auto", "tesserocr" or "pytesseract"
+    OCR_WORKERS: int = int(os.getenv("OCR_WORKERS", "2"))
+    OCR_MAX_JOBS_PER_WORKER: int = int(os.getenv("OCR_MAX_JOBS_PER_WORKER", "200"))
+    OCR_TIMEOUT_SECONDS: float = float(os.getenv("OCR_TIMEOUT_SECONDS", "60"))
+    OCR_HEALTH_INTERVAL_SECONDS: float = float(os.getenv("OCR_HEALTH_INTERVAL_SECONDS", "30"))
+    OCR_PREPROCESS: bool = os.getenv("OCR_PREPROCESS", "true").lower() == "true"
+    OCR_TESSERACT_CONFIG: str = os.getenv("OCR_TESSERACT_CONFIG", "--oem 1 --psm 6 -c preserve_interword_spaces=1")
+
+    # LLM gateway (app/llm/gateway.py)
+    LLM_MAX_IN_FLIGHT: int = int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))
+    LLM_MAX_QUEUE: int = int(os.getenv("LLM_MAX_QUEUE", "32"))  # Waiting calls beyond this are shed
+    LLM_DEADLINE_SECONDS: float = float(os.getenv("LLM_DEADLINE_SECONDS", "30"))
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "3"))
+    LLM_BACKOFF_BASE_SECONDS: float = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+    LLM_BACKOFF_CAP_SECONDS: float = float(os.getenv("LLM_BACKOFF_CAP_SECONDS", "8"))
+    LLM_MAX_CONNECTIONS: int = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+    LLM_HTTP2: bool = os.getenv("LLM_HTTP2", "true").lower() == "true"
+
+    # LLM provider (app/llm/providers.py)
+    LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "groq")  # "groq", "openai" (OpenAI-compatible server) or "stub"
+    LLM_BASE_URL: str = os.getenv("LLM_BASE_URL", "http://127.0.0.1:8080")  # e.g. llama.cpp's llama-server
+    LLM_API_KEY: str = os.getenv("LLM_API_KEY", "")
+    LLM_MODEL: str = os.getenv("LLM_MODEL", "local")
+    LLM_STUB_FIRST_TOKEN_MS: float = float(os.getenv("LLM_STUB_FIRST_TOKEN_MS", "200"))
+    LLM_STUB_TOKEN_MS: float = float(os.getenv("LLM_STUB_TOKEN_MS", "15"))  # 15 ms/token = about 67 tokens/s
+    LLM_STUB_TOKENS: int = int(os.getenv("LLM_STUB_TOKENS", "60"))
+
+    # Chat conversation memory (app/llm/conversation.py)
+    CHAT_MEMORY_TURNS: int = int(os.getenv("CHAT_MEMORY_TURNS", "8"))
+    CHAT_MEMORY_CONTEXT_TOKENS: int = int(os.getenv("CHAT_MEMORY_CONTEXT_TOKENS", "1200"))  # prompt budget of earlier turns
+    CHAT_MEMORY_TURN_CHARS: int = int(os.getenv("CHAT_MEMORY_TURN_CHARS", "2000"))
+    CHAT_MEMORY_TTL_SECONDS: float = float(os.getenv("CHAT_MEMORY_TTL_SECONDS", "1800"))
+    CHAT_MEMORY_MAX_SESSIONS: int = int(os.getenv("CHAT_MEMORY_MAX_SESSIONS", "10000"))
+    CHAT_MEMORY_PERSIST: bool = os.getenv("CHAT_MEMORY_PERSIST", "true").lower() == "true"  # reload from chats
+
+    # Prompt assembly (app/llm/prompts.py)
+    PROMPT_QUERY_TOKENS: int = int(os.getenv("PROMPT_QUERY_TOKENS", "1500"))  # longer user messages are truncated
+    PROMPT_MAX_TOKENS: int = int(os.getenv("PROMPT_MAX_TOKENS", "1024"))  # reply budget of detailed answers
+    PROMPT_ADAPTIVE_MAX_TOKENS: bool = os.getenv("PROMPT_ADAPTIVE_MAX_TOKENS", "true").lower() == "true"
+
+    # Chat response cache (app/llm/response_cache.py)
+    CHAT_CACHE_ENABLED: bool = os.getenv("CHAT_CACHE_ENABLED", "true").lower() == "true"
+    CHAT_CACHE_MAX_ENTRIES: int = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "1000"))
+    CHAT_CACHE_TTL_SECONDS: float = float(os.getenv("CHAT_CACHE_TTL_SECONDS", "86400"))
+    CHAT_CACHE_SIMILARITY: float = float(os.getenv("CHAT_CACHE_SIMILARITY", "0.9"))  # cosine, 1.0 = exact only
+
+    # Text-to-speech workers (app/llm/tts.py)
+    TTS_BACKEND: str = os.getenv("TTS_BACKEND", "process")  # "process" (one engine per worker) or "thread"
+    TTS_WORKERS: int = int(os.getenv("TTS_WORKERS", "2"))
+    TTS_MAX_PENDING: int = int(os.getenv("TTS_MAX_PENDING", "64"))
+    TTS_TIMEOUT_SECONDS: float = float(os.getenv("TTS_TIMEOUT_SECONDS", "60"))  # longest one synthesis may run
+    TTS_WAIT_SECONDS: float = float(os.getenv("TTS_WAIT_SECONDS", "20"))  # long-poll of a pending audio URL
+    TTS_VOICE: str = os.getenv("TTS_VOICE", "")
+    TTS_RATE: int = int(os.getenv("TTS_RATE", "0"))  # words per minute, 0 = engine default
+    TTS_CACHE_MAX_MB: int = int(os.getenv("TTS_CACHE_MAX_MB", "500"))  # responses/ audio, LRU evicted
+    TTS_CLEANUP_INTERVAL_SECONDS: float = float(os.getenv("TTS_CLEANUP_INTERVAL_SECONDS", "3600"))
+    TTS_ORPHAN_GRACE_SECONDS: float = float(os.getenv("TTS_ORPHAN_GRACE_SECONDS", "3600"))
+
+    # Reply analytics write-behind buffer (app/core/write_buffer.py)
+    CHAT_WRITE_BATCH: int = int(os.getenv("CHAT_WRITE_BATCH", "100"))  # records per insert_many
+    CHAT_WRITE_FLUSH_MS: float = float(os.getenv("CHAT_WRITE_FLUSH_MS", "50"))  # longest a record waits to be written
+    CHAT_WRITE_MAX_QUEUE: int = int(os.getenv("CHAT_WRITE_MAX_QUEUE", "10000"))
+
 settings = Settings() 
\ No newline at end of file
@@ -2,9 +2,31 @@ from pymongo import MongoClient
 from typing import Generator
 from app.core.config import settings
 
-# Initialize MongoDB client once (singleton-style)
-client = MongoClient(settings.MONGODB_URL)
-db = client[settings.MONGODB_DB]
+# Initialize MongoDB client once (singleton-style); falls back to the JSON
+# mock database when MongoDB is not reachable
+try:
+    client = MongoClient(settings.MONGODB_URL, serverSelectionTimeoutMS=3000)
+    client.server_info()
+    db = client[settings.MONGODB_DB]
+    USING_MOCK_DB = False
+except Exception as e:
+    print(f"❌ MongoDB connection failed: {e}")
+    print("🔄 Using mock database for development")
+    from app.core.mock_db import get_mock_db
+
+    class MockDB:
+        def __init__(self, mock_db):
+            self._mock = mock_db
+
+        def __getitem__(self, collection_name):
+            return self._mock.get_collection(collection_name)
+
+        def __getattr__(self, collection_name):
+            return self._mock.get_collection(collection_name)
+
+    client = None
+    db = MockDB(get_mock_db())
+    USING_MOCK_DB = True
 
 # Dependency to get database connection (sync)
 def get_db() -> Generator:
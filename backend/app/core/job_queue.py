@@ -0,0 +1,226 @@
+import asyncio
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+# Job states stored in the document's status field
+QUEUED = "queued"
+PROCESSING = "processing"
+DONE = "processed"
+FAILED = "failed"
+
+
+class JobQueue:
+    """Background job runner whose queue lives in a database collection.
+
+    Each job is a document in ``collection`` with a ``status`` field. Enqueued
+    ids are handed to ``concurrency`` asyncio workers, which claim a job with
+    a conditional update (queued -> processing) and run ``handler`` in the
+    threadpool so blocking work (OCR, parsing) never runs on the event loop.
+
+    A claimed job holds a lease: its ``heartbeat_at`` is renewed every
+    ``lease_seconds / 3`` while this process runs it. Because the state is
+    persisted, jobs survive a restart or a crashed process: a job left in
+    "processing" whose lease has expired (its owner is gone) is reset to
+    "queued" and picked up again, both on start() and periodically while
+    running. Jobs held by other live processes (several uvicorn workers, a
+    rolling restart) are left alone.
+
+    A job whose handler raises is retried with backoff; it is failed
+    permanently after ``max_attempts`` tries, counting both handler errors
+    and crashes.
+
+    ``handler(doc, progress)`` receives the job document and a callback
+    ``progress(stage, percent, **fields)`` (extra fields, e.g. partial
+    results, are stored along with the progress); it returns a dict of
+    fields to store on the document when the job completes.
+    """
+
+    def __init__(self, name: str, collection_getter: Callable, handler: Callable,
+                 concurrency: int = 2, max_attempts: int = 3, lease_seconds: float = 60.0):
+        self.name = name
+        self._collection_getter = collection_getter
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers = []
+        self._active = set()  # ids of the jobs this process is running
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.reclaimed = 0
+
+    @property
+    def collection(self):
+        return self._collection_getter()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    async def start(self):
+        if self._workers:
+            return
+        self._queue = asyncio.Queue()
+        recovered = await run_in_threadpool(self._recover)
+        for job_id in recovered:
+            self._queue.put_nowait(job_id)
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.concurrency)]
+        self._workers.append(asyncio.create_task(self._keep_leases()))
+        print(f"⚙️ {self.name} queue started with {self.concurrency} workers ({len(recovered)} jobs recovered)")
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.utcnow().isoformat()
+
+    def _reclaim_expired(self) -> list:
+        """Requeue jobs whose owner stopped renewing their lease; returns their ids"""
+        collection = self.collection
+        cutoff = (datetime.utcnow() - timedelta(seconds=self.lease_seconds)).isoformat()
+        reclaimed = []
+        for doc in list(collection.find({"status": PROCESSING})):
+            heartbeat = doc.get("heartbeat_at") or doc.get("started_at") or ""
+            if heartbeat >= cutoff or doc["_id"] in self._active:
+                continue
+            # Conditional on the lease seen here, so a renewal in the meantime wins
+            query = {"_id": doc["_id"], "status": PROCESSING}
+            if "heartbeat_at" in doc:
+                query["heartbeat_at"] = doc["heartbeat_at"]
+            result = collection.update_one(query, {"$set": {"status": QUEUED, "worker": None,
+                                                            "progress": {"stage": "queued", "percent": 0}}})
+            if result.matched_count:
+                print(f"♻️ {self.name} job {doc['_id']} reclaimed from {doc.get('worker')} (lease expired)")
+                reclaimed.append(doc["_id"])
+        self.reclaimed += len(reclaimed)
+        return reclaimed
+
+    def _recover(self) -> list:
+        """Requeue jobs of processes that are gone and collect everything still queued"""
+        self._reclaim_expired()
+        return [doc["_id"] for doc in self.collection.find({"status": QUEUED})]
+
+    def _renew_leases(self):
+        now = self._now()
+        for job_id in list(self._active):
+            self.collection.update_one({"_id": job_id, "status": PROCESSING, "worker": self.worker_id},
+                                       {"$set": {"heartbeat_at": now}})
+
+    async def _keep_leases(self):
+        """Renew the leases of running jobs and pick up jobs whose owner died"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await run_in_threadpool(self._renew_leases)
+                for job_id in await run_in_threadpool(self._reclaim_expired):
+                    self._queue.put_nowait(job_id)
+            except Exception as e:
+                print(f"⚠️ {self.name} lease maintenance failed: {e}")
+
+    def enqueue(self, job_id):
+        """Schedule an already persisted (status "queued") job"""
+        if self._queue is not None:
+            self._queue.put_nowait(job_id)
+        else:
+            print(f"⚠️ {self.name} queue not started, job {job_id} will run after restart")
+
+    def _set(self, job_id, fields: dict):
+        self.collection.update_one({"_id": job_id}, {"$set": fields})
+
+    def _claim(self, job_id) -> Optional[dict]:
+        now = self._now()
+        result = self.collection.update_one(
+            {"_id": job_id, "status": QUEUED},
+            {"$set": {"status": PROCESSING, "worker": self.worker_id, "started_at": now, "heartbeat_at": now}}
+        )
+        if not result.matched_count:
+            return None  # Already claimed elsewhere, deleted, or finished
+        return self.collection.find_one({"_id": job_id})
+
+    def _finish(self, job_id, fields: dict):
+        """Store the outcome, unless the lease was lost and the job reclaimed by another process"""
+        result = self.collection.update_one({"_id": job_id, "status": PROCESSING, "worker": self.worker_id},
+                                            {"$set": {**fields, "finished_at": self._now()}})
+        if not result.matched_count:
+            print(f"⚠️ {self.name} job {job_id} finished after its lease was lost; result discarded")
+
+    def _run(self, job_id) -> Optional[float]:
+        """Run a job; returns the delay before a retry, or None"""
+        doc = self._claim(job_id)
+        if doc is None:
+            return None
+        self._active.add(job_id)
+        try:
+            return self._run_claimed(job_id, doc)
+        finally:
+            self._active.discard(job_id)
+
+    def _run_claimed(self, job_id, doc: dict) -> Optional[float]:
+        attempts = doc.get("attempts", 0) + 1
+        self._set(job_id, {"attempts": attempts})
+        if attempts > self.max_attempts:
+            # Crashed the process on every previous try
+            self.failed += 1
+            self._finish(job_id, {"status": FAILED, "error": f"Gave up after {self.max_attempts} attempts"})
+            return None
+
+        def progress(stage: str, percent: int, **fields):
+            self._set(job_id, {**fields, "progress": {"stage": stage, "percent": percent}})
+
+        try:
+            fields = self.handler(doc, progress) or {}
+        except Exception as e:
+            if attempts < self.max_attempts:
+                delay = min(60.0, 2.0 ** attempts)
+                print(f"🔁 {self.name} job {job_id} failed (attempt {attempts}/{self.max_attempts}), "
+                      f"retrying in {delay:.0f}s: {e}")
+                self.retried += 1
+                self._finish(job_id, {"status": QUEUED, "worker": None, "error": str(e),
+                                      "progress": {"stage": "queued", "percent": 0}})
+                return delay
+            print(f"❌ {self.name} job {job_id} failed after {attempts} attempts: {e}")
+            self.failed += 1
+            self._finish(job_id, {"status": FAILED, "error": str(e)})
+            return None
+
+        self.completed += 1
+        self._finish(job_id, {**fields, "status": DONE, "error": None,
+                              "progress": {"stage": "done", "percent": 100}})
+        return None
+
+    async def _worker(self, index: int):
+        loop = asyncio.get_running_loop()
+        while True:
+            job_id = await self._queue.get()
+            try:
+                retry_in = await run_in_threadpool(self._run, job_id)
+                if retry_in is not None:
+                    loop.call_later(retry_in, self._queue.put_nowait, job_id)
+            except Exception as e:
+                print(f"❌ {self.name} worker {index} error on job {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "running": self.running,
+            "workers": self.concurrency,
+            "active": len(self._active),
+            "queued_in_memory": self._queue.qsize() if self._queue is not None else 0,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "reclaimed": self.reclaimed,
+        }
@@ -296,11 +296,22 @@ class MockCollection:
     def insert_one(self, document: Dict) -> 'MockInsertResult':
         """Insert one document"""
         doc_copy = document.copy()
-        doc_copy["_id"] = self.db._generate_id()
+        doc_copy["_id"] = str(document["_id"]) if document.get("_id") else self.db._generate_id()
         self.data.append(doc_copy)
         self.db.save_to_file()
         return MockInsertResult(doc_copy["_id"])
     
+    def insert_many(self, documents: List[Dict], ordered: bool = True) -> 'MockInsertManyResult':
+        """Insert several documents with a single save"""
+        ids = []
+        for document in documents:
+            doc_copy = document.copy()
+            doc_copy["_id"] = str(document["_id"]) if document.get("_id") else self.db._generate_id()
+            self.data.append(doc_copy)
+            ids.append(doc_copy["_id"])
+        self.db.save_to_file()
+        return MockInsertManyResult(ids)
+    
     def update_one(self, query: Dict, update: Dict) -> 'MockUpdateResult':
         """Update one document"""
         for i, doc in enumerate(self.data):
@@ -325,6 +336,15 @@ class MockCollection:
                 return MockDeleteResult(1)
         return MockDeleteResult(0)
     
+    def delete_many(self, query: Dict) -> 'MockDeleteResult':
+        """Delete all documents matching the query"""
+        kept = [doc for doc in self.data if not self._matches_query(doc, query)]
+        deleted = len(self.data) - len(kept)
+        if deleted:
+            self.data[:] = kept
+            self.db.save_to_file()
+        return MockDeleteResult(deleted)
+    
     def count_documents(self, query: Dict = None) -> int:
         """Count documents matching the query"""
         if query is None:
@@ -336,12 +356,40 @@ class MockCollection:
                 count += 1
         return count
     
+    # Comparison operators supported in queries, e.g. {"test_date": {"$gte": "2024-01-01"}};
+    # a top-level "$or" takes a list of sub-queries
+    OPERATORS = {
+        "$gt": lambda field, value: field > value,
+        "$gte": lambda field, value: field >= value,
+        "$lt": lambda field, value: field < value,
+        "$lte": lambda field, value: field <= value,
+        "$ne": lambda field, value: field != value,
+        "$in": lambda field, value: field in value,
+    }
+    
     def _matches_query(self, document: Dict, query: Dict) -> bool:
         """Check if document matches the query"""
         for key, value in query.items():
+            if key == "$or":
+                if not any(self._matches_query(document, branch) for branch in value):
+                    return False
+                continue
+            if key == "$and":
+                if not all(self._matches_query(document, branch) for branch in value):
+                    return False
+                continue
             if key not in document:
+                # As in MongoDB, a missing field matches null and $ne
+                if value is None or (isinstance(value, dict) and set(value) == {"$ne"} and value["$ne"] is not None):
+                    continue
                 return False
-            if document[key] != value:
+            if isinstance(value, dict) and value and all(op in self.OPERATORS for op in value):
+                try:
+                    if not all(self.OPERATORS[op](document[key], operand) for op, operand in value.items()):
+                        return False
+                except TypeError:
+                    return False
+            elif document[key] != value:
                 return False
         return True
 
@@ -349,6 +397,10 @@ class MockInsertResult:
     def __init__(self, inserted_id: str):
         self.inserted_id = inserted_id
 
+class MockInsertManyResult:
+    def __init__(self, inserted_ids: List[str]):
+        self.inserted_ids = inserted_ids
+
 class MockUpdateResult:
     def __init__(self, matched_count: int):
         self.matched_count = matched_count
@@ -0,0 +1,140 @@
+import asyncio
+import time
+from typing import Callable, List, Optional
+
+from bson import ObjectId
+from fastapi.concurrency import run_in_threadpool
+
+
+class WriteBehindBuffer:
+    """Batches inserts into a collection off the request path.
+
+    add() gives the document a client-side ``_id`` and returns at once; a
+    background task writes queued documents with one insert_many() per
+    batch, as soon as ``max_batch`` documents are queued or the oldest has
+    waited ``max_delay`` seconds, so a write is delayed by at most about
+    ``max_delay`` plus the insert itself. Failed batches are retried
+    ``max_attempts`` times with backoff, then written one by one so a
+    single bad document does not drop the others. flush() waits until
+    everything added so far is written (used before reads that need it and
+    on shutdown).
+    """
+
+    def __init__(self, name: str, collection_getter: Callable, max_batch: int = 100,
+                 max_delay: float = 0.05, max_queue: int = 10000, max_attempts: int = 3):
+        self.name = name
+        self._collection_getter = collection_getter
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max_delay
+        self.max_queue = max_queue
+        self.max_attempts = max_attempts
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._unwritten = 0
+        self.written = 0
+        self.batches = 0
+        self.retries = 0
+        self.dropped = 0
+        self.max_flush_seconds = 0.0
+
+    @property
+    def collection(self):
+        return self._collection_getter()
+
+    def start(self):
+        """Start the writer on the running event loop"""
+        if self._task is not None and not self._task.done():
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._task = asyncio.create_task(self._writer())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        await self.flush()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def add(self, document: dict) -> dict:
+        """Queue a document for insertion; returns it with its ``_id`` set. Must run on the event loop."""
+        document.setdefault("_id", ObjectId())
+        self.start()
+        try:
+            self._queue.put_nowait((time.monotonic(), document))
+        except asyncio.QueueFull:
+            # The database is falling behind: write this one directly (still off the loop)
+            print(f"⚠️ {self.name} write buffer full, writing directly")
+            asyncio.create_task(run_in_threadpool(self._insert_one, document))
+            return document
+        self._unwritten += 1
+        self._idle.clear()
+        return document
+
+    async def flush(self):
+        if self._idle is not None:
+            await self._idle.wait()
+
+    async def _writer(self):
+        while True:
+            queued_at, document = await self._queue.get()
+            batch: List[dict] = [document]
+            deadline = queued_at + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    _, document = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(document)
+            await run_in_threadpool(self._write, batch)
+            self.max_flush_seconds = max(self.max_flush_seconds, time.monotonic() - queued_at)
+            self._unwritten -= len(batch)
+            if self._unwritten <= 0:
+                self._idle.set()
+
+    def _write(self, batch: List[dict]):
+        for attempt in range(self.max_attempts):
+            try:
+                self.collection.insert_many(batch, ordered=False)
+                self.written += len(batch)
+                self.batches += 1
+                return
+            except Exception as e:
+                if type(e).__name__ == "BulkWriteError":
+                    break  # Some documents were written; sort out the rest one by one
+                self.retries += 1
+                print(f"⚠️ {self.name} batch of {len(batch)} failed (attempt {attempt + 1}): {e}")
+                time.sleep(min(2.0, 0.1 * 2 ** attempt))
+        for document in batch:
+            self._insert_one(document)
+
+    def _insert_one(self, document: dict):
+        try:
+            self.collection.insert_one(document)
+            self.written += 1
+        except Exception as e:
+            if type(e).__name__ == "DuplicateKeyError":
+                self.written += 1  # Already written by the failed batch
+                return
+            self.dropped += 1
+            print(f"❌ {self.name} write of {document.get('_id')} failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "running": self._task is not None and not self._task.done(),
+            "queued": self._unwritten,
+            "written": self.written,
+            "batches": self.batches,
+            "retries": self.retries,
+            "dropped": self.dropped,
+            "max_batch": self.max_batch,
+            "max_delay_seconds": self.max_delay,
+            "max_flush_seconds": round(self.max_flush_seconds, 4),
+        }
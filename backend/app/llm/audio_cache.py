@@ -0,0 +1,143 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional, Set
+
+# Cached speech files are named after the hash of what was spoken and how
+_CACHE_FILE_RE = re.compile(r"^tts_[0-9a-f]{32}\.mp3$")
+
+
+class AudioCache:
+    """Content-addressed store of synthesized speech in one directory.
+
+    A reply's audio file is named after a hash of (text, voice, rate), so the
+    same text (canned error messages, cached replies) is synthesized once and
+    its file reused. Files are evicted least recently used first when the
+    cache exceeds ``max_bytes``; file mtimes record the last use, so the LRU
+    order survives restarts.
+
+    Other files in the directory (audio from older versions, interrupted
+    writes) are removed by cleanup() once they are older than the grace
+    period and no chat message references them.
+    """
+
+    def __init__(self, directory: str = "responses", url_prefix: str = "/responses",
+                 max_bytes: int = 500 * 1024 * 1024):
+        self.directory = directory
+        self.url_prefix = url_prefix
+        self.max_bytes = max_bytes
+        self._files = OrderedDict()  # file name -> size, least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.orphans_removed = 0
+        os.makedirs(directory, exist_ok=True)
+        self.scan()
+
+    @staticmethod
+    def key(text: str, voice: Optional[str], rate: Optional[int]) -> str:
+        data = f"{voice or ''}\x00{rate or ''}\x00{text}"
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()[:32]
+
+    @staticmethod
+    def filename(key: str) -> str:
+        return f"tts_{key}.mp3"
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, self.filename(key))
+
+    def url(self, key: str) -> str:
+        return f"{self.url_prefix}/{self.filename(key)}"
+
+    def scan(self):
+        """Index the cached files already on disk, oldest use first"""
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and _CACHE_FILE_RE.match(entry.name):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+        with self._lock:
+            self._files = OrderedDict((name, size) for _, name, size in sorted(files))
+            self._bytes = sum(self._files.values())
+
+    def get(self, key: str) -> Optional[str]:
+        """URL of the cached audio for ``key``, or None"""
+        name = self.filename(key)
+        with self._lock:
+            cached = name in self._files
+            if cached:
+                self._files.move_to_end(name)
+        if cached:
+            try:
+                os.utime(self.path(key))
+            except FileNotFoundError:
+                with self._lock:
+                    self._bytes -= self._files.pop(name, 0)
+                cached = False
+        with self._lock:
+            if cached:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return self.url(key) if cached else None
+
+    def add(self, key: str):
+        """Index a newly written file and evict the least recently used ones over the size limit"""
+        name = self.filename(key)
+        size = os.path.getsize(self.path(key))
+        evicted = []
+        with self._lock:
+            self._bytes += size - self._files.pop(name, 0)
+            self._files[name] = size
+            while self._bytes > self.max_bytes and len(self._files) > 1:
+                old_name, old_size = self._files.popitem(last=False)
+                self._bytes -= old_size
+                self.evictions += 1
+                evicted.append(old_name)
+        for old_name in evicted:
+            try:
+                os.remove(os.path.join(self.directory, old_name))
+            except FileNotFoundError:
+                pass
+
+    def cleanup(self, referenced: Callable[[Iterable[str]], Set[str]] = None, grace_seconds: float = 3600) -> int:
+        """Remove files that are not cached audio, older than ``grace_seconds``
+        and (when ``referenced`` is given) not referenced by any message URL"""
+        cutoff = time.time() - grace_seconds
+        candidates = [entry.name for entry in os.scandir(self.directory)
+                      if entry.is_file() and not _CACHE_FILE_RE.match(entry.name)
+                      and entry.stat().st_mtime < cutoff]
+        if referenced is not None and candidates:
+            in_use = referenced([f"{self.url_prefix}/{name}" for name in candidates])
+            candidates = [name for name in candidates if f"{self.url_prefix}/{name}" not in in_use]
+        for name in candidates:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self.orphans_removed += len(candidates)
+        if candidates:
+            print(f"🧹 Removed {len(candidates)} orphaned audio files from {self.directory}")
+        return len(candidates)
+
+    def stats(self) -> dict:
+        disk_bytes = sum(entry.stat().st_size for entry in os.scandir(self.directory) if entry.is_file())
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._files),
+                "cache_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "disk_bytes": disk_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "orphans_removed": self.orphans_removed,
+            }
@@ -0,0 +1,182 @@
+"""
+Chat throughput benchmark.
+
+Runs chat completions through the LLM gateway (same limits, prompts and
+provider interface as the API) and reports throughput and latency. With
+the stub provider it needs no network or API key:
+
+    python -m app.llm.benchmark --provider stub --requests 500 --concurrency 50 --mode stream
+    python -m app.llm.benchmark --provider openai --base-url http://127.0.0.1:8080 --mode batch
+
+--url benchmarks a running API instead (POST /api/chat/stream), e.g. one
+started with LLM_PROVIDER=stub:
+
+    python -m app.llm.benchmark --url http://127.0.0.1:8000/api/chat/stream --requests 200
+
+Repeated questions are answered from the chat response cache there; start
+the API with CHAT_CACHE_ENABLED=false to measure the LLM path. Keep
+--concurrency within LLM_MAX_IN_FLIGHT + LLM_MAX_QUEUE or calls are shed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+# Allow running as a script from this directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import httpx
+
+from app.core.config import settings
+from app.llm.gateway import LlmError, llm_gateway
+from app.llm.prompts import prompt_builder
+from app.llm.providers import OpenAICompatibleProvider, StubProvider, create_provider
+
+QUESTIONS = [
+    "Hello!",
+    "I have a mild headache since this morning, what should I do?",
+    "Explain the difference between a cold and the flu.",
+    "My child has a fever of 38.5 C, is that serious?",
+    "Can you give me a diet plan for high blood pressure?",
+    "I feel tired all the time and sleep badly.",
+    "What are the side effects of paracetamol?",
+    "Thank you for the advice",
+]
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(p / 100 * len(values)))], 3)
+
+
+async def run_gateway(mode: str, requests: int, concurrency: int) -> list:
+    """(seconds, first token seconds, completion tokens, error) per request"""
+    prompts = [prompt_builder.build(QUESTIONS[i % len(QUESTIONS)]) for i in range(requests)]
+
+    if mode == "batch":
+        started = time.monotonic()
+        results = []
+        for offset in range(0, requests, concurrency):
+            batch = prompts[offset:offset + concurrency]
+            # One max_tokens per batch: the largest of its prompts
+            completions = await llm_gateway.complete_batch([p.messages for p in batch],
+                                                           max_tokens=max(p.max_tokens for p in batch))
+            elapsed = time.monotonic() - started
+            for completion in completions:
+                if isinstance(completion, LlmError):
+                    results.append((elapsed, None, 0, str(completion)))
+                else:
+                    results.append((completion.seconds, None, completion.usage.get("completion_tokens") or 0, None))
+        return results
+
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(prompt):
+        async with limit:
+            started = time.monotonic()
+            first = None
+            try:
+                if mode == "stream":
+                    usage = {}
+                    async for _ in llm_gateway.stream(prompt.messages, max_tokens=prompt.max_tokens, usage=usage):
+                        if first is None:
+                            first = time.monotonic() - started
+                else:
+                    usage = (await llm_gateway.complete(prompt.messages, max_tokens=prompt.max_tokens)).usage
+            except LlmError as e:
+                return time.monotonic() - started, first, 0, str(e)
+            return time.monotonic() - started, first, usage.get("completion_tokens") or 0, None
+
+    return await asyncio.gather(*(one(prompt) for prompt in prompts))
+
+
+async def run_api(url: str, requests: int, concurrency: int) -> list:
+    limit = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(timeout=120, limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def one(i):
+            async with limit:
+                started = time.monotonic()
+                first = None
+                tokens = 0
+                data = {"sender": f"bench-{i % concurrency}", "timestamp": str(started),
+                        "session_id": f"bench-{i}", "text": QUESTIONS[i % len(QUESTIONS)]}
+                try:
+                    async with client.stream("POST", url, data=data) as response:
+                        if response.status_code >= 400:
+                            return time.monotonic() - started, None, 0, f"HTTP {response.status_code}"
+                        event = None
+                        async for line in response.aiter_lines():
+                            if line.startswith("event:"):
+                                event = line[6:].strip()
+                            elif line.startswith("data:") and event == "token":
+                                if first is None:
+                                    first = time.monotonic() - started
+                                tokens += len(json.loads(line[5:])["text"].split())
+                except httpx.HTTPError as e:
+                    return time.monotonic() - started, first, tokens, type(e).__name__
+                return time.monotonic() - started, first, tokens, None
+
+        return await asyncio.gather(*(one(i) for i in range(requests)))
+
+
+def report(results: list, wall: float, label: str):
+    ok = [r for r in results if r[3] is None]
+    errors = [r[3] for r in results if r[3] is not None]
+    latencies = [r[0] for r in ok]
+    first_tokens = [r[1] for r in ok if r[1] is not None]
+    tokens = sum(r[2] for r in ok)
+    print(f"\n📊 {label}")
+    print(f"   requests: {len(ok)} ok, {len(errors)} failed in {wall:.2f}s")
+    print(f"   throughput: {len(ok) / wall:.1f} req/s, {tokens / wall:.0f} completion tokens/s")
+    print(f"   latency p50/p95/p99: {percentile(latencies, 50)} / {percentile(latencies, 95)} / "
+          f"{percentile(latencies, 99)} s")
+    if first_tokens:
+        print(f"   first token p50/p95: {percentile(first_tokens, 50)} / {percentile(first_tokens, 95)} s")
+    if errors:
+        print(f"   first error: {errors[0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chat throughput benchmark")
+    parser.add_argument("--provider", default=settings.LLM_PROVIDER, help="groq, openai or stub")
+    parser.add_argument("--base-url", help="OpenAI-compatible server for --provider openai")
+    parser.add_argument("--mode", choices=["stream", "complete", "batch"], default="stream")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=settings.LLM_MAX_IN_FLIGHT)
+    parser.add_argument("--first-token-ms", type=float, help="stub provider latency")
+    parser.add_argument("--token-ms", type=float, help="stub provider time per token")
+    parser.add_argument("--tokens", type=int, help="stub provider reply length")
+    parser.add_argument("--url", help="benchmark a running API (POST /api/chat/stream) instead of the gateway")
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    if args.url:
+        results = asyncio.run(run_api(args.url, args.requests, args.concurrency))
+        report(results, time.monotonic() - started, f"API {args.url}, concurrency {args.concurrency}")
+        return
+
+    provider = create_provider(args.provider)
+    if isinstance(provider, OpenAICompatibleProvider) and args.base_url:
+        provider.base_url = args.base_url.rstrip("/")
+    if isinstance(provider, StubProvider):
+        provider.first_token_ms = args.first_token_ms if args.first_token_ms is not None else provider.first_token_ms
+        provider.token_ms = args.token_ms if args.token_ms is not None else provider.token_ms
+        provider.tokens = args.tokens if args.tokens is not None else provider.tokens
+    llm_gateway.provider = provider
+    try:
+        results = asyncio.run(run_gateway(args.mode, args.requests, args.concurrency))
+        report(results, time.monotonic() - started,
+               f"{provider.name} ({provider.model}), {args.mode}, concurrency {args.concurrency}, "
+               f"gateway limit {llm_gateway.max_in_flight}")
+        print(f"   gateway: {llm_gateway.stats()}")
+    finally:
+        llm_gateway.close()
+
+
+if __name__ == "__main__":
+    main()
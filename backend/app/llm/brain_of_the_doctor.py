@@ -1,55 +1,36 @@
-from groq import Groq
 from dotenv import load_dotenv
 import os
+import sys
+
+# Allow running as a script from this directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.llm.conversation import conversation_store
+from app.llm.gateway import llm_gateway
+from app.llm.prompts import prompt_builder
 
 # Load environment variables
 load_dotenv()
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-
-# Initialize the Groq client
-client = Groq(api_key=GROQ_API_KEY)
 
-# Memory to store last query and answer
-chat_history = []
+# Conversation of the command-line session
+CLI_SESSION_ID = "cli"
 
 # Analyze function
-def analyze(query_text):
-    global chat_history
-
+def analyze(query_text, session_id=CLI_SESSION_ID):
     include_previous = query_text.lower().startswith("previous")
     
     if include_previous:
         query_text = query_text[len("previous"):].strip()
-        previous_context = "\n\n".join(
-            [f"Q: {q}\nA: {a}" for q, a in chat_history[-3:]])
-        system_prompt = (
-            "You are a kind and empathetic medical assistant. Here's the previous conversation:\n"
-            f"{previous_context}\n\nContinue helping the user based on their new input. "
-            "Be supportive, use phrases like 'Don't worry', 'Take care', and 'It's good that you shared this'."
-        )
+        prompt = prompt_builder.build(query_text, conversation_store.turns(session_id))
     else:
-        system_prompt = (
-            "You are a kind, experienced medical assistant. Respond supportively and clearly, using phrases like "
-            "'Don't worry', 'Take care', and 'Thank you for sharing that'. Focus on helping the user feel reassured and informed."
-        )
-
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": query_text},
-    ]
-
-    response = client.chat.completions.create(
-        model="llama3-8b-8192",
-        messages=messages,
-        temperature=0.6,
-        max_tokens=1024,
-        top_p=1,
-    )
+        prompt = prompt_builder.build(query_text)
 
-    result = response.choices[0].message.content
+    completion = llm_gateway.complete_sync(prompt.messages, temperature=0.6, max_tokens=prompt.max_tokens, top_p=1)
+    prompt_builder.record(prompt, completion.usage, completion.seconds)
+    result = completion.text
 
     # Save to history
-    chat_history.append((query_text, result))
+    conversation_store.append(session_id, query_text, result)
 
     return result
 
@@ -4,3 +4,9 @@ import os
 load_dotenv()
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+# Set to the address of a local OpenAI-compatible server (e.g. app/llm/stub_server.py) to bypass api.groq.com
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None
+GROQ_CHAT_MODEL = os.getenv("GROQ_CHAT_MODEL", "llama3-8b-8192")
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com")
@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, List, Optional, Tuple
+
+from app.core.config import settings
+
+Turn = Tuple[str, str]  # (user query, assistant reply)
+
+
+class ConversationStore:
+    """Thread-safe, bounded conversation memory per chat session.
+
+    Each session keeps a ring buffer of its last ``max_turns`` turns (long
+    texts are clipped to ``max_turn_chars``). Sessions idle for longer than
+    ``ttl_seconds`` are evicted, and at most ``max_sessions`` are held (least
+    recently used first out), so memory stays flat however many users chat.
+
+    With a ``loader`` (session id, limit) -> turns, a session that is not in
+    memory (evicted, or after a restart) is rebuilt from the stored chats.
+    """
+
+    def __init__(self, max_turns: int = 8, ttl_seconds: float = 1800, max_sessions: int = 10000,
+                 max_turn_chars: int = 2000,
+                 loader: Optional[Callable[[str, int], List[Turn]]] = None):
+        self.max_turns = max(1, max_turns)
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max(1, max_sessions)
+        self.max_turn_chars = max_turn_chars
+        self.loader = loader
+        self._sessions = OrderedDict()  # session id -> (deque of turns, last access), oldest access first
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.loads = 0
+
+    def _clip(self, text: str) -> str:
+        text = text or ""
+        return text if len(text) <= self.max_turn_chars else text[:self.max_turn_chars] + "…"
+
+    def _evict(self, now: float):
+        # Sessions are ordered by last access, so expired ones are at the front
+        while self._sessions:
+            session_id, (_, last_access) = next(iter(self._sessions.items()))
+            if now - last_access <= self.ttl_seconds and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[session_id]
+            self.evictions += 1
+
+    def _touch(self, session_id: str, now: float, create: bool) -> Optional[deque]:
+        entry = self._sessions.pop(session_id, None)
+        if entry is None:
+            if not create:
+                return None
+            turns = deque(maxlen=self.max_turns)
+        else:
+            turns = entry[0]
+        self._sessions[session_id] = (turns, now)
+        self._evict(now)
+        return turns
+
+    def _load(self, session_id: str):
+        """Rebuild a session from storage (outside the lock; storage may be slow)"""
+        try:
+            turns = self.loader(session_id, self.max_turns)
+        except Exception as e:
+            print(f"⚠️ Could not load conversation {session_id}: {e}")
+            return
+        with self._lock:
+            if session_id in self._sessions:
+                return  # Created meanwhile by another request
+            session = self._touch(session_id, time.monotonic(), create=True)
+            session.extend((self._clip(q), self._clip(a)) for q, a in turns[-self.max_turns:])
+            self.loads += 1
+
+    def turns(self, session_id: str) -> List[Turn]:
+        """Turns of a session, oldest first"""
+        if not session_id:
+            return []
+        with self._lock:
+            session = self._touch(session_id, time.monotonic(), create=False)
+            if session is not None:
+                return list(session)
+        if self.loader is None:
+            return []
+        self._load(session_id)
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return list(session[0]) if session else []
+
+    def append(self, session_id: str, query: str, reply: str):
+        if not session_id:
+            return
+        with self._lock:
+            self._touch(session_id, time.monotonic(), create=True).append((self._clip(query), self._clip(reply)))
+
+    def clear(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._evict(time.monotonic())
+            return {
+                "sessions": len(self._sessions),
+                "turns": sum(len(turns) for turns, _ in self._sessions.values()),
+                "max_sessions": self.max_sessions,
+                "max_turns": self.max_turns,
+                "evictions": self.evictions,
+                "loads": self.loads,
+            }
+
+
+conversation_store = ConversationStore(
+    max_turns=settings.CHAT_MEMORY_TURNS,
+    ttl_seconds=settings.CHAT_MEMORY_TTL_SECONDS,
+    max_sessions=settings.CHAT_MEMORY_MAX_SESSIONS,
+    max_turn_chars=settings.CHAT_MEMORY_TURN_CHARS,
+)
@@ -0,0 +1,434 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, List, Optional, Union
+
+import httpx
+
+from app.core.config import settings
+from app.llm.config import GEMINI_API_KEY, GEMINI_BASE_URL, GEMINI_MODEL
+from app.llm.providers import create_provider
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    H2_AVAILABLE = True
+except ImportError:
+    H2_AVAILABLE = False
+
+# Responses worth retrying: rate limits and transient server errors
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class LlmError(Exception):
+    """A completion failed (non-retryable status, retries exhausted)"""
+
+
+class LlmUnavailable(LlmError):
+    """The provider is not configured (missing API key)"""
+
+
+class LlmOverloaded(LlmError):
+    """Shed: too many completions are already waiting for a slot"""
+
+
+class LlmDeadlineExceeded(LlmError):
+    """The call did not finish within its deadline"""
+
+
+@dataclass
+class Completion:
+    text: str
+    model: str
+    usage: dict = field(default_factory=dict)
+    attempts: int = 1
+    seconds: float = 0.0
+
+
+def _log_close_failure(future):
+    if not future.cancelled() and future.exception() is not None:
+        print(f"⚠️ Closing LLM stream failed: {future.exception()!r}")
+
+
+class LlmGateway:
+    """Single entry point for LLM calls (chat completions, Gemini).
+
+    Chat completions go to ``provider`` (see app/llm/providers.py): Groq, any
+    OpenAI-compatible server such as llama.cpp, or the in-process stub. All
+    of them get the same complete / stream / complete_batch interface and
+    the same limits below.
+
+    All requests share one httpx.AsyncClient (HTTP/2 when h2 is installed,
+    keep-alive pool otherwise) that lives on a dedicated event loop thread,
+    so async routes, threadpool code (report queue, sync helpers) and CLI
+    scripts all go through the same pool and the same limits:
+
+    - at most ``max_in_flight`` completions run at once (global semaphore);
+    - when ``max_queue`` calls are already waiting for a slot, new calls are
+      rejected at once with LlmOverloaded instead of piling up;
+    - every call has a deadline covering the wait for a slot, all attempts
+      and the backoff between them;
+    - 429/5xx responses and transport errors are retried with full-jitter
+      exponential backoff (Retry-After is honoured when sent).
+    """
+
+    def __init__(self, provider, max_in_flight: int = 8, max_queue: int = 32, deadline: float = 30.0,
+                 max_retries: int = 3, backoff_base: float = 0.5, backoff_cap: float = 8.0,
+                 max_connections: int = 20, http2: bool = True):
+        self.provider = provider
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.max_connections = max_connections
+        self.http2 = http2 and H2_AVAILABLE
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+        self.counters = {"completed": 0, "failed": 0, "shed": 0, "retries": 0, "deadline_exceeded": 0}
+        self._latency_total = 0.0
+
+    # Event loop thread
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-gateway", daemon=True).start()
+                asyncio.run_coroutine_threadsafe(self._setup(), loop).result()
+                self._loop = loop
+        return self._loop
+
+    async def _setup(self):
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._client = httpx.AsyncClient(
+            http2=self.http2,
+            limits=httpx.Limits(max_connections=self.max_connections,
+                                max_keepalive_connections=self.max_connections),
+            timeout=httpx.Timeout(self.deadline, connect=5.0),
+        )
+
+    def _submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_started())
+
+    async def _run(self, coro):
+        """Await a coroutine on the gateway loop from any other event loop"""
+        return await asyncio.wrap_future(self._submit(coro))
+
+    def close(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._client.aclose(), loop).result(timeout=5)
+        loop.call_soon_threadsafe(loop.stop)
+
+    # Limits
+
+    def check_capacity(self):
+        """Raise LlmOverloaded when a new call would be shed"""
+        if self.in_flight + self.waiting >= self.max_in_flight + self.max_queue:
+            raise LlmOverloaded(f"LLM gateway overloaded ({self.in_flight} running, {self.waiting} waiting)")
+
+    @asynccontextmanager
+    async def _slot(self, deadline_at: float):
+        try:
+            self.check_capacity()
+        except LlmOverloaded:
+            self.counters["shed"] += 1
+            raise
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=max(0.0, deadline_at - time.monotonic()))
+        except asyncio.TimeoutError:
+            self.counters["deadline_exceeded"] += 1
+            raise LlmDeadlineExceeded("Timed out waiting for a free LLM slot")
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def _backoff(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_cap)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    async def _send(self, url: str, headers: dict, payload: dict, deadline_at: float, stream: bool = False):
+        """POST with retries; returns (response, attempts). Streamed responses must be closed by the caller."""
+        attempt = 0
+        while True:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                self.counters["deadline_exceeded"] += 1
+                raise LlmDeadlineExceeded("LLM call deadline exceeded")
+            retry_after = None
+            try:
+                request = self._client.build_request("POST", url, json=payload, headers=headers,
+                                                     timeout=httpx.Timeout(remaining, connect=min(remaining, 5.0)))
+                response = await self._client.send(request, stream=stream)
+                if response.status_code < 400:
+                    return response, attempt + 1
+                if stream:
+                    await response.aread()
+                    await response.aclose()
+                if response.status_code not in RETRY_STATUS:
+                    raise LlmError(f"LLM request failed with HTTP {response.status_code}: {response.text[:200]}")
+                error = f"HTTP {response.status_code}"
+                retry_after = response.headers.get("retry-after")
+            except httpx.TimeoutException:
+                error = "timeout"
+            except httpx.TransportError as e:
+                error = f"{type(e).__name__}: {e}"
+
+            attempt += 1
+            if attempt > self.max_retries:
+                raise LlmError(f"LLM request failed after {attempt} attempts ({error})")
+            delay = self._backoff(attempt - 1, retry_after)
+            if time.monotonic() + delay >= deadline_at:
+                self.counters["deadline_exceeded"] += 1
+                raise LlmDeadlineExceeded(f"LLM call deadline exceeded while retrying ({error})")
+            self.counters["retries"] += 1
+            print(f"🔁 LLM request {error}, retry {attempt}/{self.max_retries} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    def _record(self, started: float, ok: bool):
+        self.counters["completed" if ok else "failed"] += 1
+        if ok:
+            self._latency_total += time.monotonic() - started
+
+    # Chat completions (configured provider)
+
+    def _check_provider(self):
+        reason = self.provider.unavailable()
+        if reason:
+            raise LlmUnavailable(reason)
+
+    async def _generate_local(self, provider, messages, max_tokens, deadline_at, usage) -> str:
+        parts = []
+
+        async def collect():
+            async for delta in provider.generate(messages, max_tokens, usage):
+                parts.append(delta)
+
+        try:
+            await asyncio.wait_for(collect(), timeout=max(0.0, deadline_at - time.monotonic()))
+        except asyncio.TimeoutError:
+            self.counters["deadline_exceeded"] += 1
+            raise LlmDeadlineExceeded("LLM call deadline exceeded")
+        return "".join(parts)
+
+    async def _complete(self, messages, model, max_tokens, temperature, top_p, deadline) -> Completion:
+        provider = self.provider
+        self._check_provider()
+        started = time.monotonic()
+        deadline_at = started + (deadline or self.deadline)
+        attempts = 1
+        try:
+            async with self._slot(deadline_at):
+                if provider.local:
+                    usage = {}
+                    text = await self._generate_local(provider, messages, max_tokens, deadline_at, usage)
+                    model = model or provider.model
+                else:
+                    url, headers, payload = provider.request(messages, model, max_tokens, temperature, top_p, False)
+                    response, attempts = await self._send(url, headers, payload, deadline_at)
+                    text, response_model, usage = provider.parse_completion(response.json())
+                    model = response_model or payload["model"]
+        except (KeyError, IndexError, ValueError):
+            self._record(started, False)
+            raise LlmError("LLM returned a malformed completion")
+        except LlmError:
+            self._record(started, False)
+            raise
+        self._record(started, True)
+        return Completion(text, model, usage, attempts, time.monotonic() - started)
+
+    async def complete(self, messages: List[dict], model: str = None, max_tokens: int = 1024,
+                       temperature: float = 0.6, top_p: float = 1, deadline: float = None) -> Completion:
+        return await self._run(self._complete(messages, model, max_tokens, temperature, top_p, deadline))
+
+    def complete_sync(self, messages: List[dict], model: str = None, max_tokens: int = 1024,
+                      temperature: float = 0.6, top_p: float = 1, deadline: float = None) -> Completion:
+        """complete() for threadpool code and scripts (must not be called on the gateway loop)"""
+        return self._submit(self._complete(messages, model, max_tokens, temperature, top_p, deadline)).result()
+
+    async def _stream(self, messages, model, max_tokens, temperature, top_p, deadline, usage):
+        provider = self.provider
+        self._check_provider()
+        started = time.monotonic()
+        deadline_at = started + (deadline or self.deadline)
+        ok = False
+        try:
+            async with self._slot(deadline_at):
+                if provider.local:
+                    async for delta in provider.generate(messages, max_tokens, usage):
+                        yield delta
+                        if time.monotonic() > deadline_at:
+                            self.counters["deadline_exceeded"] += 1
+                            raise LlmDeadlineExceeded("LLM stream deadline exceeded")
+                    ok = True
+                    return
+                url, headers, payload = provider.request(messages, model, max_tokens, temperature, top_p, True)
+                # Retries happen only before the first token has been received
+                response, _ = await self._send(url, headers, payload, deadline_at, stream=True)
+                try:
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[5:].strip()
+                        if data == "[DONE]":
+                            break
+                        for delta in provider.parse_chunk(json.loads(data), usage):
+                            yield delta
+                        if time.monotonic() > deadline_at:
+                            self.counters["deadline_exceeded"] += 1
+                            raise LlmDeadlineExceeded("LLM stream deadline exceeded")
+                    ok = True
+                except httpx.HTTPError as e:
+                    raise LlmError(f"LLM stream interrupted: {type(e).__name__}") from e
+                finally:
+                    await response.aclose()
+        finally:
+            self._record(started, ok)
+
+    async def stream(self, messages: List[dict], model: str = None, max_tokens: int = 1024,
+                     temperature: float = 0.6, top_p: float = 1, deadline: float = None,
+                     usage: dict = None) -> AsyncIterator[str]:
+        """Yield response text deltas as the provider generates them (stream mode).
+
+        ``usage`` (optional dict) receives the token usage reported at the end
+        of the stream. Closing the iterator early closes the upstream stream.
+        """
+        done = object()
+        agen = self._stream(messages, model, max_tokens, temperature, top_p,
+                            deadline or max(self.deadline, 60.0), usage)
+        reading = {}
+
+        async def next_delta():
+            reading["task"] = asyncio.current_task()
+            try:
+                return await agen.__anext__()
+            except StopAsyncIteration:
+                return done
+
+        try:
+            while True:
+                delta = await self._run(next_delta())
+                if delta is done:
+                    break
+                yield delta
+        finally:
+            closing = self._submit(self._close_stream(agen, reading.get("task")))
+            closing.add_done_callback(_log_close_failure)
+            # Bounded wait; when the consumer is being cancelled the close still completes on the gateway loop
+            await asyncio.wait([asyncio.wrap_future(closing)], timeout=5)
+
+    @staticmethod
+    async def _close_stream(agen, reading: Optional[asyncio.Task]):
+        """Close an upstream stream on the gateway loop.
+
+        A read still in progress (the consumer was cancelled mid-read) is
+        cancelled and awaited first; aclose() on a running generator fails.
+        """
+        if reading is not None and not reading.done():
+            reading.cancel()
+            await asyncio.gather(reading, return_exceptions=True)
+        await agen.aclose()
+
+    async def _complete_batch(self, batch, model, max_tokens, temperature, top_p, deadline) -> list:
+        # At most max_in_flight calls of the batch wait or run at once, so a batch is not shed by its own size
+        limit = asyncio.Semaphore(self.max_in_flight)
+
+        async def one(messages):
+            async with limit:
+                try:
+                    return await self._complete(messages, model, max_tokens, temperature, top_p, deadline)
+                except LlmError as e:
+                    return e
+
+        return await asyncio.gather(*(one(messages) for messages in batch))
+
+    async def complete_batch(self, batch: List[List[dict]], model: str = None, max_tokens: int = 1024,
+                             temperature: float = 0.6, top_p: float = 1,
+                             deadline: float = None) -> List[Union[Completion, LlmError]]:
+        """Complete several conversations concurrently; failed items are returned as their LlmError"""
+        return await self._run(self._complete_batch(batch, model, max_tokens, temperature, top_p, deadline))
+
+    def complete_batch_sync(self, batch: List[List[dict]], model: str = None, max_tokens: int = 1024,
+                            temperature: float = 0.6, top_p: float = 1,
+                            deadline: float = None) -> List[Union[Completion, LlmError]]:
+        return self._submit(self._complete_batch(batch, model, max_tokens, temperature, top_p, deadline)).result()
+
+    # Gemini (generateContent REST API)
+
+    async def _gemini(self, prompt, model, deadline) -> Completion:
+        if not GEMINI_API_KEY:
+            raise LlmUnavailable("GEMINI_API_KEY not set")
+        model = model or GEMINI_MODEL
+        url = f"{GEMINI_BASE_URL.rstrip('/')}/v1beta/models/{model}:generateContent"
+        payload = {"contents": [{"parts": [{"text": prompt}]}]}
+        started = time.monotonic()
+        deadline_at = started + (deadline or self.deadline)
+        try:
+            async with self._slot(deadline_at):
+                response, attempts = await self._send(url, {"x-goog-api-key": GEMINI_API_KEY}, payload, deadline_at)
+            data = response.json()
+            parts = data["candidates"][0]["content"]["parts"]
+        except (KeyError, IndexError, ValueError):
+            self._record(started, False)
+            raise LlmError("Gemini returned no candidates")
+        except LlmError:
+            self._record(started, False)
+            raise
+        self._record(started, True)
+        usage = data.get("usageMetadata") or {}
+        return Completion("".join(part.get("text", "") for part in parts), model,
+                          {"prompt_tokens": usage.get("promptTokenCount"),
+                           "completion_tokens": usage.get("candidatesTokenCount"),
+                           "total_tokens": usage.get("totalTokenCount")},
+                          attempts, time.monotonic() - started)
+
+    async def gemini(self, prompt: str, model: str = None, deadline: float = None) -> Completion:
+        return await self._run(self._gemini(prompt, model, deadline))
+
+    def stats(self) -> dict:
+        completed = self.counters["completed"]
+        return {
+            "provider": self.provider.name,
+            "model": self.provider.model,
+            "http2": self.http2,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            **self.counters,
+            "avg_latency_s": round(self._latency_total / completed, 3) if completed else None,
+        }
+
+
+llm_gateway = LlmGateway(
+    create_provider(settings.LLM_PROVIDER),
+    max_in_flight=settings.LLM_MAX_IN_FLIGHT,
+    max_queue=settings.LLM_MAX_QUEUE,
+    deadline=settings.LLM_DEADLINE_SECONDS,
+    max_retries=settings.LLM_MAX_RETRIES,
+    backoff_base=settings.LLM_BACKOFF_BASE_SECONDS,
+    backoff_cap=settings.LLM_BACKOFF_CAP_SECONDS,
+    max_connections=settings.LLM_MAX_CONNECTIONS,
+    http2=settings.LLM_HTTP2,
+)
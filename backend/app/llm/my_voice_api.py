@@ -1,14 +1,17 @@
 import os
-import uuid
 import shutil
 from datetime import datetime
 from dotenv import load_dotenv
-from groq import Groq
-import pyttsx3
 import speech_recognition as sr
 from pydub import AudioSegment
 from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
 import numpy as np
+from app.llm.conversation import conversation_store
+from app.llm.gateway import LlmError, LlmUnavailable, llm_gateway
+from app.llm.prompts import prompt_builder
+from app.llm.response_cache import response_cache
+from app.llm.tts import tts_service
 
 # Optional imports for better audio processing
 try:
@@ -22,64 +25,89 @@ except ImportError:
 
 # Load all environment variables
 load_dotenv()
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-
-# Initialize Groq client only if API key is available
-if GROQ_API_KEY and GROQ_API_KEY != "your_groq_api_key_here":
-    client = Groq(api_key=GROQ_API_KEY)
-else:
-    client = None
-    print("Warning: GROQ_API_KEY not set. Groq functionality will be disabled.")
-
-tts = pyttsx3.init()
 
 UPLOAD_DIR = "uploads"
 RESPONSE_DIR = "responses"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(RESPONSE_DIR, exist_ok=True)
 
-chat_history = []
+def is_follow_up(query_text: str) -> bool:
+    """Questions starting with "previous" are answered with the session's earlier turns"""
+    return query_text.lower().startswith("previous")
+
+def cached_reply(query_text: str):
+    """Reply to the same (or a very similar) earlier question; None for follow-ups, whose reply depends on context"""
+    if is_follow_up(query_text):
+        response_cache.bypass()
+        return None
+    reply, _ = response_cache.get(query_text)
+    return reply
 
-def analyze(query_text: str):
-    global chat_history
+def cache_reply(query_text: str, reply: str):
+    if not is_follow_up(query_text):
+        response_cache.put(query_text, reply)
 
-    include_previous = query_text.lower().startswith("previous")
+def build_prompt(query_text: str, session_id: str = None) -> tuple:
+    """(query without the "previous" prefix, Prompt for the LLM)
 
-    if include_previous:
+    The "previous" prefix adds the recent turns of this session only, within
+    the conversation token budget (see PromptBuilder).
+    """
+    if is_follow_up(query_text):
         query_text = query_text[len("previous"):].strip()
-        previous_context = "\n\n".join([f"Q: {q}\nA: {a}" for q, a in chat_history[-3:]])
-        system_prompt = (
-            "You are a kind and empathetic medical assistant. Here's the previous conversation:\n"
-            f"{previous_context}\n\nContinue helping the user based on their new input. "
-            "Be supportive, use phrases like 'Don't worry', 'Take care', and 'It's good that you shared this'."
-        )
-    else:
-        system_prompt = (
-            "You are a kind, experienced medical assistant. Respond supportively and clearly, using phrases like "
-            "'Don't worry', 'Take care', and 'Thank you for sharing that'. Focus on helping the user feel reassured and informed."
-        )
+        return query_text, prompt_builder.build(query_text, conversation_store.turns(session_id))
+    return query_text, prompt_builder.build(query_text)
 
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": query_text},
-    ]
+def fallback_reply(error: Exception) -> str:
+    """Reply shown instead of the LLM answer when the completion failed"""
+    if isinstance(error, LlmUnavailable):
+        return "I'm sorry, but the AI service is currently unavailable. Please check the LLM provider configuration (LLM_PROVIDER, GROQ_API_KEY)."
+    return f"I'm sorry, there was an error processing your request: {str(error)}"
 
-    if client is None:
-        result = "I'm sorry, but the AI service is currently unavailable. Please check your GROQ_API_KEY configuration."
-    else:
-        try:
-            response = client.chat.completions.create(
-                model="llama3-8b-8192",
-                messages=messages,
-                temperature=0.6,
-                max_tokens=1024,
-                top_p=1,
-            )
-            result = response.choices[0].message.content
-        except Exception as e:
-            result = f"I'm sorry, there was an error processing your request: {str(e)}"
+async def analyze_async(query_text: str, session_id: str = None, usage: dict = None):
+    """analyze() for async routes: the completion does not hold a threadpool thread
+
+    ``usage`` receives the token usage of the completion (left empty for
+    cached replies). LlmError is raised instead of returning fallback_reply():
+    the caller shows the fallback, but an error is not a turn of the
+    conversation and must not go back to the model as context.
+    """
+    result = cached_reply(query_text)
+    if result is not None:
+        conversation_store.append(session_id, query_text, result)
+        return result
+
+    # The session may be reloaded from the database
+    question = query_text
+    query_text, prompt = await run_in_threadpool(build_prompt, query_text, session_id)
+    completion = await llm_gateway.complete(prompt.messages, temperature=0.6, max_tokens=prompt.max_tokens, top_p=1)
+    prompt_builder.record(prompt, completion.usage, completion.seconds)
+    if usage is not None:
+        usage.update(completion.usage)
+    result = completion.text
+    cache_reply(question, result)
+    conversation_store.append(session_id, query_text, result)
+    return result
+
+def analyze(query_text: str, session_id: str = None):
+    result = cached_reply(query_text)
+    if result is not None:
+        conversation_store.append(session_id, query_text, result)
+        return result
+
+    question = query_text
+    query_text, prompt = build_prompt(query_text, session_id)
+
+    try:
+        completion = llm_gateway.complete_sync(prompt.messages, temperature=0.6, max_tokens=prompt.max_tokens, top_p=1)
+        prompt_builder.record(prompt, completion.usage, completion.seconds)
+        result = completion.text
+        cache_reply(question, result)
+    except LlmError as e:
+        # Not added to the conversation: it would go back to the model as an assistant turn
+        return fallback_reply(e)
 
-    chat_history.append((query_text, result))
+    conversation_store.append(session_id, query_text, result)
     return result
 
 def speech_to_text(file_location: str):
@@ -558,12 +586,9 @@ def speech_to_text(file_location: str):
         return "I couldn't process the audio. Could you type your message instead?"
 
 def text_to_speech(text: str):
-    unique_id = uuid.uuid4().hex
-    audio_filename = f"{unique_id}_response.mp3"
-    full_path = os.path.join(RESPONSE_DIR, audio_filename)
-    tts.save_to_file(text, full_path)
-    tts.runAndWait()
-    return full_path, f"/responses/{audio_filename}"
+    """Synthesize and wait (chat routes submit to tts_service instead); returns (file path, URL)"""
+    audio_url = tts_service.synthesize(text)
+    return os.path.join(RESPONSE_DIR, os.path.basename(audio_url)), audio_url
 
 # ✅ New: Save and convert uploaded audio to WAV format
 def save_and_convert_audio(upload: UploadFile) -> tuple[dict, str]:
@@ -0,0 +1,286 @@
+import re
+import threading
+from dataclasses import dataclass
+from string import Template
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+Turn = Tuple[str, str]  # (user query, assistant reply)
+
+# --- Token counting ----------------------------------------------------------
+
+# Pre-tokenizer in the style of BPE tokenizers: words with their leading space,
+# digit groups, punctuation runs and line breaks
+_PIECE_RE = re.compile(r"'(?:s|t|re|ve|m|ll|d)\b| ?[^\W\d_]+| ?\d{1,3}| ?[^\w\s]+|\s*\n+|\s+")
+
+# Chat formatting tokens added per message and to prime the reply (OpenAI/Llama chat templates)
+MESSAGE_OVERHEAD = 4
+REPLY_OVERHEAD = 3
+
+_encoding = None
+
+
+def _get_encoding():
+    """tiktoken's cl100k encoding when installed and its vocabulary is available (it may need a download)"""
+    global _encoding, TIKTOKEN_AVAILABLE
+    if _encoding is None and TIKTOKEN_AVAILABLE:
+        try:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            TIKTOKEN_AVAILABLE = False
+            print(f"⚠️ tiktoken vocabulary not available, using the local token estimate: {e}")
+    return _encoding
+
+
+def _piece_tokens(piece: str) -> int:
+    # Common words are one token; long (e.g. medical) words split into chunks of about 5 letters
+    piece = piece.strip(" ")
+    if not piece:
+        return 0
+    if piece[0].isalpha():
+        return max(1, (len(piece) + 3) // 5)
+    if piece[0] in "\r\n\t":
+        return 1
+    return len(piece) if not piece[0].isdigit() else 1
+
+
+def count_tokens(text: str) -> int:
+    """Tokens of ``text`` for the chat model (tiktoken when available, otherwise a local BPE-like estimate)"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return sum(_piece_tokens(piece) for piece in _PIECE_RE.findall(text))
+
+
+def truncate_tokens(text: str, limit: int) -> str:
+    """The beginning of ``text`` that fits in ``limit`` tokens ("…" marks a cut)"""
+    if count_tokens(text) <= limit:
+        return text
+    limit = max(0, limit - 1)
+    encoding = _get_encoding()
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text)[:limit]).rstrip() + "…"
+    kept, used = [], 0
+    for piece in _PIECE_RE.findall(text):
+        used += _piece_tokens(piece)
+        if used > limit:
+            break
+        kept.append(piece)
+    return "".join(kept).rstrip() + "…"
+
+
+def count_message_tokens(messages: List[dict]) -> int:
+    return sum(count_tokens(m["content"]) + MESSAGE_OVERHEAD for m in messages) + REPLY_OVERHEAD
+
+
+# --- Templates ---------------------------------------------------------------
+
+SYSTEM_PROMPT = (
+    "You are a kind, experienced medical assistant. Respond supportively and clearly, using phrases like "
+    "'Don't worry', 'Take care', and 'Thank you for sharing that'. Focus on helping the user feel reassured and informed."
+)
+FOLLOW_UP_TEMPLATE = Template(
+    "You are a kind and empathetic medical assistant. Here's the previous conversation:\n"
+    "$context\n\nContinue helping the user based on their new input. "
+    "Be supportive, use phrases like 'Don't worry', 'Take care', and 'It's good that you shared this'."
+)
+TURN_TEMPLATE = Template("Q: $query\nA: $reply")
+SUMMARY_TEMPLATE = Template("Earlier the user asked about: $topics")
+
+# Reply length per intent, checked in order; the hint keeps the answer within its max_tokens
+INTENTS = [
+    ("emergency", re.compile(r"\b(chest pain|can'?t breathe|cannot breathe|difficulty breathing|unconscious|"
+                             r"faint(ed|ing)|seizure|stroke|heart attack|overdose|suicid\w*|severe bleeding|"
+                             r"bleeding heavily|poison\w*)\b", re.I),
+     384, "If this may be an emergency, first tell the user to call emergency services or go to the nearest "
+          "hospital, then give brief first steps."),
+    ("greeting", re.compile(r"^\W*(hi|hello|hey|thanks|thank you|good (morning|afternoon|evening|night)|ok(ay)?|"
+                            r"bye|goodbye)\b[\w\s!.,']{0,30}$", re.I),
+     96, "Reply in one or two short sentences."),
+    ("detailed", re.compile(r"\b(explain|in detail|detailed|diet plan|meal plan|exercise plan|routine|schedule|"
+                            r"step[- ]by[- ]step|steps|list|compare|difference between|pros and cons|how does)\b", re.I),
+     None, None),  # Up to PROMPT_MAX_TOKENS
+    ("general", None, 512, "Keep the answer under 300 words."),
+]
+
+# Share of the context budget an extractive summary of older turns may use
+SUMMARY_SHARE = 0.25
+SUMMARY_TOPIC_TOKENS = 16
+
+
+@dataclass
+class Prompt:
+    messages: List[dict]
+    intent: str
+    max_tokens: int
+    prompt_tokens: int  # local estimate, including chat formatting
+    context_turns: int = 0
+    summarized_turns: int = 0
+    truncated: bool = False
+
+
+class PromptBuilder:
+    """Assembles chat prompts within a token budget.
+
+    The system prompts are fixed strings and templates compiled once.
+    Follow-up questions get the session's most recent turns verbatim, newest
+    first, as long as they fit in ``context_tokens``; older turns that do
+    not fit are summarized extractively (the start of each question) in a
+    quarter of the budget, and the rest dropped. A long user message is
+    truncated to ``max_query_tokens``.
+
+    The reply's ``max_tokens`` follows the intent of the question (short for
+    greetings, longer for explanations and plans) when ``adaptive``; the
+    system prompt then asks for an answer of that length. record() logs the
+    token usage reported by the provider and keeps totals for stats().
+    """
+
+    def __init__(self, context_tokens: int = 1200, max_query_tokens: int = 1500, max_tokens: int = 1024,
+                 adaptive: bool = True):
+        self.context_tokens = context_tokens
+        self.max_query_tokens = max_query_tokens
+        self.max_tokens = max_tokens
+        self.adaptive = adaptive
+        self._lock = threading.Lock()
+        self._totals: Dict[str, dict] = {}
+
+    def classify(self, query_text: str) -> str:
+        for intent, pattern, _, _ in INTENTS:
+            if pattern is None or pattern.search(query_text):
+                return intent
+        return "general"
+
+    def reply_budget(self, intent: str) -> Tuple[int, Optional[str]]:
+        """(max_tokens, length hint for the system prompt) of an intent"""
+        if not self.adaptive:
+            return self.max_tokens, None
+        for name, _, max_tokens, hint in INTENTS:
+            if name == intent:
+                return min(max_tokens or self.max_tokens, self.max_tokens), hint
+        return self.max_tokens, None
+
+    def fit_context(self, turns: List[Turn], budget: int = None) -> Tuple[str, int, int]:
+        """(context text, turns kept verbatim, turns summarized) for the turns within ``budget`` tokens"""
+        budget = self.context_tokens if budget is None else budget
+        kept = []
+        for query, reply in reversed(turns):
+            text = TURN_TEMPLATE.substitute(query=query, reply=reply)
+            cost = count_tokens(text) + 2
+            if cost > budget:
+                if not kept and budget > 0:
+                    # The last turn alone is over the budget: keep its beginning
+                    kept.append(truncate_tokens(text, budget - 2))
+                    budget = 0
+                break
+            budget -= cost
+            kept.append(text)
+        older = turns[:len(turns) - len(kept)]
+
+        summary = ""
+        summarized = 0
+        summary_budget = min(budget, int(self.context_tokens * SUMMARY_SHARE))
+        if older and summary_budget > SUMMARY_TOPIC_TOKENS:
+            topics = []
+            # Most recent older turns first, then restored to chronological order
+            for query, _ in reversed(older):
+                topic = truncate_tokens(re.split(r"(?<=[.?!])\s", query.strip(), 1)[0], SUMMARY_TOPIC_TOKENS)
+                candidate = SUMMARY_TEMPLATE.substitute(topics="; ".join([topic] + topics))
+                if count_tokens(candidate) > summary_budget:
+                    break
+                topics.insert(0, topic)
+            if topics:
+                summary = SUMMARY_TEMPLATE.substitute(topics="; ".join(topics))
+                summarized = len(topics)
+
+        parts = ([summary] if summary else []) + list(reversed(kept))
+        return "\n\n".join(parts), len(kept), summarized
+
+    def build(self, query_text: str, turns: List[Turn] = None) -> Prompt:
+        """Prompt for ``query_text``; ``turns`` (oldest first) are the conversation to continue, if any"""
+        intent = self.classify(query_text)
+        max_tokens, hint = self.reply_budget(intent)
+        truncated = count_tokens(query_text) > self.max_query_tokens
+        if truncated:
+            query_text = truncate_tokens(query_text, self.max_query_tokens)
+
+        context_turns = summarized = 0
+        if turns is None:
+            system_prompt = SYSTEM_PROMPT
+        else:
+            context, context_turns, summarized = self.fit_context(turns)
+            system_prompt = FOLLOW_UP_TEMPLATE.substitute(context=context)
+        if hint:
+            system_prompt = f"{system_prompt} {hint}"
+
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": query_text},
+        ]
+        return Prompt(messages, intent, max_tokens, count_message_tokens(messages),
+                      context_turns, summarized, truncated)
+
+    def record(self, prompt: Prompt, usage: dict = None, seconds: float = None):
+        """Log the token usage of a completion and add it to the totals"""
+        usage = usage or {}
+        prompt_tokens = usage.get("prompt_tokens") or prompt.prompt_tokens
+        completion_tokens = usage.get("completion_tokens") or 0
+        print(f"🧮 LLM {prompt.intent}: {prompt_tokens} prompt + {completion_tokens} completion tokens "
+              f"(max {prompt.max_tokens}, estimate {prompt.prompt_tokens}, {prompt.context_turns} context turns, "
+              f"{prompt.summarized_turns} summarized)" + (f" in {seconds:.2f}s" if seconds is not None else ""))
+        with self._lock:
+            totals = self._totals.setdefault(prompt.intent, {
+                "requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "reserved_tokens": 0,
+                "estimate_error": 0, "seconds": 0.0, "timed": 0})
+            totals["requests"] += 1
+            totals["prompt_tokens"] += prompt_tokens
+            totals["completion_tokens"] += completion_tokens
+            totals["reserved_tokens"] += prompt.max_tokens
+            if usage.get("prompt_tokens"):
+                totals["estimate_error"] += abs(prompt.prompt_tokens - usage["prompt_tokens"])
+            if seconds is not None:
+                totals["seconds"] += seconds
+                totals["timed"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            intents = {}
+            for intent, totals in self._totals.items():
+                requests = totals["requests"]
+                intents[intent] = {
+                    "requests": requests,
+                    "avg_prompt_tokens": round(totals["prompt_tokens"] / requests, 1),
+                    "avg_completion_tokens": round(totals["completion_tokens"] / requests, 1),
+                    "avg_max_tokens": round(totals["reserved_tokens"] / requests, 1),
+                    "avg_estimate_error": round(totals["estimate_error"] / requests, 1),
+                    "avg_seconds": round(totals["seconds"] / totals["timed"], 3) if totals["timed"] else None,
+                }
+            requests = sum(totals["requests"] for totals in self._totals.values())
+            return {
+                "tokenizer": "tiktoken" if _encoding is not None else "local",
+                "adaptive": self.adaptive,
+                "context_tokens": self.context_tokens,
+                "requests": requests,
+                "prompt_tokens": sum(totals["prompt_tokens"] for totals in self._totals.values()),
+                "completion_tokens": sum(totals["completion_tokens"] for totals in self._totals.values()),
+                # Reply tokens no longer reserved compared to a fixed max_tokens for every request
+                "max_tokens_saved": requests * self.max_tokens
+                                    - sum(totals["reserved_tokens"] for totals in self._totals.values()),
+                "intents": intents,
+            }
+
+
+prompt_builder = PromptBuilder(
+    context_tokens=settings.CHAT_MEMORY_CONTEXT_TOKENS,
+    max_query_tokens=settings.PROMPT_QUERY_TOKENS,
+    max_tokens=settings.PROMPT_MAX_TOKENS,
+    adaptive=settings.PROMPT_ADAPTIVE_MAX_TOKENS,
+)
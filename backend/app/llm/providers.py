@@ -0,0 +1,116 @@
+import asyncio
+from typing import AsyncIterator, List, Optional
+
+from app.core.config import settings
+from app.llm.config import GROQ_API_KEY, GROQ_BASE_URL, GROQ_CHAT_MODEL
+
+
+class OpenAICompatibleProvider:
+    """Chat completions over HTTP in the OpenAI format (Groq, llama.cpp server, vLLM, Ollama...).
+
+    The gateway sends the requests (shared client, retries, limits); the
+    provider only knows the endpoint, the credentials and the response
+    format.
+    """
+
+    local = False
+
+    def __init__(self, name: str, base_url: str, path: str = "/v1/chat/completions", api_key: str = None,
+                 model: str = None, require_key: bool = False):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.path = path
+        self.api_key = api_key
+        self.model = model
+        self.require_key = require_key
+
+    def unavailable(self) -> Optional[str]:
+        """Why the provider cannot be used, or None"""
+        if self.require_key and (not self.api_key or self.api_key == "your_groq_api_key_here"):
+            return f"{self.name.upper()}_API_KEY not set"
+        return None
+
+    def request(self, messages: List[dict], model: str, max_tokens: int, temperature: float, top_p: float,
+                stream: bool) -> tuple:
+        """(url, headers, payload) of a chat completion"""
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        payload = {"model": model or self.model, "messages": messages, "max_tokens": max_tokens,
+                   "temperature": temperature, "top_p": top_p, "stream": stream}
+        return f"{self.base_url}{self.path}", headers, payload
+
+    @staticmethod
+    def parse_completion(data: dict) -> tuple:
+        """(text, model, usage) of a completion response; KeyError/IndexError when malformed"""
+        return data["choices"][0]["message"]["content"], data.get("model"), data.get("usage") or {}
+
+    @staticmethod
+    def parse_chunk(chunk: dict, usage: Optional[dict]) -> List[str]:
+        """Text deltas of a stream chunk; the usage sent with the last chunk is copied into ``usage``"""
+        if usage is not None:
+            usage.update(chunk.get("usage") or (chunk.get("x_groq") or {}).get("usage") or {})
+        return [delta for choice in chunk.get("choices", [])
+                if (delta := (choice.get("delta") or {}).get("content"))]
+
+
+class StubProvider:
+    """Deterministic in-process replies with a configurable latency model.
+
+    No network and no API key: used for offline development and load tests
+    (see app/llm/benchmark.py). A reply echoes the last user message then
+    filler words, ``tokens`` tokens long (at most max_tokens); the first
+    token comes after ``first_token_ms`` and each next one after
+    ``token_ms``.
+    """
+
+    local = True
+    name = "stub"
+
+    FILLER = ("Thank you for sharing that. Don't worry, this is a stub reply from the local test server. "
+              "Drink enough water, rest well and see a doctor if the symptoms persist. Take care.").split()
+
+    def __init__(self, first_token_ms: float = 200.0, token_ms: float = 15.0, tokens: int = 60, model: str = "stub"):
+        self.first_token_ms = first_token_ms
+        self.token_ms = token_ms
+        self.tokens = tokens
+        self.model = model
+
+    def unavailable(self) -> Optional[str]:
+        return None
+
+    def reply_tokens(self, messages: List[dict], max_tokens: int = None) -> List[str]:
+        question = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+        words = f"You asked: {question[:200]}".split() + self.FILLER * 10
+        count = min(self.tokens, max_tokens or self.tokens)
+        return [word if i == 0 else f" {word}" for i, word in enumerate(words[:count])]
+
+    @staticmethod
+    def usage(messages: List[dict], tokens: List[str]) -> dict:
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in messages)
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                "total_tokens": prompt_tokens + len(tokens)}
+
+    async def generate(self, messages: List[dict], max_tokens: int = None,
+                       usage: dict = None) -> AsyncIterator[str]:
+        """Yield the reply token by token at the configured rate"""
+        tokens = self.reply_tokens(messages, max_tokens)
+        await asyncio.sleep(self.first_token_ms / 1000)
+        for i, token in enumerate(tokens):
+            if i:
+                await asyncio.sleep(self.token_ms / 1000)
+            yield token
+        if usage is not None:
+            usage.update(self.usage(messages, tokens))
+
+
+def create_provider(name: str):
+    """Provider selected by LLM_PROVIDER: "groq", "openai" (any OpenAI-compatible server) or "stub" """
+    name = (name or "groq").lower()
+    if name == "groq":
+        return OpenAICompatibleProvider("groq", GROQ_BASE_URL or "https://api.groq.com", "/openai/v1/chat/completions",
+                                        api_key=GROQ_API_KEY, model=GROQ_CHAT_MODEL, require_key=True)
+    if name == "openai":
+        return OpenAICompatibleProvider("openai", settings.LLM_BASE_URL, "/v1/chat/completions",
+                                        api_key=settings.LLM_API_KEY or None, model=settings.LLM_MODEL)
+    if name == "stub":
+        return StubProvider(settings.LLM_STUB_FIRST_TOKEN_MS, settings.LLM_STUB_TOKEN_MS, settings.LLM_STUB_TOKENS)
+    raise ValueError(f"Unknown LLM_PROVIDER {name!r} (expected groq, openai or stub)")
@@ -0,0 +1,169 @@
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase words without punctuation: the exact-match key"""
+    return " ".join(_WORD_RE.findall((text or "").lower()))
+
+
+class ResponseCache:
+    """Cache of chat replies for repeated questions.
+
+    Two tiers share the same entries:
+
+    - exact: the normalized question text ("I have a headache!" and "i have
+      a headache" are the same key);
+    - similar: TF-IDF vectors of hashed words and word pairs, compared by
+      brute-force cosine similarity against every cached question, so "I
+      have a headache what should I do" can reuse the reply to "I have a
+      headache, what should I do?". Word pairs keep "no fever" apart from
+      "fever".
+
+    Entries expire after ``ttl_seconds`` and the least recently used one is
+    evicted when ``max_entries`` are held. Vectors live in one preallocated
+    matrix, so memory does not grow with traffic.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 86400, similarity: float = 0.9,
+                 features: int = 2048, enabled: bool = True):
+        self.enabled = enabled
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+        self.features = features
+        self._entries = OrderedDict()  # normalized text -> (slot, reply, created), least recently used first
+        self._keys = [None] * self.max_entries  # slot -> normalized text
+        self._vectors = np.zeros((self.max_entries, features), dtype=np.float32)
+        self._created = np.zeros(self.max_entries, dtype=np.float64)
+        self._active = np.zeros(self.max_entries, dtype=bool)
+        self._document_frequency = np.zeros(features, dtype=np.float32)
+        self._index = None  # (idf, unit-length weighted vectors), rebuilt after entries change
+        self._free = list(range(self.max_entries - 1, -1, -1))
+        self._lock = threading.Lock()
+        self.counters = {"lookups": 0, "exact_hits": 0, "similar_hits": 0, "misses": 0,
+                         "bypassed": 0, "stores": 0, "evictions": 0, "expired": 0}
+
+    def _vectorize(self, key: str) -> np.ndarray:
+        words = key.split()
+        terms = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        vector = np.zeros(self.features, dtype=np.float32)
+        for term in terms:
+            vector[zlib.crc32(term.encode()) % self.features] += 1
+        # Sublinear term frequency, as repeated words say little more
+        np.log1p(vector, out=vector)
+        return vector
+
+    def _drop(self, key: str):
+        slot, _, _ = self._entries.pop(key)
+        self._document_frequency -= self._vectors[slot] > 0
+        self._vectors[slot] = 0
+        self._active[slot] = False
+        self._keys[slot] = None
+        self._free.append(slot)
+        self._index = None
+
+    def _weighted_index(self) -> tuple:
+        if self._index is None:
+            count = float(len(self._entries))
+            idf = (np.log((1 + count) / (1 + self._document_frequency)) + 1).astype(np.float32)
+            matrix = self._vectors * idf
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            self._index = (idf, matrix / np.where(norms > 0, norms, 1))
+        return self._index
+
+    def get(self, question: str) -> Tuple[Optional[str], Optional[str]]:
+        """(cached reply, "exact" | "similar") or (None, None)"""
+        key = normalize(question)
+        if not self.enabled or not key:
+            return None, None
+        now = time.time()
+        with self._lock:
+            self.counters["lookups"] += 1
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[2] <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.counters["exact_hits"] += 1
+                    return entry[1], "exact"
+                self._drop(key)
+                self.counters["expired"] += 1
+
+            valid = self._active & (now - self._created <= self.ttl_seconds)
+            if valid.any():
+                idf, matrix = self._weighted_index()
+                query = self._vectorize(key) * idf
+                query /= max(float(np.linalg.norm(query)), 1e-9)
+                scores = np.where(valid, matrix @ query, -1.0)
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity:
+                    cached_key = self._keys[best]
+                    self._entries.move_to_end(cached_key)
+                    self.counters["similar_hits"] += 1
+                    return self._entries[cached_key][1], "similar"
+
+            self.counters["misses"] += 1
+            return None, None
+
+    def put(self, question: str, reply: str):
+        key = normalize(question)
+        if not self.enabled or not key or not reply:
+            return
+        now = time.time()
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            if not self._free:
+                self._drop(next(iter(self._entries)))
+                self.counters["evictions"] += 1
+            slot = self._free.pop()
+            vector = self._vectorize(key)
+            self._vectors[slot] = vector
+            self._created[slot] = now
+            self._active[slot] = True
+            self._keys[slot] = key
+            self._document_frequency += vector > 0
+            self._entries[key] = (slot, reply, now)
+            self._index = None
+            self.counters["stores"] += 1
+
+    def bypass(self):
+        """Count a question that must not be answered from the cache (context-dependent follow-up)"""
+        with self._lock:
+            self.counters["bypassed"] += 1
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._drop(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.counters["exact_hits"] + self.counters["similar_hits"]
+            lookups = self.counters["lookups"]
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "similarity": self.similarity,
+                **self.counters,
+                "hit_rate": round(hits / lookups, 3) if lookups else None,
+            }
+
+
+response_cache = ResponseCache(
+    max_entries=settings.CHAT_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.CHAT_CACHE_TTL_SECONDS,
+    similarity=settings.CHAT_CACHE_SIMILARITY,
+    enabled=settings.CHAT_CACHE_ENABLED,
+)
@@ -0,0 +1,86 @@
+"""
+Local stand-in for the Groq / OpenAI chat completions API.
+
+Serves the replies of the in-process stub provider (app/llm/providers.py)
+over HTTP, so the HTTP path of the gateway (connection pool, retries,
+stream parsing) can be tested and benchmarked offline too:
+
+    python -m app.llm.stub_server --port 8090 --first-token-ms 300 --token-ms 20
+    LLM_PROVIDER=openai LLM_BASE_URL=http://127.0.0.1:8090 python run_server.py
+
+(LLM_PROVIDER=stub skips HTTP altogether.)
+
+Both the Groq path (/openai/v1/chat/completions) and the plain OpenAI path
+(/v1/chat/completions) are served, with and without "stream": true.
+"""
+import argparse
+import json
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.llm.providers import StubProvider
+
+app = FastAPI(title="Stub LLM server")
+
+# Latency model, changed by the command line options
+stub = StubProvider()
+
+
+async def completions(request: Request):
+    body = await request.json()
+    messages = body.get("messages", [])
+    model = body.get("model", "stub")
+    max_tokens = body.get("max_tokens")
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    created = int(time.time())
+
+    if not body.get("stream"):
+        usage = {}
+        text = "".join([token async for token in stub.generate(messages, max_tokens, usage)])
+        return JSONResponse({
+            "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": text}}],
+            "usage": usage,
+        })
+
+    def chunk(delta, finish_reason=None, **extra):
+        data = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}], **extra}
+        return f"data: {json.dumps(data)}\n\n"
+
+    async def events():
+        usage = {}
+        yield chunk({"role": "assistant", "content": ""})
+        async for token in stub.generate(messages, max_tokens, usage):
+            yield chunk({"content": token})
+        yield chunk({}, "stop", x_groq={"usage": usage})
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+app.add_api_route("/openai/v1/chat/completions", completions, methods=["POST"])
+app.add_api_route("/v1/chat/completions", completions, methods=["POST"])
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "first_token_ms": stub.first_token_ms, "token_ms": stub.token_ms, "tokens": stub.tokens}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Stub LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--first-token-ms", type=float, default=stub.first_token_ms)
+    parser.add_argument("--token-ms", type=float, default=stub.token_ms)
+    parser.add_argument("--tokens", type=int, default=stub.tokens, help="reply length in tokens")
+    args = parser.parse_args()
+    stub.first_token_ms, stub.token_ms, stub.tokens = args.first_token_ms, args.token_ms, args.tokens
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,450 @@
+import asyncio
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import BrokenExecutor, CancelledError, Future, ProcessPoolExecutor
+from typing import Callable, Optional
+
+from app.core.config import settings
+from app.llm.audio_cache import AudioCache
+
+# Job states
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+
+class TtsSaturated(Exception):
+    """Raised when too many syntheses are already waiting for a worker"""
+
+
+class TtsUnavailable(RuntimeError):
+    """Raised when the speech engine cannot run (workers keep crashing)"""
+
+
+# --- Worker side -------------------------------------------------------------
+
+_engine = None
+
+
+def _init_worker(voice: Optional[str], rate: Optional[int]):
+    """Create this worker's speech engine once (pyttsx3 engines are not thread-safe)"""
+    global _engine
+    import pyttsx3
+
+    _engine = pyttsx3.init()
+    if voice:
+        _engine.setProperty("voice", voice)
+    if rate:
+        _engine.setProperty("rate", rate)
+    print(f"🔊 TTS worker {os.getpid()} ready")
+
+
+def _synthesize(text: str, path: str) -> str:
+    # Written under a temporary name so a half-written file is never served
+    partial = f"{path[:-len('.mp3')]}-{os.getpid()}.part.mp3"
+    _engine.save_to_file(text, partial)
+    _engine.runAndWait()
+    if not os.path.exists(partial):
+        raise RuntimeError("Speech engine produced no audio file")
+    os.replace(partial, path)
+    return path
+
+
+# --- Parent side -------------------------------------------------------------
+
+class _DaemonThreadExecutor:
+    """One daemon thread running tasks in order, with the executor interface the service uses.
+
+    Unlike ThreadPoolExecutor its thread is not joined at interpreter exit,
+    so a synthesis hung in the native engine can be abandoned (threads
+    cannot be killed).
+    """
+
+    def __init__(self, initializer: Callable, initargs: tuple):
+        self._tasks = queue.SimpleQueue()
+        self._shutdown = False
+        self._broken: Optional[str] = None
+        threading.Thread(target=self._run, args=(initializer, initargs), name="tts", daemon=True).start()
+
+    def _run(self, initializer: Callable, initargs: tuple):
+        try:
+            initializer(*initargs)
+        except Exception as e:
+            self._broken = f"TTS worker failed to start: {type(e).__name__}: {e}"
+        while True:
+            item = self._tasks.get()
+            if item is None:
+                return
+            future, fn, args = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            if self._broken:
+                future.set_exception(BrokenExecutor(self._broken))
+                continue
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def submit(self, fn: Callable, *args) -> Future:
+        if self._shutdown:
+            raise RuntimeError("cannot schedule new futures after shutdown")
+        future = Future()
+        self._tasks.put((future, fn, args))
+        return future
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False):
+        self._shutdown = True
+        if cancel_futures:
+            while True:
+                try:
+                    item = self._tasks.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    item[0].cancel()
+        self._tasks.put(None)
+
+
+class _Slot:
+    """One TTS worker (a single-worker executor, so it can be replaced alone)"""
+
+    def __init__(self, backend: str, voice: Optional[str], rate: Optional[int]):
+        if backend == "process":
+            # spawn, not fork: the API process has live threads and DB clients
+            self.executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"),
+                                                initializer=_init_worker, initargs=(voice, rate))
+        else:
+            self.executor = _DaemonThreadExecutor(_init_worker, (voice, rate))
+
+    def kill(self):
+        # Terminate explicitly, shutdown() alone would wait for a hung worker
+        for process in list((getattr(self.executor, "_processes", None) or {}).values()):
+            try:
+                process.terminate()
+            except Exception:
+                pass
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class TtsService:
+    """Text-to-speech jobs run off the request path.
+
+    submit() returns a job id at once; the audio is written to the audio
+    cache directory by a pool of workers, each holding its own speech
+    engine. With the "process" backend ``workers`` engines synthesize in
+    parallel; the "thread" backend runs a single engine in one thread
+    (pyttsx3 keeps one engine per process). At most ``max_pending``
+    syntheses wait for or run on a worker.
+
+    Each synthesis may run for ``timeout`` seconds from the moment its
+    worker starts it; past that the job fails and only that worker is
+    killed and replaced (a hung thread is abandoned). A worker that
+    crashes is replaced the same way; after ``max_restarts`` crashes or
+    hangs in a row (e.g. no speech engine installed) the service is
+    disabled and submit() raises TtsUnavailable.
+
+    Audio is content-addressed (see AudioCache): a job whose text was
+    already spoken finishes at once with the cached file, and jobs for a
+    text that is being synthesized wait for that synthesis instead of
+    starting another one.
+
+    Finished jobs are kept (up to ``history`` of them) so their status and
+    audio URL can be looked up by id.
+    """
+
+    def __init__(self, audio_cache: AudioCache, workers: int = 2, max_pending: int = 64, timeout: float = 60.0,
+                 backend: str = "process", voice: str = None, rate: int = None, history: int = 1000,
+                 max_restarts: int = 3):
+        self.audio_cache = audio_cache
+        self.backend = backend
+        self.workers = max(1, workers) if backend == "process" else 1
+        self.max_pending = max(1, max_pending)
+        self.timeout = timeout
+        self.voice = voice
+        self.rate = rate
+        self.history = history
+        self.max_restarts = max_restarts
+        self._crashes = 0  # Worker crashes and hangs since the last successful job
+        self._disabled_reason: Optional[str] = None
+        self._jobs = OrderedDict()  # job id -> job dict, oldest first
+        self._inflight = {}  # audio key -> jobs waiting for its synthesis
+        self._lock = threading.RLock()
+        self._wakeup = threading.Condition(self._lock)
+        self._changed = False  # Something for the dispatcher to look at
+        self._queue = deque()  # (audio key, text, path) waiting for a worker
+        self._slots = set()
+        self._idle = []
+        self._running = {}  # future -> (audio key, slot, start time)
+        self._dispatcher: Optional[threading.Thread] = None
+        self._closed = False
+        self._pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.restarts = 0
+        self.timeouts = 0
+        self.coalesced = 0
+
+    def _notify(self):
+        """Wake the dispatcher (caller holds the lock)"""
+        self._changed = True
+        self._wakeup.notify()
+
+    def _ensure_dispatcher(self):
+        """Start the dispatcher thread, again after a shutdown (caller holds the lock)"""
+        if self._closed or self._dispatcher is None or not self._dispatcher.is_alive():
+            self._closed = False
+            self._dispatcher = threading.Thread(target=self._dispatch, name="tts-dispatcher", daemon=True)
+            self._dispatcher.start()
+
+    def _dispatch(self):
+        """Start queued syntheses on free workers and fail the ones that run too long"""
+        while True:
+            with self._lock:
+                if self._closed or self._dispatcher is not threading.current_thread():
+                    return
+                self._changed = False
+                dead = self._start_queued()
+                now = time.monotonic()
+                expired = [self._running.pop(future) for future, (_, _, started)
+                           in list(self._running.items()) if now - started >= self.timeout]
+            for slot in dead:
+                self._replace(slot)
+            for key, slot, _ in expired:
+                self._timed_out(key, slot)
+            with self._lock:
+                if dead or expired or self._changed or self._closed:
+                    continue
+                deadlines = [started + self.timeout for _, _, started in self._running.values()]
+                wait = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+                self._wakeup.wait_for(lambda: self._changed or self._closed, timeout=wait)
+
+    def _start_queued(self) -> list:
+        """Hand queued syntheses to idle workers, starting workers up to ``workers`` (caller holds the lock).
+
+        Returns the workers found dead, for the caller to replace.
+        """
+        dead = []
+        while self._queue and not self._disabled_reason:
+            if not self._idle:
+                if len(self._slots) >= self.workers:
+                    break
+                slot = _Slot(self.backend, self.voice, self.rate)
+                self._slots.add(slot)
+                self._idle.append(slot)
+            slot = self._idle.pop()
+            key, text, path = self._queue.popleft()
+            try:
+                future = slot.executor.submit(_synthesize, text, path)
+            except (BrokenExecutor, RuntimeError):
+                # Died while idle: retry the synthesis on a fresh worker
+                self._queue.appendleft((key, text, path))
+                dead.append(slot)
+                break
+            self._running[future] = (key, slot, time.monotonic())
+            future.add_done_callback(self._finished)
+        return dead
+
+    def _replace(self, slot: _Slot):
+        """Kill a crashed or hung worker; the dispatcher starts a new one when needed"""
+        with self._lock:
+            if slot not in self._slots:
+                return
+            self._slots.discard(slot)
+            if slot in self._idle:
+                self._idle.remove(slot)
+            self.restarts += 1
+            self._crashes += 1
+            if self._crashes >= self.max_restarts and not self._disabled_reason:
+                self._disabled_reason = f"TTS workers crashed or hung {self._crashes} times in a row"
+                print(f"⚠️ TTS disabled: {self._disabled_reason}")
+            self._notify()
+        slot.kill()
+        if self._disabled_reason:
+            self._fail_queued(self._disabled_reason)
+
+    def _fail_queued(self, error: str):
+        with self._lock:
+            queued, self._queue = list(self._queue), deque()
+            jobs = []
+            for key, _, _ in queued:
+                self._pending -= 1
+                jobs.extend(self._inflight.pop(key, []))
+        if jobs:
+            self._finish(jobs, error=error)
+
+    def _take_jobs(self, key: str) -> list:
+        """Jobs waiting for the synthesis of ``key`` (caller holds the lock)"""
+        self._pending -= 1
+        return self._inflight.pop(key, [])
+
+    def _finished(self, future):
+        with self._lock:
+            entry = self._running.pop(future, None)
+            if entry is None:
+                return  # Timed out (or shut down) already
+            key, slot, _ = entry
+            # Cancelled when the service is shut down with the job still queued
+            error = CancelledError("TTS pool shut down") if future.cancelled() else future.exception()
+            jobs = self._take_jobs(key)
+            crashed = isinstance(error, BrokenExecutor)
+            if error is None:
+                self._crashes = 0
+            if not crashed and slot in self._slots:
+                self._idle.append(slot)
+            self._notify()
+        if crashed:
+            self._replace(slot)
+        if error is None:
+            self.audio_cache.add(key)
+            self._finish(jobs, url=self.audio_cache.url(key))
+            return
+        print(f"❌ TTS job {jobs[0]['id'] if jobs else key} failed: {type(error).__name__}: {error}")
+        self._finish(jobs, error=f"{type(error).__name__}: {error}")
+
+    def _timed_out(self, key: str, slot: _Slot):
+        with self._lock:
+            jobs = self._take_jobs(key)
+            self.timeouts += 1
+        print(f"⚠️ TTS synthesis timed out after {self.timeout}s, replacing its worker")
+        self._replace(slot)
+        self._finish(jobs, error=f"Speech synthesis timed out after {self.timeout}s")
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            self._notify()
+            slots, self._slots, self._idle = list(self._slots), set(), []
+            running, self._running = list(self._running.items()), {}
+        for slot in slots:
+            slot.kill()
+        self._fail_queued("TTS service shut down")
+        with self._lock:
+            jobs = [job for _, (key, _, _) in running for job in self._take_jobs(key)]
+        if jobs:
+            self._finish(jobs, error="TTS service shut down")
+
+    def _register(self, job: dict):
+        """Track a job by id (caller holds the lock)"""
+        self._jobs[job["id"]] = job
+        while len(self._jobs) > self.history:
+            oldest = next(iter(self._jobs.values()))
+            if oldest["status"] == PENDING:
+                break
+            self._jobs.popitem(last=False)
+
+    def _finish(self, jobs: list, url: str = None, error: str = None):
+        with self._lock:
+            for job in jobs:
+                job.update(status=FAILED if error else DONE, url=url, error=error, finished=time.time())
+                if error:
+                    self.failed += 1
+                else:
+                    self.completed += 1
+        for job in jobs:
+            job["event"].set()
+            if job["on_done"] is not None:
+                try:
+                    job["on_done"](self.status(job["id"]))
+                except Exception as e:
+                    print(f"⚠️ TTS callback for job {job['id']} failed: {e}")
+
+    def submit(self, text: str, job_id: str = None, on_done: Callable[[dict], None] = None) -> str:
+        """Queue the synthesis of ``text``; ``on_done(job)`` is called when it finishes or fails"""
+        key = AudioCache.key(text, self.voice, self.rate)
+        job = {"id": job_id or uuid.uuid4().hex, "status": PENDING, "url": None, "error": None, "cached": False,
+               "created": time.time(), "finished": None, "event": threading.Event(), "on_done": on_done}
+
+        url = self.audio_cache.get(key)
+        if url is not None:
+            job["cached"] = True
+            with self._lock:
+                self._register(job)
+            self._finish([job], url=url)
+            return job["id"]
+
+        with self._lock:
+            if self._disabled_reason:
+                raise TtsUnavailable(self._disabled_reason)
+            waiting = self._inflight.get(key)
+            if waiting is not None:
+                # Same text already being synthesized: share its file
+                waiting.append(job)
+                self._register(job)
+                self.coalesced += 1
+                return job["id"]
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise TtsSaturated(f"TTS queue is full ({self.max_pending} pending)")
+            self._pending += 1
+            self._inflight[key] = [job]
+            self._register(job)
+            self._queue.append((key, text, self.audio_cache.path(key)))
+            self._ensure_dispatcher()
+            self._notify()
+        return job["id"]
+
+    def status(self, job_id: str) -> Optional[dict]:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        return {key: value for key, value in job.items() if key not in ("event", "on_done")}
+
+    def wait(self, job_id: str, timeout: float = None) -> Optional[dict]:
+        """Block until the job finishes (or ``timeout``); returns its status"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        job["event"].wait(self.timeout if timeout is None else timeout)
+        return self.status(job_id)
+
+    async def wait_async(self, job_id: str, timeout: float = None) -> Optional[dict]:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        while not job["event"].is_set() and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        return self.status(job_id)
+
+    def synthesize(self, text: str) -> str:
+        """Synthesize and wait; returns the audio URL"""
+        job = self.wait(self.submit(text))
+        if job["status"] != DONE:
+            raise RuntimeError(job["error"] or f"TTS did not finish within {self.timeout}s")
+        return job["url"]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": self.backend,
+                "workers": self.workers,
+                "running": len(self._slots),
+                "busy": len(self._running),
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "restarts": self.restarts,
+                "timeouts": self.timeouts,
+                "coalesced": self.coalesced,
+                "disabled": self._disabled_reason,
+            }
+
+
+tts_service = TtsService(
+    AudioCache("responses", max_bytes=settings.TTS_CACHE_MAX_MB * 1024 * 1024),
+    workers=settings.TTS_WORKERS,
+    max_pending=settings.TTS_MAX_PENDING,
+    timeout=settings.TTS_TIMEOUT_SECONDS,
+    backend=settings.TTS_BACKEND,
+    voice=settings.TTS_VOICE or None,
+    rate=settings.TTS_RATE or None,
+)
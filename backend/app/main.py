@@ -19,6 +19,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Since-Cursor"],
 )
 
 # MongoDB connection (synchronous) with fallback to mock
@@ -74,7 +75,6 @@ app.include_router(doctor.router, prefix="/api/doctor", tags=["doctor"])
 app.include_router(lab_reports.router, prefix="/api/lab-reports", tags=["lab-reports"])
 app.include_router(appointments.router, prefix="/api/appointments", tags=["appointments"])
 app.include_router(emergency.router, prefix="/api/emergency", tags=["emergency"])
-# app.include_router(lab_reports.router, prefix="/api/lab-reports", tags=["lab-reports"])
 
 # Basic endpoint
 @app.get("/")
@@ -0,0 +1,228 @@
+"""Pure-NumPy scoring for the bundled sklearn models.
+
+compile_scorer() extracts the fitted parameters of a StandardScaler + estimator
+pair once, at load time, so single-row predictions skip sklearn's per-call
+input validation. Unsupported estimators return None and stay on sklearn.
+"""
+import threading
+from typing import Optional
+
+import numpy as np
+
+try:
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.svm import SVC
+    from sklearn.tree import DecisionTreeClassifier
+    from sklearn.ensemble import RandomForestClassifier, ExtraTreesClassifier
+except ImportError:  # pragma: no cover - sklearn is required to unpickle the models anyway
+    StandardScaler = LogisticRegression = SVC = None
+    DecisionTreeClassifier = RandomForestClassifier = ExtraTreesClassifier = None
+
+
+class CompiledScorer:
+    """Base class; subclasses implement _score on an already validated 2-D float64 batch.
+
+    ``output`` mirrors which branch the sklearn code path in inference.py takes:
+    "proba" for models with predict_proba, "decision" for decision_function only.
+    """
+
+    kind = "compiled"
+    output = "proba"
+
+    def __init__(self, classes, n_features: int):
+        self.classes = np.asarray(classes)
+        self.n_features = n_features
+        self._local = threading.local()
+
+    def _row_buffer(self) -> np.ndarray:
+        # One preallocated input row per thread, reused for single-row calls
+        buf = getattr(self._local, "row", None)
+        if buf is None:
+            buf = self._local.row = np.empty((1, self.n_features), dtype=np.float64)
+        return buf
+
+    def score_batch(self, X):
+        """Return (predictions, scores) for a 2-D batch of raw (unscaled) features.
+
+        scores is an (n, 2) probability array for output == "proba" and an (n,)
+        decision function array for output == "decision".
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got shape {X.shape}")
+        return self._score(X)
+
+    def score_row(self, features):
+        """Score one raw feature row; returns (prediction, scores for that row)"""
+        if len(features) != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got {len(features)}")
+        row = self._row_buffer()
+        row[0, :] = features
+        predictions, scores = self._score(row)
+        return predictions[0], scores[0]
+
+    def _score(self, X):
+        raise NotImplementedError
+
+
+class LinearScorer(CompiledScorer):
+    """Linear decision function with the StandardScaler folded into the weights"""
+
+    kind = "linear"
+
+    def __init__(self, classes, mean, scale, coef, intercept, output):
+        super().__init__(classes, len(coef))
+        # w . ((x - mean) / scale) + b  ==  (w / scale) . x + (b - w . (mean / scale))
+        self.weights = coef / scale
+        self.bias = float(intercept - np.dot(coef, mean / scale))
+        self.output = output
+
+    def _score(self, X):
+        decision = X @ self.weights + self.bias
+        predictions = self.classes[(decision > 0).astype(np.intp)]
+        if self.output == "decision":
+            return predictions, decision
+        positive = 1.0 / (1.0 + np.exp(-decision))
+        return predictions, np.column_stack((1.0 - positive, positive))
+
+
+class RBFScorer(CompiledScorer):
+    """RBF-kernel SVC with support vectors mapped back into raw feature space"""
+
+    kind = "svc_rbf"
+    output = "decision"
+
+    def __init__(self, classes, mean, scale, support_vectors, dual_coef, intercept, gamma):
+        super().__init__(classes, support_vectors.shape[1])
+        # ||(x - mean) / scale - sv||^2  ==  ||(x - (mean + scale * sv)) / scale||^2
+        self.support_raw = mean + scale * support_vectors
+        self.inv_scale = 1.0 / scale
+        self.dual_coef = dual_coef
+        self.intercept = float(intercept)
+        self.gamma = float(gamma)
+
+    def _score(self, X):
+        diff = (X[:, None, :] - self.support_raw[None, :, :]) * self.inv_scale
+        kernel = np.exp(-self.gamma * np.einsum("nsf,nsf->ns", diff, diff))
+        decision = kernel @ self.dual_coef + self.intercept
+        return self.classes[(decision > 0).astype(np.intp)], decision
+
+
+class TreeEnsembleScorer(CompiledScorer):
+    """All trees of a forest packed into flat arrays and walked in lock-step.
+
+    Leaves point at themselves, so every tree can be advanced max_depth times
+    without per-tree branching.
+    """
+
+    kind = "tree_ensemble"
+
+    def __init__(self, classes, mean, scale, trees):
+        super().__init__(classes, len(mean))
+        self.mean = mean
+        self.scale = scale
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for tree in trees:
+            n_nodes = tree.node_count
+            idx = np.arange(n_nodes)
+            is_leaf = tree.children_left == -1
+            lefts.append(np.where(is_leaf, idx, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, idx, tree.children_right) + offset)
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            value = tree.value[:, 0, :].astype(np.float64)
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(value / normalizer)
+            roots.append(offset)
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+
+        self.feature = np.concatenate(features).astype(np.intp)
+        self.threshold = np.concatenate(thresholds)
+        self.left = np.concatenate(lefts).astype(np.intp)
+        self.right = np.concatenate(rights).astype(np.intp)
+        self.value = np.concatenate(values)
+        self.roots = np.asarray(roots, dtype=np.intp)
+        self.max_depth = max_depth
+        self.n_trees = len(roots)
+
+    def _score(self, X):
+        # sklearn trees compare float32 features against float64 thresholds
+        Xs = ((X - self.mean) / self.scale).astype(np.float32).astype(np.float64)
+        rows = np.arange(Xs.shape[0])[:, None]
+        node = np.broadcast_to(self.roots, (Xs.shape[0], self.n_trees)).copy()
+        for _ in range(self.max_depth):
+            go_left = Xs[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        # Sum over the (non-contiguous) tree axis adds trees in order, like sklearn does
+        proba = self.value[node].sum(axis=1) / self.n_trees
+        return self.classes[np.argmax(proba, axis=1)], proba
+
+
+def _scaler_params(scaler):
+    if StandardScaler is None or type(scaler) is not StandardScaler:
+        return None
+    n_features = scaler.n_features_in_
+    mean = scaler.mean_ if scaler.with_mean and scaler.mean_ is not None else np.zeros(n_features)
+    scale = scaler.scale_ if scaler.with_std and scaler.scale_ is not None else np.ones(n_features)
+    return np.asarray(mean, dtype=np.float64), np.asarray(scale, dtype=np.float64)
+
+
+def compile_scorer(model, scaler) -> Optional[CompiledScorer]:
+    """Build a CompiledScorer for a (model, scaler) pair, or None if unsupported"""
+    params = _scaler_params(scaler)
+    if params is None or len(getattr(model, "classes_", [])) != 2:
+        return None
+    mean, scale = params
+    classes = model.classes_
+
+    if type(model) is LogisticRegression:
+        return LinearScorer(classes, mean, scale, model.coef_[0].astype(np.float64),
+                            model.intercept_[0], output="proba")
+
+    if type(model) is SVC and not model.probability:
+        if model.kernel == "linear":
+            return LinearScorer(classes, mean, scale, np.asarray(model.coef_[0], dtype=np.float64),
+                                model.intercept_[0], output="decision")
+        if model.kernel == "rbf":
+            return RBFScorer(classes, mean, scale, np.asarray(model.support_vectors_, dtype=np.float64),
+                             np.asarray(model.dual_coef_[0], dtype=np.float64), model.intercept_[0],
+                             model._gamma)
+        return None
+
+    if type(model) is DecisionTreeClassifier and model.n_outputs_ == 1:
+        return TreeEnsembleScorer(classes, mean, scale, [model.tree_])
+
+    if type(model) in (RandomForestClassifier, ExtraTreesClassifier) and model.n_outputs_ == 1:
+        return TreeEnsembleScorer(classes, mean, scale, [est.tree_ for est in model.estimators_])
+
+    return None
+
+
+def verification_corpus(scaler, n_rows: int = 512, seed: int = 0) -> np.ndarray:
+    """Synthetic raw feature rows spread around the scaler's training distribution"""
+    mean, scale = _scaler_params(scaler)
+    rng = np.random.default_rng(seed)
+    continuous = mean + scale * rng.normal(0.0, 1.5, size=(n_rows, len(mean)))
+    # Half the rows rounded, since most clinical inputs arrive as integers
+    continuous[: n_rows // 2] = np.round(continuous[: n_rows // 2])
+    return continuous
+
+
+def verify_scorer(scorer: CompiledScorer, model, scaler, corpus=None, rtol: float = 1e-9, atol: float = 1e-9) -> bool:
+    """Check a compiled scorer against sklearn on a test corpus"""
+    X = verification_corpus(scaler) if corpus is None else np.asarray(corpus, dtype=np.float64)
+    X_scaled = scaler.transform(X)
+    predictions, scores = scorer.score_batch(X)
+
+    if not np.array_equal(predictions, model.predict(X_scaled)):
+        return False
+    if scorer.output == "decision":
+        expected = model.decision_function(X_scaled)
+    else:
+        expected = model.predict_proba(X_scaled)
+    return bool(np.allclose(scores, expected, rtol=rtol, atol=atol))
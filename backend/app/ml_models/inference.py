@@ -0,0 +1,97 @@
+import numpy as np
+
+from app.schemas.disease import HeartInput, DiabetesInput
+
+# Input schema and feature column order for each tabular model
+INPUT_SCHEMAS = {
+    "heart": HeartInput,
+    "diabetes": DiabetesInput,
+}
+
+FEATURE_ORDER = {
+    "heart": [
+        "age", "sex", "chest_pain_type", "resting_bp", "cholesterol", "fasting_blood_sugar",
+        "rest_ecg", "max_heart_rate", "exercise_angina", "oldpeak", "slope", "major_vessels", "thal",
+    ],
+    "diabetes": [
+        "Pregnancies", "Glucose", "BloodPressure", "SkinThickness", "Insulin", "BMI",
+        "DiabetesPedigreeFunction", "Age",
+    ],
+}
+
+# (positive label, negative label, negative probability key, positive probability key)
+LABELS = {
+    "heart": ("Heart Disease Detected", "No Heart Disease", "no_disease", "disease"),
+    "diabetes": ("Diabetes Detected", "No Diabetes", "no_diabetes", "diabetes"),
+}
+
+
+def feature_vector(disease: str, data_obj) -> list:
+    """Ordered list of feature values for a validated input object"""
+    return [getattr(data_obj, name) for name in FEATURE_ORDER[disease]]
+
+
+def build_result(disease: str, prediction, probability=None, decision_score=None, note=None) -> dict:
+    """Format a model output the way the /api/predict endpoint returns it"""
+    positive, negative, neg_key, pos_key = LABELS[disease]
+    label = positive if prediction == 1 else negative
+
+    if probability is not None:
+        return {
+            "prediction": label,
+            "probability": {
+                neg_key: float(probability[0]),
+                pos_key: float(probability[1])
+            }
+        }
+
+    if decision_score is not None:
+        # Convert decision score to probability-like score (0-1 range)
+        confidence = 1 / (1 + np.exp(-decision_score))  # Sigmoid transformation
+        return {
+            "prediction": label,
+            "probability": {
+                neg_key: float(1 - confidence) if prediction == 1 else float(confidence),
+                pos_key: float(confidence) if prediction == 1 else float(1 - confidence)
+            },
+            "confidence_score": float(abs(decision_score)),
+            "model_type": "SVC"
+        }
+
+    # Fallback for models without probability estimates
+    return {
+        "prediction": label,
+        "probability": {
+            neg_key: 0.25 if prediction == 1 else 0.75,
+            pos_key: 0.75 if prediction == 1 else 0.25
+        },
+        "note": note or "Probability estimates not available for this model type"
+    }
+
+
+def predict_features(disease: str, model, scaler, features: list, scorer=None) -> dict:
+    """Scale a single feature row, run the model and format the result.
+
+    When a compiled NumPy scorer is given it replaces the sklearn calls.
+    """
+    if scorer is not None:
+        prediction, scores = scorer.score_row(features)
+        if scorer.output == "proba":
+            return build_result(disease, prediction, probability=scores)
+        return build_result(disease, prediction, decision_score=scores)
+
+    features_scaled = scaler.transform(np.array([features]))
+    prediction = model.predict(features_scaled)[0]
+
+    # Check if the model supports predict_proba
+    try:
+        if hasattr(model, 'predict_proba'):
+            return build_result(disease, prediction, probability=model.predict_proba(features_scaled)[0])
+        elif hasattr(model, 'decision_function'):
+            # For SVC models, use decision_function to get confidence scores
+            return build_result(disease, prediction, decision_score=model.decision_function(features_scaled)[0])
+        return build_result(disease, prediction)
+    except Exception as prob_error:
+        print(f"⚠️ Could not get probability estimates: {prob_error}")
+        return build_result(disease, prediction, note="Probability estimates not available")
+
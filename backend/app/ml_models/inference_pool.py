@@ -0,0 +1,279 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+
+
+class PoolSaturated(Exception):
+    """Raised when too many predictions are already queued for the pool"""
+
+
+class PredictionTimeout(Exception):
+    """Raised when a prediction does not finish within the per-task timeout"""
+
+
+# --- Worker side -------------------------------------------------------------
+
+def _init_worker():
+    """Preload every model once per worker process"""
+    from app.ml_models.registry import registry
+    registry.load()
+    print(f"🧠 Inference worker {os.getpid()} ready")
+
+
+def _ping() -> int:
+    """No-op task: completes once the worker has loaded the models"""
+    return os.getpid()
+
+
+def _run_prediction(disease: str, features: list) -> Tuple[Optional[str], dict]:
+    from app.ml_models.inference import predict_features
+    from app.ml_models.registry import registry
+
+    loaded = registry.get(disease)
+    if loaded is None:
+        raise RuntimeError(f"{disease} model not available in inference worker")
+    model, scaler, scorer, version = loaded
+    return version, predict_features(disease, model, scaler, features, scorer)
+
+
+# --- Parent side -------------------------------------------------------------
+
+# Failed worker start-ups in a row (per worker) before the pool stops respawning them
+MAX_START_FAILURES = 3
+
+class _Slot:
+    """One inference worker process (a single-process executor, so it can be replaced alone)"""
+
+    def __init__(self):
+        # spawn, not fork: the API process has live threads and DB clients
+        self.executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"),
+                                            initializer=_init_worker)
+        self.ready = False
+
+    def kill(self):
+        # Terminate explicitly, shutdown() alone would wait for a hung worker
+        for process in list((getattr(self.executor, "_processes", None) or {}).values()):
+            try:
+                process.terminate()
+            except Exception:
+                pass
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class InferencePool:
+    """Runs model inference in a dedicated pool of worker processes.
+
+    Every worker loads the models once at start-up and only takes tasks
+    once it has, so start-up never counts against the per-task
+    ``timeout``. Submissions beyond ``max_pending`` in-flight tasks are
+    rejected with PoolSaturated, as are tasks that find no ready worker
+    within ``start_timeout``. A task that times out, or whose worker
+    crashes, has only its own worker killed and replaced; predictions
+    running on the other workers are not affected.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 64, timeout: float = 5.0,
+                 start_timeout: float = 60.0):
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.timeout = timeout
+        self.start_timeout = start_timeout
+        self._slots = set()
+        self._idle: Optional[asyncio.Queue] = None
+        self._loop = None
+        self._closed = False
+        self._lock = threading.RLock()
+        self._pending = 0
+        self._start_failures = 0
+        self.restarts = 0
+        self.timeouts = 0
+        self.rejected = 0
+
+    def _start(self):
+        """Start the workers on the running event loop (first prediction)"""
+        with self._lock:
+            if self._idle is not None:
+                return
+            self._closed = False
+            self._loop = asyncio.get_running_loop()
+            self._idle = asyncio.Queue()
+            for _ in range(self.workers):
+                self._add_slot()
+
+    def _add_slot(self):
+        """Start a worker; it joins the idle queue once its models are loaded"""
+        with self._lock:
+            slot = _Slot()
+            self._slots.add(slot)
+        try:
+            warmup = slot.executor.submit(_ping)
+        except Exception as e:
+            print(f"⚠️ Could not start inference worker: {e}")
+            with self._lock:
+                self._slots.discard(slot)
+            slot.kill()
+            return
+        warmup.add_done_callback(lambda future: self._warmed(slot, future))
+
+    def _warmed(self, slot: _Slot, future):
+        if future.cancelled() or future.exception() is not None:
+            if slot not in self._slots:
+                return
+            print(f"⚠️ Inference worker failed to start: {'cancelled' if future.cancelled() else future.exception()}")
+            with self._lock:
+                self._start_failures += 1
+                # Do not respawn forever when the workers cannot start at all (until the next restart())
+                give_up = self._start_failures > MAX_START_FAILURES * self.workers
+            if give_up:
+                print("❌ Inference workers keep failing to start, not replacing them")
+                with self._lock:
+                    self._slots.discard(slot)
+                slot.kill()
+            else:
+                self._replace(slot)
+            return
+        with self._lock:
+            self._start_failures = 0
+        slot.ready = True
+        self._release(slot)
+
+    def _release(self, slot: _Slot):
+        """Make a worker available for the next task (from any thread)"""
+        with self._lock:
+            idle, loop = self._idle, self._loop
+            current = slot in self._slots and idle is not None
+        if not current:
+            # Retired by restart() while it was busy: it exits now that its task is done
+            slot.executor.shutdown(wait=False)
+            return
+        try:
+            loop.call_soon_threadsafe(idle.put_nowait, slot)
+        except RuntimeError:
+            pass  # Event loop closed
+
+    def _replace(self, slot: _Slot):
+        """Kill a hung or crashed worker and start a fresh one in its place"""
+        with self._lock:
+            if slot not in self._slots:
+                return
+            self._slots.discard(slot)
+            self.restarts += 1
+            if not self._closed:
+                self._add_slot()
+        slot.kill()
+
+    async def _acquire(self) -> _Slot:
+        """A ready worker; PoolSaturated if none becomes free within start_timeout"""
+        deadline = time.monotonic() + self.start_timeout
+        while True:
+            getter = asyncio.ensure_future(self._idle.get())
+            try:
+                done, _ = await asyncio.wait({getter}, timeout=max(0.0, deadline - time.monotonic()))
+            except asyncio.CancelledError:
+                self._abandon(getter)
+                raise
+            if not done:
+                self._abandon(getter)
+                self.rejected += 1
+                raise PoolSaturated(f"No inference worker ready within {self.start_timeout}s")
+            slot = getter.result()
+            if slot in self._slots:
+                return slot
+            # Replaced or retired while idle: it is not handed out again
+
+    def _abandon(self, getter: asyncio.Future):
+        """Stop waiting for a worker, handing back the one the getter may already have received"""
+        getter.cancel()
+        getter.add_done_callback(lambda task: None if task.cancelled() else self._release(task.result()))
+
+    def restart(self, *_):
+        """Replace every worker with one that loads the current models.
+
+        Idle workers exit at once; busy ones finish their prediction first.
+        """
+        with self._lock:
+            if self._idle is None:
+                return
+            self._start_failures = 0
+            retired, self._slots = self._slots, set()
+            self.restarts += len(retired)
+            for _ in range(self.workers):
+                self._add_slot()
+        for slot in retired:
+            slot.executor.shutdown(wait=False)
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            slots, self._slots = list(self._slots), set()
+            self._idle = None
+        for slot in slots:
+            slot.executor.shutdown(wait=True, cancel_futures=True)
+
+    async def predict(self, disease: str, features: list) -> Tuple[Optional[str], dict]:
+        """Run one prediction in the pool; returns (worker model version, result)"""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise PoolSaturated(f"Inference queue is full ({self.max_pending} pending)")
+            self._pending += 1
+
+        try:
+            self._start()
+            for attempt in range(2):
+                slot = await self._acquire()
+                try:
+                    future = slot.executor.submit(_run_prediction, disease, list(features))
+                except (BrokenProcessPool, RuntimeError):
+                    self._replace(slot)  # Died while idle: retry on another worker
+                    continue
+                try:
+                    # The timeout runs from the submission: the worker is already warm and idle
+                    result = await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout)
+                except BrokenProcessPool:
+                    print("⚠️ Inference worker crashed, replacing it")
+                    self._replace(slot)
+                    if attempt == 1:
+                        raise
+                    continue
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    print(f"⚠️ Prediction timed out after {self.timeout}s, replacing its worker")
+                    self._replace(slot)
+                    raise PredictionTimeout(f"Prediction timed out after {self.timeout}s")
+                except asyncio.CancelledError:
+                    # Caller went away: the worker is free again once the task ends
+                    future.add_done_callback(lambda _: self._release(slot))
+                    raise
+                except Exception:
+                    self._release(slot)
+                    raise
+                self._release(slot)
+                return result
+            raise BrokenProcessPool("Inference workers keep failing")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            ready = sum(1 for slot in self._slots if slot.ready)
+            idle = self._idle.qsize() if self._idle is not None else 0
+            return {
+                "workers": self.workers,
+                "running": bool(self._slots),
+                "ready": ready,
+                "busy": max(0, ready - idle),
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "timeout_seconds": self.timeout,
+                "start_timeout_seconds": self.start_timeout,
+                "restarts": self.restarts,
+                "timeouts": self.timeouts,
+                "rejected": self.rejected,
+            }
@@ -0,0 +1,94 @@
+import copy
+import json
+import sys
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+
+def canonical_features(features) -> tuple:
+    """Canonical, hashable form of a feature row.
+
+    Values are coerced to float so that 63, 63.0 and "63" produce the same key,
+    and -0.0 is folded into 0.0.
+    """
+    return tuple(float(value) + 0.0 for value in features)
+
+
+class PredictionCache:
+    """Thread-safe LRU cache of prediction results.
+
+    Keys are (disease, model version, canonical feature tuple), so results are
+    never shared between model versions. The cache is bounded both by entry
+    count and by an estimate of the bytes held by keys and results.
+    """
+
+    def __init__(self, max_entries: int = 4096, max_bytes: int = 4 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(disease: str, version: str, features) -> tuple:
+        return (disease, version, canonical_features(features))
+
+    @staticmethod
+    def _entry_size(key: tuple, result: dict) -> int:
+        return sys.getsizeof(key) + 24 * len(key[2]) + len(json.dumps(result, default=str))
+
+    def get(self, key: tuple) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            result = entry[0]
+        # Callers may mutate the returned dict, so hand out a copy
+        return copy.deepcopy(result)
+
+    def put(self, key: tuple, result: dict):
+        if self.max_entries <= 0:
+            return
+        size = self._entry_size(key, result)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (copy.deepcopy(result), size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, *_):
+        """Drop every cached result (used as a model registry reload callback)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,132 @@
+import hashlib
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import joblib
+
+from app.core.config import settings
+from app.ml_models.fast_path import compile_scorer, verify_scorer
+
+# Model and scaler files for each tabular disease model
+MODEL_FILES = {
+    "heart": ("heart_disease_model.pkl", "heart_scaler.pkl"),
+    "diabetes": ("diabetes_model_.pkl", "scaler.pkl"),
+}
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+
+
+def _file_digest(path: str) -> str:
+    """Short SHA-256 of a model file, used as its version tag"""
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()[:12]
+
+
+class ModelRegistry:
+    """Holds the loaded sklearn models/scalers together with a version per disease.
+
+    The version is derived from the content of the model and scaler files, so a
+    retrained model dropped into ml_models/ gets a new version on reload().
+    Callbacks registered with on_reload() run after every reload.
+
+    With fast_path enabled each model is also compiled into a NumPy scorer,
+    which is only kept if it reproduces sklearn's output on a test corpus.
+    """
+
+    def __init__(self, base_path: str = BASE_PATH, model_files: Dict[str, Tuple[str, str]] = None,
+                 fast_path: bool = True):
+        self.base_path = base_path
+        self.model_files = model_files or MODEL_FILES
+        self.fast_path = fast_path
+        self.models = {}
+        self.scalers = {}
+        self.scorers = {}
+        self.versions = {}
+        self._listeners: List[Callable[["ModelRegistry"], None]] = []
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Load (or reload) every configured model; failures leave that disease unavailable"""
+        models, scalers, scorers, versions = {}, {}, {}, {}
+        for disease, (model_file, scaler_file) in self.model_files.items():
+            model_path = os.path.join(self.base_path, model_file)
+            scaler_path = os.path.join(self.base_path, scaler_file)
+            try:
+                models[disease] = joblib.load(model_path)
+                scalers[disease] = joblib.load(scaler_path)
+                versions[disease] = f"{_file_digest(model_path)}-{_file_digest(scaler_path)}"
+                print(f"✅ {disease.capitalize()} model loaded successfully (version {versions[disease]})")
+            except Exception as e:
+                models.pop(disease, None)
+                scalers.pop(disease, None)
+                print(f"❌ Failed to load {disease} model: {e}")
+                continue
+
+            if self.fast_path:
+                scorer = self._compile(disease, models[disease], scalers[disease])
+                if scorer is not None:
+                    scorers[disease] = scorer
+
+        with self._lock:
+            # Swap the dicts in place so modules holding a reference see the new models
+            self.models.clear()
+            self.models.update(models)
+            self.scalers.clear()
+            self.scalers.update(scalers)
+            self.scorers.clear()
+            self.scorers.update(scorers)
+            self.versions.clear()
+            self.versions.update(versions)
+            listeners = list(self._listeners)
+
+        for callback in listeners:
+            try:
+                callback(self)
+            except Exception as e:
+                print(f"⚠️ Model registry reload callback failed: {e}")
+        return self
+
+    @staticmethod
+    def _compile(disease: str, model, scaler):
+        try:
+            scorer = compile_scorer(model, scaler)
+            if scorer is None:
+                print(f"ℹ️ No fast path for {disease} model ({type(model).__name__}), using sklearn")
+                return None
+            if not verify_scorer(scorer, model, scaler):
+                print(f"⚠️ Fast path for {disease} model does not match sklearn, using sklearn")
+                return None
+            print(f"⚡ Fast path enabled for {disease} model ({scorer.kind})")
+            return scorer
+        except Exception as e:
+            print(f"⚠️ Could not compile fast path for {disease} model: {e}")
+            return None
+
+    def reload(self):
+        """Reload models from disk and notify listeners"""
+        return self.load()
+
+    def on_reload(self, callback: Callable[["ModelRegistry"], None]):
+        """Register a callback invoked after every (re)load"""
+        with self._lock:
+            self._listeners.append(callback)
+        return callback
+
+    def get(self, disease: str) -> Optional[Tuple[object, object, object, str]]:
+        """Return (model, scaler, compiled scorer or None, version), or None if not loaded"""
+        with self._lock:
+            if disease not in self.models or disease not in self.scalers:
+                return None
+            return self.models[disease], self.scalers[disease], self.scorers.get(disease), self.versions[disease]
+
+    def available(self) -> Dict[str, str]:
+        """Map of loaded disease -> model version"""
+        with self._lock:
+            return dict(self.versions)
+
+
+registry = ModelRegistry(fast_path=settings.PREDICTION_FAST_PATH)
@@ -0,0 +1,141 @@
+import base64
+import io
+import json
+import os
+import threading
+from typing import List, Optional, Sequence
+
+import numpy as np
+from PIL import Image, ImageOps
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+
+# Class order of the original Keras model (see QuickCheckup.jsx)
+DEFAULT_CLASSES = ["Acne", "Melanoma", "Peeling skin", "Ring worm", "Vitiligo"]
+
+
+class SkinModelUnavailable(Exception):
+    """Raised when the ONNX runtime or the exported skin model is missing"""
+
+
+class SkinClassifier:
+    """CPU-only skin disease classifier running an ONNX export of the Keras model.
+
+    Nothing is imported or loaded until the first prediction, so workers that
+    never receive a skin request don't pay for onnxruntime or the model.
+    Images are decoded and resized in memory with Pillow.
+
+    The model is expected at ml_models/skindisease.onnx, e.g. exported from the
+    old skindisease.h5 with ``python -m tf2onnx.convert --keras skindisease.h5
+    --output skindisease.onnx``. An optional skindisease_labels.json next to it
+    overrides the class names.
+    """
+
+    def __init__(self, model_path: str = None, threads: int = 1, max_batch: int = 16):
+        self.model_path = model_path or os.path.join(BASE_PATH, "skindisease.onnx")
+        self.threads = threads
+        self.max_batch = max_batch
+        self.classes = list(DEFAULT_CLASSES)
+        self._session = None
+        self._input_name = None
+        self._channels_first = False
+        self._size = (224, 224)
+        self._lock = threading.Lock()
+        self.load_error = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._session is not None
+
+    def _load(self):
+        with self._lock:
+            if self._session is not None:
+                return self._session
+            try:
+                import onnxruntime as ort
+            except ImportError:
+                self.load_error = "onnxruntime not installed"
+                raise SkinModelUnavailable(self.load_error)
+            if not os.path.exists(self.model_path):
+                self.load_error = f"model file not found: {os.path.basename(self.model_path)}"
+                raise SkinModelUnavailable(self.load_error)
+
+            options = ort.SessionOptions()
+            options.intra_op_num_threads = self.threads
+            options.inter_op_num_threads = 1
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            session = ort.InferenceSession(self.model_path, sess_options=options,
+                                           providers=["CPUExecutionProvider"])
+
+            model_input = session.get_inputs()[0]
+            shape = model_input.shape  # e.g. [None, 224, 224, 3] or [None, 3, 224, 224]
+            self._channels_first = shape[1] == 3
+            height, width = (shape[2], shape[3]) if self._channels_first else (shape[1], shape[2])
+            if isinstance(height, int) and isinstance(width, int):
+                self._size = (width, height)
+            self._input_name = model_input.name
+
+            labels_path = os.path.splitext(self.model_path)[0] + "_labels.json"
+            if os.path.exists(labels_path):
+                with open(labels_path) as f:
+                    self.classes = json.load(f)
+
+            self._session = session
+            self.load_error = None
+            print(f"✅ Skin disease model loaded ({os.path.basename(self.model_path)}, input {self._size})")
+            return session
+
+    def preprocess(self, data: bytes) -> np.ndarray:
+        """Decode image bytes in memory and return a float32 HWC array in [0, 1]"""
+        img = Image.open(io.BytesIO(data))
+        # Let the JPEG decoder downscale by a power of two before the full decode
+        img.draft("RGB", (self._size[0] * 2, self._size[1] * 2))
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        img = img.resize(self._size, Image.BILINEAR)
+        return np.asarray(img, dtype=np.float32) / 255.0
+
+    def predict_batch(self, images: Sequence[bytes]) -> List[dict]:
+        """Classify a batch of encoded images, running the model in chunks of max_batch"""
+        session = self._load()
+        results = []
+        for start in range(0, len(images), self.max_batch):
+            batch = np.stack([self.preprocess(data) for data in images[start:start + self.max_batch]])
+            if self._channels_first:
+                batch = batch.transpose(0, 3, 1, 2)
+            probabilities = session.run(None, {self._input_name: np.ascontiguousarray(batch)})[0]
+            results.extend(self._format(row) for row in probabilities)
+        return results
+
+    def predict(self, data: bytes) -> dict:
+        return self.predict_batch([data])[0]
+
+    def _format(self, probabilities: np.ndarray) -> dict:
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        if probabilities.min() < 0 or not np.isclose(probabilities.sum(), 1.0, atol=1e-3):
+            # Model exported without its softmax layer
+            exp = np.exp(probabilities - probabilities.max())
+            probabilities = exp / exp.sum()
+        best = int(np.argmax(probabilities))
+        names = self.classes if len(self.classes) == len(probabilities) else [f"class_{i}" for i in range(len(probabilities))]
+        return {
+            "prediction": names[best],
+            "confidence": float(probabilities[best]),
+            "all_probabilities": {name: float(p) for name, p in zip(names, probabilities)},
+        }
+
+    def status(self) -> dict:
+        return {
+            "loaded": self.loaded,
+            "model_file": os.path.basename(self.model_path),
+            "model_present": os.path.exists(self.model_path),
+            "input_size": list(self._size),
+            "classes": self.classes,
+            "error": self.load_error,
+        }
+
+
+def decode_base64_image(value: str) -> bytes:
+    """Accept raw base64 or a data URL (data:image/png;base64,...)"""
+    if value.startswith("data:") and "," in value:
+        value = value.split(",", 1)[1]
+    return base64.b64decode(value)
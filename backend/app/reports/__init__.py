@@ -0,0 +1 @@
+# Lab report processing package
@@ -0,0 +1,327 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Declarative analyte catalog.
+#
+# Each analyte lists the keywords/units the extractor looks for (longer keywords
+# before their prefixes, e.g. "total cholesterol" before "cholesterol"), factors that
+# convert other units into the canonical unit, and one or more rules. A rule
+# applies to an optional sex ("male"/"female") and age range [min_age, max_age)
+# and describes consecutive status bands by their upper bound:
+#   ("lt", x)  band holds values < x
+#   ("le", x)  band holds values <= x
+#   None       last band, everything above
+# The most specific matching rule wins (sex and age > sex or age > default).
+CATALOG = {
+    "blood_sugar": {
+        "test_name": "Blood Glucose",
+        "keywords": ["glucose", "sugar", "fbs", "rbs"],
+        "units": ["mg/dl", "mmol/l"],
+        "canonical_unit": "mg/dl",
+        "conversions": {"mmol/l": 18.0},
+        "rules": [
+            {
+                "reference_range": "70-100 mg/dL (fasting)",
+                "bands": [
+                    (("lt", 70), "low", "Low blood sugar - consult doctor immediately. Have some glucose/sugar."),
+                    (("le", 100), "normal", "Normal fasting blood sugar level. Maintain healthy diet."),
+                    (("le", 125), "high", "Pre-diabetic range. Consider lifestyle changes and doctor consultation."),
+                    (None, "critical", "Diabetic range. Immediate medical attention required."),
+                ],
+            },
+        ],
+    },
+    "cholesterol": {
+        "test_name": "Total Cholesterol",
+        "keywords": ["total cholesterol", "cholesterol"],
+        "units": ["mg/dl", "mmol/l"],
+        "canonical_unit": "mg/dl",
+        "conversions": {"mmol/l": 38.67},
+        "rules": [
+            {
+                "reference_range": "<200 mg/dL",
+                "bands": [
+                    (("lt", 200), "normal", "Good cholesterol level. Maintain healthy diet."),
+                    (("le", 239), "high", "Borderline high cholesterol. Consider dietary changes."),
+                    (None, "critical", "High cholesterol. Medical consultation recommended."),
+                ],
+            },
+        ],
+    },
+    "hemoglobin": {
+        "test_name": "Hemoglobin",
+        "keywords": ["hemoglobin", "haemoglobin", "hb"],
+        "units": ["g/dl", "gm/dl", "g/l"],
+        "canonical_unit": "g/dl",
+        "conversions": {"gm/dl": 1.0, "g/l": 0.1},
+        "rules": [
+            {
+                "reference_range": "12-15 g/dL",
+                "bands": [
+                    (("lt", 12), "low", "Low hemoglobin. Iron-rich foods and medical consultation recommended."),
+                    (("le", 15), "normal", "Normal hemoglobin level."),
+                    (None, "high", "High hemoglobin. Further investigation may be needed."),
+                ],
+            },
+            {
+                "sex": "male",
+                "min_age": 12,
+                "reference_range": "13.5-17.5 g/dL",
+                "bands": [
+                    (("lt", 13.5), "low", "Low hemoglobin. Iron-rich foods and medical consultation recommended."),
+                    (("le", 17.5), "normal", "Normal hemoglobin level."),
+                    (None, "high", "High hemoglobin. Further investigation may be needed."),
+                ],
+            },
+            {
+                "sex": "female",
+                "min_age": 12,
+                "reference_range": "12-15.5 g/dL",
+                "bands": [
+                    (("lt", 12), "low", "Low hemoglobin. Iron-rich foods and medical consultation recommended."),
+                    (("le", 15.5), "normal", "Normal hemoglobin level."),
+                    (None, "high", "High hemoglobin. Further investigation may be needed."),
+                ],
+            },
+            {
+                "max_age": 12,
+                "reference_range": "11.5-15.5 g/dL (children)",
+                "bands": [
+                    (("lt", 11.5), "low", "Low hemoglobin for age. Paediatric consultation recommended."),
+                    (("le", 15.5), "normal", "Normal hemoglobin level."),
+                    (None, "high", "High hemoglobin. Further investigation may be needed."),
+                ],
+            },
+        ],
+    },
+    "creatinine": {
+        "test_name": "Creatinine",
+        "keywords": ["serum creatinine", "creatinine"],
+        "units": ["mg/dl", "umol/l", "µmol/l"],
+        "canonical_unit": "mg/dl",
+        "conversions": {"umol/l": 1 / 88.4, "µmol/l": 1 / 88.4},
+        "rules": [
+            {
+                "reference_range": "0.6-1.2 mg/dL",
+                "bands": [
+                    (("lt", 0.6), "low", "Low creatinine, often related to low muscle mass. Discuss with your doctor."),
+                    (("le", 1.2), "normal", "Normal kidney function marker."),
+                    (("le", 4.0), "high", "Raised creatinine. Kidney function tests and doctor consultation recommended."),
+                    (None, "critical", "Very high creatinine. Immediate medical attention required."),
+                ],
+            },
+            {
+                "sex": "male",
+                "reference_range": "0.74-1.35 mg/dL",
+                "bands": [
+                    (("lt", 0.74), "low", "Low creatinine, often related to low muscle mass. Discuss with your doctor."),
+                    (("le", 1.35), "normal", "Normal kidney function marker."),
+                    (("le", 4.0), "high", "Raised creatinine. Kidney function tests and doctor consultation recommended."),
+                    (None, "critical", "Very high creatinine. Immediate medical attention required."),
+                ],
+            },
+            {
+                "sex": "female",
+                "reference_range": "0.59-1.04 mg/dL",
+                "bands": [
+                    (("lt", 0.59), "low", "Low creatinine, often related to low muscle mass. Discuss with your doctor."),
+                    (("le", 1.04), "normal", "Normal kidney function marker."),
+                    (("le", 4.0), "high", "Raised creatinine. Kidney function tests and doctor consultation recommended."),
+                    (None, "critical", "Very high creatinine. Immediate medical attention required."),
+                ],
+            },
+        ],
+    },
+    "systolic_bp": {
+        "test_name": "Systolic Blood Pressure",
+        "keywords": ["systolic"],
+        "units": ["mmhg"],
+        "canonical_unit": "mmhg",
+        "conversions": {},
+        "rules": [
+            {
+                "reference_range": "90-120 mmHg",
+                "bands": [
+                    (("lt", 90), "low", "Low blood pressure. Monitor and consult doctor if symptoms persist."),
+                    (("le", 120), "normal", "Normal blood pressure. Maintain healthy lifestyle."),
+                    (("le", 139), "high", "Pre-hypertension. Consider lifestyle modifications."),
+                    (None, "critical", "High blood pressure. Medical attention recommended."),
+                ],
+            },
+        ],
+    },
+    "diastolic_bp": {
+        "test_name": "Diastolic Blood Pressure",
+        "keywords": ["diastolic"],
+        "units": ["mmhg"],
+        "canonical_unit": "mmhg",
+        "conversions": {},
+        "rules": [
+            {
+                "reference_range": "60-80 mmHg",
+                "bands": [
+                    (("lt", 60), "low", "Low blood pressure. Monitor and consult doctor if symptoms persist."),
+                    (("le", 80), "normal", "Normal blood pressure. Maintain healthy lifestyle."),
+                    (("le", 89), "high", "Pre-hypertension. Consider lifestyle modifications."),
+                    (None, "critical", "High blood pressure. Medical attention recommended."),
+                ],
+            },
+        ],
+    },
+}
+
+UNKNOWN = ("unknown", "Unable to analyze this value.")
+
+
+@dataclass
+class Classification:
+    status: str
+    recommendation: str
+    reference_range: str
+    value: Optional[float]  # in the canonical unit
+    canonical_unit: str
+
+
+class _CompiledRule:
+    def __init__(self, analyte: str, spec: dict):
+        self.analyte = analyte
+        self.sex = spec.get("sex")
+        self.min_age = spec.get("min_age")
+        self.max_age = spec.get("max_age")
+        self.reference_range = spec["reference_range"]
+        self.statuses = [band[1] for band in spec["bands"]]
+        self.recommendations = [band[2] for band in spec["bands"]]
+        edges = []
+        for bound, _, _ in spec["bands"][:-1]:
+            op, x = bound
+            # Band boundaries become "first value of the next band" so that
+            # searchsorted(side="right") returns the band index for both < and <=
+            edges.append(float(x) if op == "lt" else float(np.nextafter(x, np.inf)))
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.specificity = (self.sex is not None) + (self.min_age is not None or self.max_age is not None)
+
+    def matches(self, sex: Optional[str], age: Optional[float]) -> bool:
+        if self.sex is not None and self.sex != sex:
+            return False
+        # An unknown age is treated as adult: it satisfies min_age but not max_age
+        if self.min_age is not None and age is not None and age < self.min_age:
+            return False
+        if self.max_age is not None and (age is None or age >= self.max_age):
+            return False
+        return True
+
+
+class AnalyteCatalog:
+    """Compiled form of CATALOG with vectorized classification.
+
+    classify_many() converts every value to its canonical unit, picks the rule
+    for each record, then resolves status bands with one np.searchsorted call
+    per distinct rule, so hundreds of values (or a bulk re-analysis of many
+    reports) are classified in a single vectorized pass.
+    """
+
+    def __init__(self, catalog: Dict[str, dict] = None):
+        self.catalog = catalog or CATALOG
+        self.rules: List[_CompiledRule] = []
+        self._rules_by_analyte: Dict[str, List[int]] = {}
+        for analyte, spec in self.catalog.items():
+            indices = []
+            for rule_spec in spec["rules"]:
+                self.rules.append(_CompiledRule(analyte, rule_spec))
+                indices.append(len(self.rules) - 1)
+            # Most specific rules first; the unrestricted rule is the fallback
+            indices.sort(key=lambda i: -self.rules[i].specificity)
+            self._rules_by_analyte[analyte] = indices
+
+    def _rule_for(self, analyte: str, sex: Optional[str], age: Optional[float]) -> int:
+        for index in self._rules_by_analyte.get(analyte, []):
+            if self.rules[index].matches(sex, age):
+                return index
+        return -1
+
+    def conversion_factor(self, analyte: str, unit: Optional[str]) -> float:
+        spec = self.catalog.get(analyte)
+        if spec is None:
+            return np.nan
+        unit = (unit or spec["canonical_unit"]).lower()
+        if unit == spec["canonical_unit"]:
+            return 1.0
+        return spec["conversions"].get(unit, np.nan)
+
+    def classify_many(self, analytes: Sequence[str], values: Sequence, units: Sequence[Optional[str]],
+                      sex: Sequence[Optional[str]] = None, age: Sequence[Optional[float]] = None) -> List[Classification]:
+        n = len(analytes)
+        sex = sex if sex is not None else [None] * n
+        age = age if age is not None else [None] * n
+
+        raw = np.full(n, np.nan)
+        for i, value in enumerate(values):
+            try:
+                raw[i] = float(value)
+            except (TypeError, ValueError):
+                pass
+        # Per-record lookups are memoized; a bulk run repeats few distinct keys
+        factor_memo, rule_memo = {}, {}
+        factors = np.empty(n)
+        rule_ids = np.empty(n, dtype=np.intp)
+        for i in range(n):
+            unit_key = (analytes[i], units[i])
+            if unit_key not in factor_memo:
+                factor_memo[unit_key] = self.conversion_factor(*unit_key)
+            factors[i] = factor_memo[unit_key]
+            rule_key = (analytes[i], sex[i], age[i])
+            if rule_key not in rule_memo:
+                rule_memo[rule_key] = self._rule_for(analytes[i], _normalize_sex(sex[i]), _to_age(age[i]))
+            rule_ids[i] = rule_memo[rule_key]
+        canonical = raw * factors
+
+        band_ids = np.full(n, -1, dtype=np.intp)
+        valid = ~np.isnan(canonical) & (rule_ids >= 0)
+        for rule_id in np.unique(rule_ids[valid]):
+            mask = valid & (rule_ids == rule_id)
+            band_ids[mask] = np.searchsorted(self.rules[rule_id].edges, canonical[mask], side="right")
+
+        results = []
+        for i in range(n):
+            spec = self.catalog.get(analytes[i], {})
+            canonical_unit = spec.get("canonical_unit", "")
+            if band_ids[i] < 0:
+                reference = self.rules[rule_ids[i]].reference_range if rule_ids[i] >= 0 else ""
+                results.append(Classification(UNKNOWN[0], UNKNOWN[1], reference, None, canonical_unit))
+                continue
+            rule = self.rules[rule_ids[i]]
+            results.append(Classification(
+                status=rule.statuses[band_ids[i]],
+                recommendation=rule.recommendations[band_ids[i]],
+                reference_range=rule.reference_range,
+                value=float(canonical[i]),
+                canonical_unit=canonical_unit,
+            ))
+        return results
+
+    def classify(self, analyte: str, value, unit: Optional[str] = None,
+                 sex: Optional[str] = None, age: Optional[float] = None) -> Classification:
+        return self.classify_many([analyte], [value], [unit], [sex], [age])[0]
+
+
+def _normalize_sex(value) -> Optional[str]:
+    if not value:
+        return None
+    value = str(value).strip().lower()
+    if value in ("m", "male", "man"):
+        return "male"
+    if value in ("f", "female", "woman"):
+        return "female"
+    return None
+
+
+def _to_age(value) -> Optional[float]:
+    try:
+        return float(value) if value is not None and value != "" else None
+    except (TypeError, ValueError):
+        return None
+
+
+catalog = AnalyteCatalog()
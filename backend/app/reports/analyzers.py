@@ -0,0 +1,221 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from app.reports.analytes import CATALOG, catalog
+from app.reports.extractor import extract_lab_values
+from app.llm.gateway import llm_gateway
+
+
+# Changes whenever an analyte, keyword, unit or band is edited, so the stages
+# that depend on the catalog are re-run for stored reports
+CATALOG_VERSION = hashlib.sha1(json.dumps(CATALOG, sort_keys=True, default=str).encode()).hexdigest()[:12]
+
+
+def fingerprint(report: dict, fields: Sequence[str]) -> str:
+    """Short hash of the report fields a stage reads"""
+    data = json.dumps([report.get(field) for field in fields], sort_keys=True, default=str)
+    return hashlib.sha1(data.encode()).hexdigest()[:16]
+
+
+class ReportAnalyzer:
+    """One analysis stage of the report pipeline.
+
+    A stage reads the report fields listed in ``requires`` and returns the
+    fields listed in ``produces``. The pipeline stores the stage's version
+    and a fingerprint of its inputs on the report, so a stage only runs
+    again when its code/data version changes or an earlier stage changed
+    its inputs.
+    """
+
+    name = ""
+    version = "1"
+    requires: Sequence[str] = ()
+    produces: Sequence[str] = ()
+    optional = False  # Failures are logged and the stage is retried on the next run
+
+    def available(self) -> bool:
+        return True
+
+    def analyze(self, report: dict) -> dict:
+        raise NotImplementedError
+
+    def analyze_many(self, reports: List[dict]) -> List[dict]:
+        return [self.analyze(report) for report in reports]
+
+
+class RegexAnalyzer(ReportAnalyzer):
+    """Lab values found in the extracted text by the single-pass keyword extractor"""
+
+    name = "regex"
+    version = f"1:{CATALOG_VERSION}"
+    requires = ("extracted_text",)
+    produces = ("lab_values",)
+
+    def analyze(self, report: dict) -> dict:
+        values = extract_lab_values(report.get("extracted_text") or "")
+        return {"lab_values": [
+            {"analyte": v.analyte, "test_name": v.test_name, "value": v.value, "unit": v.unit, "line": v.line}
+            for v in values
+        ]}
+
+
+class RulesTableAnalyzer(ReportAnalyzer):
+    """Status and recommendation for each lab value from the analyte rules table"""
+
+    name = "rules"
+    version = f"1:{CATALOG_VERSION}"
+    requires = ("lab_values", "patient_sex", "patient_age")
+    produces = ("analysis_results",)
+
+    def analyze(self, report: dict) -> dict:
+        return self.analyze_many([report])[0]
+
+    def analyze_many(self, reports: List[dict]) -> List[dict]:
+        # All values of all reports are classified in one vectorized pass
+        flat = [(i, value) for i, report in enumerate(reports) for value in report.get("lab_values") or []]
+        classifications = catalog.classify_many(
+            [v["analyte"] for _, v in flat],
+            [v["value"] for _, v in flat],
+            [v["unit"] for _, v in flat],
+            [reports[i].get("patient_sex") for i, _ in flat],
+            [reports[i].get("patient_age") for i, _ in flat],
+        )
+        results = [[] for _ in reports]
+        for (i, value), result in zip(flat, classifications):
+            results[i].append({
+                "analyte": value["analyte"],
+                "test_name": value["test_name"],
+                "value": f"{value['value']} {value['unit']}",
+                "unit": value["unit"],
+                "reference_range": result.reference_range,
+                "status": result.status,
+                "recommendation": result.recommendation
+            })
+        return [{"analysis_results": r} for r in results]
+
+
+class LlmAnalyzer(ReportAnalyzer):
+    """Plain-language summary of the classified results written by an LLM (Groq, via the LLM gateway)"""
+
+    name = "llm"
+    version = "1"
+    requires = ("analysis_results",)
+    produces = ("ai_analysis",)
+    optional = True
+
+    PROMPT = (
+        "You are a kind medical assistant. Summarize these lab results for the patient in at most "
+        "five short sentences. Mention values outside the normal range first and suggest seeing a "
+        "doctor when something is high, low or critical. Do not invent values.\n\n{results}"
+    )
+
+    def __init__(self, model: str = None):
+        # None: the configured provider's model
+        self.model = model or os.getenv("LAB_REPORT_LLM_MODEL") or None
+        self.version = f"1:{self.model or llm_gateway.provider.model}"
+
+    def available(self) -> bool:
+        return llm_gateway.provider.unavailable() is None
+
+    def analyze(self, report: dict) -> dict:
+        results = report.get("analysis_results") or []
+        if not results:
+            return {"ai_analysis": "No lab values were recognized in this report."}
+        lines = "\n".join(f"- {r['test_name']}: {r['value']} (normal {r['reference_range']}, {r['status']})"
+                          for r in results)
+        # Runs in the report queue's worker threads; the gateway bounds concurrent completions
+        completion = llm_gateway.complete_sync(
+            [{"role": "user", "content": self.PROMPT.format(results=lines)}],
+            model=self.model, temperature=0.3, max_tokens=300,
+        )
+        return {"ai_analysis": completion.text.strip()}
+
+
+# Analyzer plugins by name; LAB_REPORT_ANALYZERS selects and orders them
+ANALYZERS = {
+    "regex": RegexAnalyzer,
+    "rules": RulesTableAnalyzer,
+    "llm": LlmAnalyzer,
+}
+
+
+class AnalysisPipeline:
+    """Ordered analyzers run incrementally over one or many reports.
+
+    Each report keeps ``stages: {name: {"version", "input", "completed_at"}}``.
+    run() executes a stage only for the reports where it is missing, its
+    version changed or its input fingerprint changed (``force`` re-runs it
+    anyway), and batches those reports into one analyze_many() call.
+    """
+
+    def __init__(self, analyzers: Iterable[ReportAnalyzer]):
+        self.analyzers = list(analyzers)
+
+    @classmethod
+    def from_names(cls, names: Iterable[str]) -> "AnalysisPipeline":
+        analyzers = []
+        for name in names:
+            name = name.strip()
+            if not name:
+                continue
+            if name not in ANALYZERS:
+                raise ValueError(f"Unknown analyzer '{name}'. Available: {', '.join(ANALYZERS)}")
+            analyzers.append(ANALYZERS[name]())
+        return cls(analyzers)
+
+    @property
+    def names(self) -> List[str]:
+        return [a.name for a in self.analyzers]
+
+    def is_stale(self, analyzer: ReportAnalyzer, report: dict) -> bool:
+        stage = (report.get("stages") or {}).get(analyzer.name)
+        return (not stage or stage.get("version") != analyzer.version
+                or stage.get("input") != fingerprint(report, analyzer.requires))
+
+    def run(self, reports: List[dict], only: Optional[Sequence[str]] = None,
+            force: Sequence[str] = ()) -> List[dict]:
+        """Run the stale stages; returns the fields to update for each report"""
+        current = [dict(report, stages=dict(report.get("stages") or {})) for report in reports]
+        updates: List[Dict] = [{} for _ in reports]
+
+        for analyzer in self.analyzers:
+            if only is not None and analyzer.name not in only:
+                continue
+            if not analyzer.available():
+                continue
+            stale = [i for i, report in enumerate(current)
+                     if analyzer.name in force or self.is_stale(analyzer, report)]
+            if not stale:
+                continue
+
+            inputs = [current[i] for i in stale]
+            if analyzer.optional:
+                outputs = []
+                for report in inputs:
+                    try:
+                        outputs.append(analyzer.analyze(report))
+                    except Exception as e:
+                        print(f"⚠️ Analyzer {analyzer.name} failed for report {report.get('_id')}: {e}")
+                        outputs.append(None)
+            else:
+                outputs = analyzer.analyze_many(inputs)
+
+            completed_at = datetime.utcnow().isoformat()
+            for i, output in zip(stale, outputs):
+                if output is None:
+                    continue
+                report = current[i]
+                report["stages"][analyzer.name] = {
+                    "version": analyzer.version,
+                    "input": fingerprint(report, analyzer.requires),
+                    "completed_at": completed_at,
+                }
+                for field in analyzer.produces:
+                    if report.get(field) != output.get(field):
+                        updates[i][field] = output.get(field)
+                    report[field] = output.get(field)
+                updates[i]["stages"] = report["stages"]
+        return updates
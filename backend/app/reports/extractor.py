@@ -0,0 +1,101 @@
+import re
+from dataclasses import dataclass
+from typing import Dict, List
+
+from app.reports.analytes import CATALOG
+
+# Analytes recognised in OCR text, taken from the analyte catalog. Adding an
+# analyte there extends the single combined keyword regex, so a new analyte
+# costs no extra pass over the text.
+ANALYTES = [
+    {
+        "key": key,
+        "test_name": spec["test_name"],
+        "keywords": spec["keywords"],
+        "units": spec["units"],
+        "reference_range": spec["rules"][0]["reference_range"],
+    }
+    for key, spec in CATALOG.items()
+]
+
+
+@dataclass
+class LabValue:
+    """One analyte value found in a report"""
+    analyte: str
+    test_name: str
+    value: str
+    unit: str
+    reference_range: str
+    line: int
+
+
+class LabValueExtractor:
+    """Single-pass extractor for analyte values in OCR text.
+
+    All keywords of all analytes are compiled into one alternation with a named
+    group per analyte, and the lowercased text is scanned once with finditer
+    (a lookahead on the keywords' first letters lets the regex engine skip
+    most positions cheaply). For each keyword hit only the rest of that line
+    is parsed for "<number> <unit>" with a per-analyte precompiled value
+    regex. Each analyte is reported at most once per line.
+    """
+
+    def __init__(self, analytes: List[dict] = None):
+        self.analytes: Dict[str, dict] = {a["key"]: a for a in (analytes or ANALYTES)}
+        alternation = "|".join(
+            f"(?P<{key}>{'|'.join(re.escape(k.lower()) for k in a['keywords'])})"
+            for key, a in self.analytes.items()
+        )
+        first_chars = sorted({k[0].lower() for a in self.analytes.values() for k in a["keywords"]})
+        self.keyword_re = re.compile(rf"\b(?=[{re.escape(''.join(first_chars))}])(?:{alternation})")
+        self.value_res = {
+            key: re.compile(rf"(\d+\.?\d*)\s*({'|'.join(re.escape(u.lower()) for u in a['units'])})")
+            for key, a in self.analytes.items()
+        }
+
+    def extract(self, text: str) -> List[LabValue]:
+        text = text.lower()
+        results = []
+        seen = set()  # (line start offset, analyte)
+        line_no = 0
+        line_start = 0
+        line_end = -1
+
+        for match in self.keyword_re.finditer(text):
+            if match.start() > line_end:
+                # Moved past the current line: locate the line holding this match
+                newlines = text.count("\n", line_start, match.start())
+                if newlines:
+                    line_no += newlines
+                    line_start = text.rfind("\n", 0, match.start()) + 1
+                line_end = text.find("\n", match.start())
+                if line_end == -1:
+                    line_end = len(text)
+
+            analyte = match.lastgroup
+            if (line_start, analyte) in seen:
+                continue
+            value_match = self.value_res[analyte].search(text, match.end(), line_end)
+            if value_match is None:
+                continue
+            seen.add((line_start, analyte))
+
+            spec = self.analytes[analyte]
+            value, unit = value_match.group(1), value_match.group(2)
+            results.append(LabValue(
+                analyte=analyte,
+                test_name=spec["test_name"],
+                value=value,
+                unit=unit,
+                reference_range=spec["reference_range"],
+                line=line_no,
+            ))
+        return results
+
+
+default_extractor = LabValueExtractor()
+
+
+def extract_lab_values(text: str) -> List[LabValue]:
+    return default_extractor.extract(text)
@@ -0,0 +1,150 @@
+from datetime import datetime
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from app.reports.analytes import CATALOG, catalog
+
+# Date formats seen in the report form and on printed reports
+DATE_FORMATS = ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y", "%m/%d/%Y", "%d-%b-%Y", "%d %b %Y", "%b %d, %Y")
+
+# Reports analyzed before results carried the analyte key are matched by test name
+ANALYTE_BY_TEST_NAME = {spec["test_name"]: key for key, spec in CATALOG.items()}
+
+
+def normalize_date(value) -> Optional[str]:
+    """ISO date (YYYY-MM-DD) for a date string in any of DATE_FORMATS, else None"""
+    if not value:
+        return None
+    value = str(value).strip()
+    try:
+        return datetime.fromisoformat(value[:10]).date().isoformat()
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def observation_rows(report: dict, analysis_results: List[dict]) -> List[dict]:
+    """One row per analyzed value, in the analyte's canonical unit"""
+    test_date = normalize_date(report.get("test_date")) or normalize_date(report.get("upload_date"))
+    rows = []
+    for result in analysis_results:
+        analyte = result.get("analyte") or ANALYTE_BY_TEST_NAME.get(result.get("test_name"))
+        if analyte not in CATALOG or not test_date:
+            continue
+        try:
+            raw = float(str(result.get("value", "")).split()[0])
+        except (ValueError, IndexError):
+            continue
+        factor = catalog.conversion_factor(analyte, result.get("unit"))
+        if np.isnan(factor):
+            continue
+        rows.append({
+            "user_id": report.get("user_id"),
+            "report_id": str(report["_id"]),
+            "analyte": analyte,
+            "test_date": test_date,
+            "value": round(raw * factor, 4),
+            "unit": CATALOG[analyte]["canonical_unit"],
+            "status": result.get("status", "unknown"),
+        })
+    return rows
+
+
+class ObservationStore:
+    """Normalized lab values: one document per (user, analyte, test date, value).
+
+    Trends read a single range of the (user_id, analyte, test_date) index
+    instead of scanning every report's analysis_results.
+    """
+
+    def __init__(self, collection_getter: Callable):
+        self._collection_getter = collection_getter
+
+    @property
+    def collection(self):
+        return self._collection_getter()
+
+    def ensure_indexes(self):
+        create_index = getattr(self.collection, "create_index", None)  # Not available on the mock DB
+        if create_index is not None:
+            create_index([("user_id", 1), ("analyte", 1), ("test_date", 1)])
+            create_index("report_id")
+
+    def record_report(self, report: dict, analysis_results: List[dict]) -> int:
+        """Replace the observations of one report"""
+        self.delete_report(report["_id"])
+        rows = observation_rows(report, analysis_results)
+        if rows:
+            self.collection.insert_many(rows)
+        return len(rows)
+
+    def delete_report(self, report_id):
+        self.collection.delete_many({"report_id": str(report_id)})
+
+    def series(self, user_id, analyte: str, start: str = None, end: str = None) -> List[dict]:
+        query = {"user_id": user_id, "analyte": analyte}
+        date_range = {}
+        if start:
+            date_range["$gte"] = start
+        if end:
+            date_range["$lte"] = end
+        if date_range:
+            query["test_date"] = date_range
+        rows = list(self.collection.find(query, {"_id": 0}))
+        rows.sort(key=lambda row: row["test_date"])
+        return rows
+
+    def trend(self, user_id, analyte: str, start: str = None, end: str = None, max_points: int = 100) -> dict:
+        rows = self.series(user_id, analyte, start, end)
+        points = [{"date": r["test_date"], "value": r["value"], "status": r["status"],
+                   "report_id": r["report_id"]} for r in rows]
+        downsampled = len(points) > max_points
+        if downsampled:
+            points = downsample(rows, max_points)
+        return {
+            "analyte": analyte,
+            "test_name": CATALOG[analyte]["test_name"],
+            "unit": CATALOG[analyte]["canonical_unit"],
+            "start": start,
+            "end": end,
+            "observations": len(rows),
+            "downsampled": downsampled,
+            "points": points,
+        }
+
+
+def downsample(rows: List[dict], max_points: int) -> List[dict]:
+    """Average date-sorted rows into at most max_points equal-width time buckets"""
+    days = np.array([datetime.fromisoformat(r["test_date"]).toordinal() for r in rows], dtype=np.int64)
+    values = np.array([r["value"] for r in rows], dtype=np.float64)
+    abnormal = np.array([r["status"] not in ("normal", "unknown") for r in rows], dtype=np.int64)
+
+    edges = np.linspace(days[0], days[-1] + 1, max_points + 1)
+    buckets = np.clip(np.searchsorted(edges, days, side="right") - 1, 0, max_points - 1)
+    counts = np.bincount(buckets, minlength=max_points)
+    sums = np.bincount(buckets, weights=values, minlength=max_points)
+    abnormal_counts = np.bincount(buckets, weights=abnormal, minlength=max_points)
+
+    # Rows are sorted, so each non-empty bucket is a contiguous slice
+    starts = np.flatnonzero(counts)
+    offsets = np.concatenate(([0], np.cumsum(counts[starts])[:-1]))
+    minima = np.minimum.reduceat(values, offsets)
+    maxima = np.maximum.reduceat(values, offsets)
+
+    points = []
+    for i, bucket in enumerate(starts):
+        points.append({
+            "date": rows[offsets[i]]["test_date"],
+            "value": round(float(sums[bucket] / counts[bucket]), 4),
+            "min": float(minima[i]),
+            "max": float(maxima[i]),
+            "count": int(counts[bucket]),
+            "abnormal": int(abnormal_counts[bucket]),
+        })
+    return points
@@ -0,0 +1,412 @@
+import multiprocessing
+import os
+import queue
+import shlex
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from PIL import Image
+
+try:
+    import tesserocr
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    tesserocr = None
+    TESSEROCR_AVAILABLE = False
+
+
+@dataclass
+class OcrResult:
+    """Recognised text plus per-word boxes ({"text", "conf", "box": [x, y, w, h]})"""
+    text: str
+    words: List[dict] = field(default_factory=list)
+    engine: str = ""
+    seconds: float = 0.0
+
+
+class OcrUnavailable(Exception):
+    """Raised when no OCR engine can be used"""
+
+
+def parse_tesseract_config(config: str):
+    """Split a tesseract CLI config string into (psm, oem, variables)"""
+    psm, oem, variables = None, None, {}
+    args = shlex.split(config or "")
+    i = 0
+    while i < len(args):
+        if args[i] == "--psm" and i + 1 < len(args):
+            psm = int(args[i + 1])
+            i += 1
+        elif args[i] == "--oem" and i + 1 < len(args):
+            oem = int(args[i + 1])
+            i += 1
+        elif args[i] == "-c" and i + 1 < len(args) and "=" in args[i + 1]:
+            key, value = args[i + 1].split("=", 1)
+            variables[key] = value
+            i += 1
+        i += 1
+    return psm, oem, variables
+
+
+# --- Engines -----------------------------------------------------------------
+
+class OcrEngine:
+    """One loaded OCR engine; recognize() may be called many times"""
+    name = "base"
+
+    def recognize(self, image: Image.Image) -> OcrResult:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class PytesseractEngine(OcrEngine):
+    """Per-call path: every image runs a fresh tesseract subprocess"""
+    name = "pytesseract"
+
+    def __init__(self, lang: str = "eng", config: str = ""):
+        import pytesseract
+        self.pytesseract = pytesseract
+        self.lang = lang
+        self.config = config
+
+    def recognize(self, image: Image.Image) -> OcrResult:
+        start = time.perf_counter()
+        # image_to_data gives the words and their layout in one tesseract run
+        data = self.pytesseract.image_to_data(image, lang=self.lang, config=self.config,
+                                              output_type=self.pytesseract.Output.DICT)
+        words, lines, current, line_key = [], [], [], None
+        for i, text in enumerate(data["text"]):
+            key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+            if key != line_key and current:
+                lines.append(" ".join(current))
+                current = []
+            line_key = key
+            if not text.strip():
+                continue
+            current.append(text)
+            words.append({
+                "text": text,
+                "conf": float(data["conf"][i]),
+                "box": [data["left"][i], data["top"][i], data["width"][i], data["height"][i]],
+            })
+        if current:
+            lines.append(" ".join(current))
+        return OcrResult("\n".join(lines), words, self.name, time.perf_counter() - start)
+
+
+class TesserocrEngine(OcrEngine):
+    """Tesseract C API kept loaded in-process (language model read once)"""
+    name = "tesserocr"
+
+    def __init__(self, lang: str = "eng", config: str = ""):
+        if not TESSEROCR_AVAILABLE:
+            raise OcrUnavailable("tesserocr is not installed")
+        psm, oem, variables = parse_tesseract_config(config)
+        kwargs = {"lang": lang}
+        if psm is not None:
+            kwargs["psm"] = psm
+        if oem is not None:
+            kwargs["oem"] = oem
+        self.api = tesserocr.PyTessBaseAPI(**kwargs)
+        for key, value in variables.items():
+            self.api.SetVariable(key, value)
+
+    def recognize(self, image: Image.Image) -> OcrResult:
+        start = time.perf_counter()
+        self.api.SetImage(image)
+        text = self.api.GetUTF8Text()
+        words = []
+        iterator = self.api.GetIterator()
+        level = tesserocr.RIL.WORD
+        if iterator is not None:
+            for word in tesserocr.iterate_level(iterator, level):
+                value = word.GetUTF8Text(level)
+                box = word.BoundingBox(level)
+                if not value or box is None:
+                    continue
+                x1, y1, x2, y2 = box
+                words.append({"text": value, "conf": float(word.Confidence(level)),
+                              "box": [x1, y1, x2 - x1, y2 - y1]})
+        return OcrResult(text, words, self.name, time.perf_counter() - start)
+
+    def close(self):
+        self.api.End()
+
+
+def create_engine(name: str = "auto", lang: str = "eng", config: str = "") -> OcrEngine:
+    """Load an engine by name; "auto" prefers the persistent tesserocr engine"""
+    if name in ("auto", "tesserocr") and TESSEROCR_AVAILABLE:
+        return TesserocrEngine(lang, config)
+    if name == "tesserocr":
+        raise OcrUnavailable("tesserocr is not installed")
+    try:
+        return PytesseractEngine(lang, config)
+    except ImportError:
+        raise OcrUnavailable("Neither tesserocr nor pytesseract is installed")
+
+
+_process_engine = None
+
+
+def process_engine(name: str = "auto", config: str = "") -> OcrEngine:
+    """Engine loaded once per process (used by the PDF page workers)"""
+    global _process_engine
+    if _process_engine is None:
+        _process_engine = create_engine(name, config=config)
+    return _process_engine
+
+
+# --- Worker side -------------------------------------------------------------
+
+def _worker_main(conn, engine_factory: Callable, factory_args: tuple):
+    """Load the engine once, then serve jobs sent over the pipe until told to stop"""
+    try:
+        engine = engine_factory(*factory_args)
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        return
+    conn.send(("ready", engine.name))
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message[0] == "ping":
+            conn.send(("pong", os.getpid()))
+        elif message[0] == "ocr":
+            _, mode, size = message
+            image = Image.frombytes(mode, size, conn.recv_bytes())
+            try:
+                conn.send(("ok", engine.recognize(image)))
+            except Exception as e:
+                conn.send(("error", f"{type(e).__name__}: {e}"))
+        else:
+            break
+    engine.close()
+
+
+# --- Parent side -------------------------------------------------------------
+
+class _Worker:
+    def __init__(self, ctx, engine_factory, factory_args, start_timeout):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child, engine_factory, factory_args), daemon=True)
+        self.process.start()
+        child.close()
+        self.jobs = 0
+        self.last_used = time.monotonic()
+        if not self.conn.poll(start_timeout):
+            self.kill()
+            raise OcrUnavailable(f"OCR worker did not start within {start_timeout}s")
+        status, detail = self.conn.recv()
+        if status != "ready":
+            self.kill()
+            raise OcrUnavailable(detail)
+        self.engine = detail
+
+    def request(self, message, payload: bytes = None, timeout: float = 60.0):
+        self.conn.send(message)
+        if payload is not None:
+            self.conn.send_bytes(payload)
+        if not self.conn.poll(timeout):
+            raise TimeoutError(f"OCR worker did not answer within {timeout}s")
+        return self.conn.recv()
+
+    def healthy(self, timeout: float = 2.0) -> bool:
+        if not self.process.is_alive():
+            return False
+        try:
+            return self.request(("ping",), timeout=timeout)[0] == "pong"
+        except Exception:
+            return False
+
+    def stop(self):
+        try:
+            self.conn.send(("stop",))
+            self.process.join(timeout=2)
+        except Exception:
+            pass
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout=2)
+        self.conn.close()
+
+
+class OcrWorkerPool:
+    """Pool of long-lived OCR processes that keep the engine loaded.
+
+    Images travel to the workers as raw pixel bytes over a pipe and come
+    back as OcrResult (text + word boxes). Workers are started lazily,
+    pinged before use when they have been idle longer than
+    ``health_interval``, replaced when they crash or time out, and recycled
+    after ``max_jobs`` jobs to bound leaks in the native engine. If no worker
+    can be started (engine missing, spawn failure) or a job keeps failing,
+    the image is recognised with the per-call ``fallback`` engine instead.
+    """
+
+    def __init__(self, workers: int = 2, max_jobs: int = 200, timeout: float = 60.0,
+                 health_interval: float = 30.0, engine_factory: Callable = create_engine,
+                 factory_args: tuple = (), fallback: Callable = None, start_timeout: float = 30.0):
+        self.size = max(1, workers)
+        self.max_jobs = max(1, max_jobs)
+        self.timeout = timeout
+        self.health_interval = health_interval
+        self.engine_factory = engine_factory
+        self.factory_args = factory_args
+        self.fallback = fallback
+        self.start_timeout = start_timeout
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = 0
+        self._disabled_reason: Optional[str] = None
+        self._fallback_engine = None
+        self.jobs = 0
+        self.fallbacks = 0
+        self.recycled = 0
+        self.replaced = 0
+
+    def disable(self, reason: str):
+        """Send every job to the fallback engine"""
+        self._disabled_reason = reason
+
+    def _spawn(self) -> Optional[_Worker]:
+        try:
+            return _Worker(self._ctx, self.engine_factory, self.factory_args, self.start_timeout)
+        except Exception as e:
+            # The engine is not usable in a worker; stop trying and use the fallback
+            self._disabled_reason = str(e)
+            print(f"⚠️ OCR worker pool disabled: {e}")
+            return None
+
+    def _checkout(self) -> Optional[_Worker]:
+        if self._disabled_reason:
+            return None
+        with self._lock:
+            spawn = self._idle.empty() and self._started < self.size
+            if spawn:
+                self._started += 1
+        if spawn:
+            worker = self._spawn()
+            if worker is None:
+                with self._lock:
+                    self._started -= 1
+            return worker
+        try:
+            worker = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            return None
+
+        if worker.jobs >= self.max_jobs:
+            self.recycled += 1
+            worker.stop()
+            return self._respawn()
+        if time.monotonic() - worker.last_used > self.health_interval and not worker.healthy():
+            self.replaced += 1
+            worker.kill()
+            return self._respawn()
+        return worker
+
+    def _respawn(self) -> Optional[_Worker]:
+        worker = self._spawn()
+        if worker is None:
+            with self._lock:
+                self._started -= 1
+        return worker
+
+    def _checkin(self, worker: _Worker):
+        worker.last_used = time.monotonic()
+        self._idle.put(worker)
+
+    def _discard(self, worker: _Worker):
+        self.replaced += 1
+        worker.kill()
+        with self._lock:
+            self._started -= 1
+
+    def _run_fallback(self, image: Image.Image) -> OcrResult:
+        if self.fallback is None:
+            raise OcrUnavailable(self._disabled_reason or "OCR worker pool unavailable")
+        self.fallbacks += 1
+        if self._fallback_engine is None:
+            self._fallback_engine = self.fallback()
+        return self._fallback_engine.recognize(image)
+
+    def recognize(self, image: Image.Image) -> OcrResult:
+        if image.mode not in ("1", "L", "RGB"):
+            image = image.convert("RGB")
+        message = ("ocr", image.mode, image.size)
+        payload = image.tobytes()
+
+        error = None
+        for _ in range(2):
+            worker = self._checkout()
+            if worker is None:
+                break
+            try:
+                status, result = worker.request(message, payload, self.timeout)
+            except Exception as e:
+                # Crashed or hung: replace the worker and retry once on a fresh one
+                print(f"⚠️ OCR worker {worker.process.pid} failed: {type(e).__name__}: {e}")
+                self._discard(worker)
+                continue
+            worker.jobs += 1
+            self.jobs += 1
+            self._checkin(worker)
+            if status == "ok":
+                return result
+            # The engine raised in the worker: retry once, then use the fallback engine
+            error = result
+            print(f"⚠️ OCR worker {worker.process.pid} could not recognize the image: {result}")
+        if error is not None and self.fallback is None:
+            raise RuntimeError(error)
+        return self._run_fallback(image)
+
+    def health(self) -> dict:
+        """Ping every idle worker, replacing dead ones"""
+        checked, unhealthy = 0, 0
+        idle = []
+        while True:
+            try:
+                idle.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        for worker in idle:
+            checked += 1
+            if worker.healthy():
+                self._checkin(worker)
+            else:
+                unhealthy += 1
+                self._discard(worker)
+        return {"checked": checked, "unhealthy": unhealthy}
+
+    def shutdown(self):
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            worker.stop()
+        with self._lock:
+            self._started = 0
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.size,
+            "started": self._started,
+            "idle": self._idle.qsize(),
+            "max_jobs_per_worker": self.max_jobs,
+            "jobs": self.jobs,
+            "fallbacks": self.fallbacks,
+            "recycled": self.recycled,
+            "replaced": self.replaced,
+            "disabled": self._disabled_reason,
+            "tesserocr_available": TESSEROCR_AVAILABLE,
+        }
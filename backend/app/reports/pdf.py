@@ -0,0 +1,286 @@
+import multiprocessing
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+try:
+    import pypdfium2 as pdfium
+    PDF_AVAILABLE = True
+except ImportError:
+    pdfium = None
+    PDF_AVAILABLE = False
+    print("⚠️ pypdfium2 not installed. PDF lab reports will not be processed. Install with: pip install pypdfium2")
+
+# A page whose text layer has fewer visible characters than this is treated as
+# a scanned page and sent to OCR
+MIN_TEXT_CHARS = 20
+
+# Page text sources
+TEXT_LAYER = "text_layer"
+OCR = "ocr"
+TIMEOUT = "timeout"
+ERROR = "error"
+
+
+@dataclass
+class PdfPage:
+    """Text of one PDF page and where it came from"""
+    index: int
+    text: str
+    source: str
+    seconds: float
+    error: Optional[str] = None
+
+
+def _require_pdfium():
+    if not PDF_AVAILABLE:
+        raise RuntimeError("PDF support requires pypdfium2 (pip install pypdfium2)")
+
+
+def page_count(path: str) -> int:
+    _require_pdfium()
+    pdf = pdfium.PdfDocument(path)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def text_layer(path: str, max_pages: int) -> list:
+    """Embedded text of the first ``max_pages`` pages ("" for scanned pages)"""
+    _require_pdfium()
+    pdf = pdfium.PdfDocument(path)
+    try:
+        texts = []
+        for index in range(min(len(pdf), max_pages)):
+            page = pdf[index]
+            textpage = page.get_textpage()
+            try:
+                text = textpage.get_text_range().replace("\r\n", "\n")
+            finally:
+                textpage.close()
+                page.close()
+            texts.append(text if len("".join(text.split())) >= MIN_TEXT_CHARS else "")
+        return texts
+    finally:
+        pdf.close()
+
+
+# --- Worker side -------------------------------------------------------------
+
+def _ocr_page(path: str, index: int, dpi: int, preprocess: bool, config: str, engine: str) -> str:
+    """Rasterize one page and OCR it (runs in a pool process)"""
+    from app.reports.ocr import process_engine
+    from app.reports.preprocess import preprocess_for_ocr
+
+    pdf = pdfium.PdfDocument(path)
+    try:
+        page = pdf[index]
+        try:
+            image = page.render(scale=dpi / 72, grayscale=True).to_pil()
+        finally:
+            page.close()
+    finally:
+        pdf.close()
+    if preprocess:
+        image = preprocess_for_ocr(image)
+    # The engine is loaded once per worker process and reused for later pages
+    return process_engine(engine, config).recognize(image).text
+
+
+# --- Parent side -------------------------------------------------------------
+
+# How often a document waiting for a free worker checks again while it has pages running
+SLOT_POLL_SECONDS = 0.1
+
+
+class _Slot:
+    """One OCR worker process (a single-process executor, so it can be replaced alone)"""
+
+    def __init__(self):
+        # spawn, not fork: the API process has live threads and DB clients
+        self.executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+
+    def kill(self):
+        for process in list((getattr(self.executor, "_processes", None) or {}).values()):
+            try:
+                process.terminate()
+            except Exception:
+                pass
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class PdfOcrPool:
+    """Worker processes that rasterize and OCR scanned PDF pages in parallel.
+
+    The ``workers`` processes are shared by all documents being processed
+    (the report queue runs several at once); each page takes a free worker,
+    so pages of different documents interleave. A page's timeout runs from
+    the moment its worker starts it. A page that times out, or whose worker
+    crashes, has only its own worker killed and replaced at once; pages of
+    other documents running on the other workers are not affected.
+    """
+
+    def __init__(self, workers: int = 2, page_timeout: float = 30.0, dpi: int = 200,
+                 preprocess: bool = True, tesseract_config: str = "", engine: str = "auto"):
+        self.workers = max(1, workers)
+        self.page_timeout = page_timeout
+        self.dpi = dpi
+        self.preprocess = preprocess
+        self.tesseract_config = tesseract_config
+        self.engine = engine
+        self._idle: Optional[queue.Queue] = None
+        self._slots = set()
+        self._closed = False
+        self._lock = threading.Lock()
+        self.pages_ocr = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.restarts = 0
+
+    def _acquire(self, block: bool) -> Optional[_Slot]:
+        """A free worker; None when ``block`` is false and all are busy"""
+        with self._lock:
+            if self._idle is None:
+                self._closed = False
+                self._idle = queue.Queue()
+                for _ in range(self.workers):
+                    slot = _Slot()
+                    self._slots.add(slot)
+                    self._idle.put(slot)
+            idle = self._idle
+        while True:
+            if self._closed:
+                raise RuntimeError("PDF OCR pool is shut down")
+            try:
+                return idle.get(block=block, timeout=1.0 if block else None)
+            except queue.Empty:
+                if not block:
+                    return None
+
+    def _release(self, slot: _Slot):
+        with self._lock:
+            if slot in self._slots and self._idle is not None:
+                self._idle.put(slot)
+
+    def _replace(self, slot: _Slot):
+        """Kill a hung or crashed worker and put a fresh one in its place"""
+        with self._lock:
+            if slot not in self._slots:
+                return
+            self._slots.discard(slot)
+            self.restarts += 1
+            replacement = None
+            if not self._closed:
+                replacement = _Slot()
+                self._slots.add(replacement)
+                self._idle.put(replacement)
+        slot.kill()
+
+    def restart(self):
+        """Replace every worker (pages still running fail)"""
+        with self._lock:
+            slots = list(self._slots)
+        for slot in slots:
+            self._replace(slot)
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            slots, self._slots = list(self._slots), set()
+            self._idle = None
+        for slot in slots:
+            slot.executor.shutdown(wait=True, cancel_futures=True)
+
+    def ocr_pages(self, path: str, indices: list) -> Iterator[PdfPage]:
+        """OCR the given pages, yielding each one as soon as it completes"""
+        remaining = deque(indices)
+        running = {}  # future -> (page index, worker, start time)
+        try:
+            while remaining or running:
+                # Start pages on free workers; wait for one only when nothing of ours is running
+                while remaining:
+                    slot = self._acquire(block=not running)
+                    if slot is None:
+                        break
+                    index = remaining.popleft()
+                    try:
+                        future = slot.executor.submit(_ocr_page, path, index, self.dpi, self.preprocess,
+                                                      self.tesseract_config, self.engine)
+                    except (BrokenProcessPool, RuntimeError):
+                        self._replace(slot)  # Died while idle: retry the page on another worker
+                        remaining.appendleft(index)
+                        continue
+                    running[future] = (index, slot, time.monotonic())
+
+                next_deadline = min(started for _, _, started in running.values()) + self.page_timeout
+                timeout = max(0.0, next_deadline - time.monotonic())
+                if remaining:
+                    timeout = min(timeout, SLOT_POLL_SECONDS)
+                done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+                now = time.monotonic()
+                for future in done:
+                    index, slot, started = running.pop(future)
+                    try:
+                        text = future.result()
+                    except BrokenProcessPool as e:
+                        self._replace(slot)
+                        self.errors += 1
+                        yield PdfPage(index, "", ERROR, now - started, f"OCR worker crashed: {e}")
+                        continue
+                    except Exception as e:
+                        self._release(slot)
+                        self.errors += 1
+                        yield PdfPage(index, "", ERROR, now - started, str(e))
+                        continue
+                    self._release(slot)
+                    self.pages_ocr += 1
+                    yield PdfPage(index, text.strip(), OCR, now - started)
+                for future in [f for f, (_, _, started) in running.items() if now - started >= self.page_timeout]:
+                    index, slot, started = running.pop(future)
+                    print(f"⚠️ PDF OCR page {index} timed out, replacing its worker")
+                    self._replace(slot)
+                    self.timeouts += 1
+                    yield PdfPage(index, "", TIMEOUT, now - started, f"Page OCR timed out after {self.page_timeout}s")
+        finally:
+            # Abandoned (caller stopped iterating, error): do not leave workers busy with our pages
+            for _, slot, _ in running.values():
+                self._replace(slot)
+
+    def stats(self) -> dict:
+        with self._lock:
+            idle = self._idle.qsize() if self._idle is not None else 0
+            return {
+                "available": PDF_AVAILABLE,
+                "workers": self.workers,
+                "running": bool(self._slots),
+                "busy": len(self._slots) - idle,
+                "page_timeout_seconds": self.page_timeout,
+                "pages_ocr": self.pages_ocr,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+                "restarts": self.restarts,
+            }
+
+
+def iter_pdf_pages(path: str, pool: PdfOcrPool, max_pages: int) -> Iterator[PdfPage]:
+    """Yield the text of each page in completion order.
+
+    Pages with an embedded text layer are yielded right away; the remaining
+    (scanned) pages are OCR'd in parallel by ``pool`` and yielded as each one
+    finishes, so callers can analyze early pages while later ones are still
+    being recognised. Only the first ``max_pages`` pages are read.
+    """
+    start = time.monotonic()
+    scanned = []
+    for index, text in enumerate(text_layer(path, max_pages)):
+        if text:
+            yield PdfPage(index, text.strip(), TEXT_LAYER, time.monotonic() - start)
+        else:
+            scanned.append(index)
+    yield from pool.ocr_pages(path, scanned)
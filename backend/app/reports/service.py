@@ -0,0 +1,475 @@
+import base64
+import json
+import os
+import time
+from datetime import datetime
+from typing import BinaryIO, Callable, Optional, Sequence
+
+from bson import ObjectId
+from PIL import Image
+
+from app.core.config import settings
+from app.core.database import db
+from app.core.job_queue import DONE, QUEUED
+from app.reports.analyzers import AnalysisPipeline
+from app.reports.observations import ObservationStore
+from app.reports.ocr import OcrResult, OcrUnavailable, OcrWorkerPool, TESSEROCR_AVAILABLE, create_engine
+from app.reports.pdf import PdfOcrPool, iter_pdf_pages, page_count as pdf_page_count
+from app.reports.preprocess import preprocess_for_ocr
+from app.reports.storage import ContentStore
+
+IMAGE_TYPES = ("jpg", "jpeg", "png")
+FILE_TYPES = IMAGE_TYPES + ("pdf", "txt")
+
+# Text stored by the old simplified upload route, which had no OCR
+LEGACY_PLACEHOLDER_TEXT = "Text extraction not available - OCR service disabled"
+
+# Fields returned by the report list; heavy fields (extracted_text, ocr_words,
+# pages) are only loaded by the detail endpoint
+LIST_FIELDS = ("report_name", "test_date", "lab_name", "doctor_name", "notes", "file_type",
+               "upload_date", "status", "analysis_results")
+
+# Fields a duplicate upload copies from the processed report with the same content
+REUSED_FIELDS = ("extracted_text", "lab_values", "analysis_results", "ai_analysis", "pages", "stages")
+
+
+def report_filter(report_id) -> dict:
+    """_id filter for a report id (ObjectId in MongoDB, plain string in the mock DB)"""
+    try:
+        return {"_id": ObjectId(report_id)}
+    except Exception:
+        return {"_id": report_id}
+
+
+# OCR Text Extraction
+# Long-lived workers keep the Tesseract engine loaded between reports; without
+# tesserocr every image falls back to one pytesseract subprocess per call
+ocr_pool = OcrWorkerPool(
+    workers=settings.OCR_WORKERS,
+    max_jobs=settings.OCR_MAX_JOBS_PER_WORKER,
+    timeout=settings.OCR_TIMEOUT_SECONDS,
+    health_interval=settings.OCR_HEALTH_INTERVAL_SECONDS,
+    factory_args=("tesserocr", "eng", settings.OCR_TESSERACT_CONFIG),
+    fallback=lambda: create_engine("pytesseract", "eng", settings.OCR_TESSERACT_CONFIG),
+)
+if settings.OCR_ENGINE == "pytesseract":
+    ocr_pool.disable("OCR_ENGINE is pytesseract")
+elif not TESSEROCR_AVAILABLE:
+    ocr_pool.disable("tesserocr not installed")
+
+pdf_ocr_pool = PdfOcrPool(
+    workers=settings.PDF_OCR_WORKERS,
+    page_timeout=settings.PDF_PAGE_TIMEOUT_SECONDS,
+    dpi=settings.PDF_RENDER_DPI,
+    preprocess=settings.OCR_PREPROCESS,
+    tesseract_config=settings.OCR_TESSERACT_CONFIG,
+    engine=settings.OCR_ENGINE,
+)
+
+
+def ocr_report_image(image_path) -> OcrResult:
+    """OCR an uploaded image; returns text and word boxes"""
+    try:
+        # Set tesseract path for Windows (if needed)
+        # pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+
+        # Open and process image
+        img = Image.open(image_path)
+        if settings.OCR_PREPROCESS:
+            img = preprocess_for_ocr(img)
+
+        # Extract text using OCR
+        result = ocr_pool.recognize(img)
+
+        if result.text.strip():
+            print(f"✅ OCR ({result.engine}) extracted {len(result.text)} characters from {image_path} in {result.seconds:.2f}s")
+            result.text = result.text.strip()
+            return result
+        else:
+            print(f"⚠️ OCR found no text in {image_path}")
+            return OcrResult("No text detected in the image. Please ensure the image is clear and contains readable text.",
+                             engine=result.engine)
+
+    except OcrUnavailable:
+        print("❌ No OCR engine installed. Install with: pip install pytesseract (or tesserocr)")
+        return OcrResult(generate_mock_lab_report_text(), engine="mock")
+    except FileNotFoundError:
+        print("❌ Tesseract OCR engine not found. Please install Tesseract OCR.")
+        return OcrResult(generate_mock_lab_report_text(), engine="mock")
+    except Exception as e:
+        print(f"❌ OCR Error: {e}")
+        print("🔄 Using mock analysis instead")
+        return OcrResult(generate_mock_lab_report_text(), engine="mock")
+
+
+def generate_mock_lab_report_text():
+    """Generate mock lab report text for demonstration"""
+    return """
+    LAB REPORT ANALYSIS
+
+    Blood Glucose: 95 mg/dL
+    Total Cholesterol: 180 mg/dL
+    Hemoglobin: 13.5 g/dL
+    Creatinine: 1.0 mg/dL
+
+    Note: This is a mock analysis as OCR service is not fully configured.
+    Please install Tesseract OCR for real text extraction.
+    """
+
+
+def encode_cursor(report) -> str:
+    """Opaque keyset cursor pointing just after this report in (upload_date, _id) order"""
+    raw = json.dumps([report.get("upload_date", ""), str(report["_id"])])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    """(upload_date, _id) of a cursor; raises ValueError when it is malformed"""
+    try:
+        upload_date, report_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return upload_date, report_filter(report_id)["_id"]
+
+
+class ReportService:
+    """Lab report ingestion, storage and analysis behind one DB handle.
+
+    Uploads go into the content-addressed store, text comes from the OCR
+    pools (images, scanned PDF pages) or the file itself (text layer, .txt)
+    and analysis runs through the analyzer pipeline, whose stages are stored
+    on each report so they can be re-run incrementally, one report at a
+    time from the queue or in bulk with reprocess().
+    """
+
+    def __init__(self, db_getter: Callable, store: ContentStore, pipeline: AnalysisPipeline):
+        self._db_getter = db_getter
+        self.store = store
+        self.pipeline = pipeline
+        self.observations = ObservationStore(lambda: self._db_getter().lab_observations)
+
+    @property
+    def collection(self):
+        return self._db_getter().lab_reports
+
+    def ensure_indexes(self):
+        create_index = getattr(self.collection, "create_index", None)  # Not available on the mock DB
+        if create_index is not None:
+            create_index([("content_hash", 1), ("user_id", 1)])
+            create_index([("user_id", 1), ("upload_date", -1), ("_id", -1)])
+        self.observations.ensure_indexes()
+
+    # Ingestion
+
+    def find_processed_duplicate(self, content_hash, user_id, exclude_id=None):
+        """A processed report of the same user with the same file content, if any.
+
+        Only the user's own reports are reused: another user's report id or
+        results must never show up in this user's report.
+        """
+        for candidate in self.collection.find({"content_hash": content_hash, "user_id": user_id, "status": DONE}):
+            if candidate["_id"] != exclude_id:
+                return candidate
+        return None
+
+    def reuse_results(self, source, report) -> dict:
+        """Fields copied from a processed report with identical content, skipping OCR"""
+        fields = {field: source[field] for field in REUSED_FIELDS if field in source}
+        fields.update({
+            "deduplicated": True,
+            "dedup_of": str(source["_id"]),
+            "ocr_seconds_saved": source.get("ocr_seconds", 0),
+        })
+        # Text is reused as is; stages whose inputs differ (e.g. the patient's
+        # sex/age for classification) are re-run by the pipeline
+        fields.update(self.pipeline.run([{**report, **fields}])[0])
+        return fields
+
+    def ingest(self, fileobj: BinaryIO, extension: str, metadata: dict, user_id) -> tuple:
+        """Store an upload and insert its report; returns (report, duplicate source or None).
+
+        A report whose content was already analyzed is inserted as processed;
+        otherwise it is inserted as queued and the caller enqueues it.
+        """
+        # Hashed while streaming to disk; identical content reuses the existing file
+        stored = self.store.save(fileobj, extension)
+        report = {
+            "user_id": user_id,
+            **metadata,
+            "file_path": stored.path,
+            "file_type": extension,
+            "content_hash": stored.sha256,
+            "file_size": stored.size,
+            "extracted_text": "",
+            "analysis_results": [],
+            "upload_date": datetime.utcnow().isoformat(),
+            "status": QUEUED,
+            "progress": {"stage": "queued", "percent": 0}
+        }
+        if stored.existed:
+            report.update({"deduplicated": True, "bytes_saved": stored.size})
+
+        # Same content already analyzed: reuse the OCR results instead of queueing
+        duplicate = self.find_processed_duplicate(stored.sha256, user_id)
+        if duplicate:
+            report.update(self.reuse_results(duplicate, report))
+            report.update({
+                "status": DONE,
+                "progress": {"stage": "done", "percent": 100},
+                "processed_date": datetime.utcnow().isoformat()
+            })
+            print(f"♻️ Duplicate upload of report {duplicate['_id']}, OCR skipped")
+
+        result = self.collection.insert_one(report)
+        report["_id"] = result.inserted_id
+        if duplicate:
+            self.observations.record_report(report, report["analysis_results"])
+        return report, duplicate
+
+    # Processing
+
+    def extract_pdf(self, report, progress) -> dict:
+        """Extract a PDF page by page; partial results are stored as pages complete"""
+        total_pages = pdf_page_count(report["file_path"])
+        limit = min(total_pages, settings.PDF_MAX_PAGES)
+        texts, analyses, pages = {}, {}, []
+
+        progress("pdf_text", 5, pages={"total": total_pages, "limit": limit, "done": 0})
+        for page in iter_pdf_pages(report["file_path"], pdf_ocr_pool, settings.PDF_MAX_PAGES):
+            texts[page.index] = page.text
+            if page.text:
+                # Only the fast stages run per page; the full pipeline runs on the whole text
+                page_report = {**report, "extracted_text": page.text, "stages": {}}
+                analyses[page.index] = self.pipeline.run([page_report], only=("regex", "rules"))[0].get(
+                    "analysis_results", [])
+            else:
+                analyses[page.index] = []
+            pages.append({"page": page.index + 1, "source": page.source,
+                          "seconds": round(page.seconds, 3), "error": page.error})
+            progress(
+                f"page_{page.source}", 5 + 90 * len(texts) // max(limit, 1),
+                analysis_results=[r for i in sorted(analyses) for r in analyses[i]],
+                pages={"total": total_pages, "limit": limit, "done": len(texts)},
+            )
+
+        if total_pages > limit:
+            print(f"⚠️ PDF {report['file_path']} has {total_pages} pages, only the first {limit} were processed")
+        return {
+            "extracted_text": "\n\f\n".join(texts[i] for i in sorted(texts)),
+            "pages": {"total": total_pages, "limit": limit, "done": len(texts),
+                      "detail": sorted(pages, key=lambda p: p["page"])},
+        }
+
+    def extract_text(self, report, progress=None) -> dict:
+        """Text (and OCR metadata) of the report's file"""
+        progress = progress or (lambda *args, **kwargs: None)
+        file_type = report.get("file_type")
+        started = time.perf_counter()
+        fields = {"extracted_text": ""}
+        if file_type in IMAGE_TYPES:
+            progress("ocr", 10)
+            ocr = ocr_report_image(report["file_path"])
+            fields.update({"extracted_text": ocr.text, "ocr_words": ocr.words, "ocr_engine": ocr.engine})
+        elif file_type == "pdf":
+            fields.update(self.extract_pdf(report, progress))
+        elif file_type == "txt":
+            with open(report["file_path"], encoding="utf-8", errors="replace") as f:
+                fields["extracted_text"] = f.read()
+        fields["ocr_seconds"] = round(time.perf_counter() - started, 3)
+        return fields
+
+    def analyze(self, report, only: Optional[Sequence[str]] = None, force: Sequence[str] = ()) -> dict:
+        """Run the stale analysis stages of one report; returns the changed fields"""
+        return self.pipeline.run([report], only=only, force=force)[0]
+
+    def process(self, report, progress) -> dict:
+        """Queue handler: OCR and analysis for a queued report; returns the fields to store"""
+        if report.get("content_hash"):
+            # An identical upload may have finished while this one was queued
+            duplicate = self.find_processed_duplicate(report["content_hash"], report.get("user_id"), report["_id"])
+            if duplicate:
+                print(f"♻️ Report {report['_id']} reuses OCR results of {duplicate['_id']}")
+                fields = self.reuse_results(duplicate, report)
+                self.observations.record_report(report, fields.get("analysis_results", []))
+                return {**fields, "processed_date": datetime.utcnow().isoformat()}
+
+        fields = self.extract_text(report, progress)
+        progress("analysis", 80)
+        fields.update(self.analyze({**report, **fields}))
+        analysis_results = fields.get("analysis_results", report.get("analysis_results", []))
+        self.observations.record_report(report, analysis_results)
+        fields["processed_date"] = datetime.utcnow().isoformat()
+        return fields
+
+    # Batch reprocessing
+
+    def adopt_legacy(self, report) -> dict:
+        """Fields that bring a report from the old upload routes to the current schema.
+
+        Reports created by the simplified routes kept their files under
+        uploads/lab_reports, had no upload_date/status and stored a placeholder
+        instead of extracted text. Their files are moved into the content store.
+        """
+        fields = {}
+        if not report.get("upload_date") and report.get("created_at"):
+            fields["upload_date"] = report["created_at"]
+        if "status" not in report:
+            fields["status"] = DONE
+        path = report.get("file_path")
+        if not report.get("file_type") and path:
+            fields["file_type"] = path.rsplit(".", 1)[-1].lower() if "." in path else "bin"
+        if not report.get("content_hash") and path and os.path.exists(path):
+            with open(path, "rb") as f:
+                stored = self.store.save(f, fields.get("file_type") or report.get("file_type"))
+            fields.update({"file_path": stored.path, "content_hash": stored.sha256, "file_size": stored.size})
+            if os.path.abspath(stored.path) != os.path.abspath(path) and \
+                    self.collection.count_documents({"file_path": path}) <= 1:
+                os.remove(path)
+        return fields
+
+    def needs_text(self, report) -> bool:
+        text = (report.get("extracted_text") or "").strip()
+        return (not text or text == LEGACY_PLACEHOLDER_TEXT) and report.get("file_type") in FILE_TYPES \
+            and os.path.exists(report.get("file_path") or "")
+
+    def reprocess(self, query: dict = None, only: Optional[Sequence[str]] = None, force: Sequence[str] = (),
+                  reextract: bool = False, batch_size: int = 200, dry_run: bool = False,
+                  log: Callable = None) -> dict:
+        """Re-run analysis stages over stored reports in batches.
+
+        Only stale stages run unless named in ``force``. Text is extracted again
+        for reports without usable text, or for all matched reports with
+        ``reextract``. Reports still queued or processing are left to the queue.
+        """
+        query = dict(query or {})
+        stats = {"reports": 0, "adopted": 0, "reextracted": 0, "updated": 0, "values": 0,
+                 "observations": 0, "stages": {name: 0 for name in self.pipeline.names}}
+        # Reports from before the queue have no status
+        reports = [r for r in self.collection.find(query) if r.get("status", DONE) == DONE]
+        for start in range(0, len(reports), max(1, batch_size)):
+            batch = reports[start:start + batch_size]
+            pending = []
+            for report in batch:
+                fields = {}
+                if not dry_run:
+                    fields.update(self.adopt_legacy(report))
+                    if fields:
+                        stats["adopted"] += 1
+                current = {**report, **fields}
+                if reextract or self.needs_text(current):
+                    if not dry_run:
+                        fields.update(self.extract_text(current))
+                    stats["reextracted"] += 1
+                pending.append(fields)
+
+            updates = self.pipeline.run([{**r, **f} for r, f in zip(batch, pending)], only=only, force=force)
+            for report, fields, update in zip(batch, pending, updates):
+                ran = [name for name, stage in update.get("stages", {}).items()
+                       if stage != (report.get("stages") or {}).get(name)]
+                for name in ran:
+                    stats["stages"][name] = stats["stages"].get(name, 0) + 1
+                fields.update(update)
+                merged = {**report, **fields}
+                stats["values"] += len(merged.get("analysis_results") or [])
+                if dry_run or not fields:
+                    continue
+                self.collection.update_one({"_id": report["_id"]}, {"$set": fields})
+                stats["updated"] += 1
+                if "analysis_results" in fields or "rules" in ran:
+                    # Also backfills the observation store for reports processed before it existed
+                    stats["observations"] += self.observations.record_report(merged, merged.get("analysis_results", []))
+            stats["reports"] += len(batch)
+            if log:
+                log(f"{stats['reports']}/{len(reports)} reports, {stats['updated']} updated")
+        return stats
+
+    # Queries
+
+    def get(self, report_id):
+        return self.collection.find_one(report_filter(report_id))
+
+    def delete(self, report_id) -> bool:
+        report = self.collection.find_one(report_filter(report_id))
+        if not report:
+            return False
+
+        # Delete file unless another (deduplicated) report still uses it
+        path = report.get("file_path")
+        shared = path and self.collection.count_documents({"file_path": path}) > 1
+        if path and not shared and os.path.exists(path):
+            os.remove(path)
+
+        self.collection.delete_one(report_filter(report_id))
+        self.observations.delete_report(report["_id"])
+        return True
+
+    def list_page(self, user_id, limit: int, cursor: Optional[str], fields) -> tuple:
+        """One page of a user's reports, newest first; returns (summaries, next cursor)"""
+        query = {"user_id": user_id}
+        if cursor:
+            upload_date, last_id = decode_cursor(cursor)
+            query["$or"] = [
+                {"upload_date": {"$lt": upload_date}},
+                {"upload_date": upload_date, "_id": {"$lt": last_id}},
+            ]
+        projection = {field: 1 for field in (*fields, "upload_date")}
+        docs = self.collection.find(query, projection)
+        if isinstance(docs, list):
+            # The mock DB returns a plain list
+            docs = sorted(docs, key=lambda d: (d.get("upload_date", ""), str(d["_id"])), reverse=True)[:limit + 1]
+        else:
+            docs = list(docs.sort([("upload_date", -1), ("_id", -1)]).limit(limit + 1))
+
+        next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+        summaries = []
+        for report in docs[:limit]:
+            summary = {"id": str(report["_id"])}
+            for field in fields:
+                summary[field] = report.get(field, [] if field == "analysis_results" else "")
+            if "status" in summary and not summary["status"]:
+                summary["status"] = DONE
+            summaries.append(summary)
+        return summaries, next_cursor
+
+    def dedup_stats(self) -> dict:
+        duplicates = list(self.collection.find({"deduplicated": True}))
+        return {
+            "duplicate_uploads": len(duplicates),
+            "bytes_saved": sum(r.get("bytes_saved", 0) for r in duplicates),
+            "ocr_runs_skipped": sum(1 for r in duplicates if r.get("dedup_of")),
+            "ocr_seconds_saved": round(sum(r.get("ocr_seconds_saved", 0) for r in duplicates), 3),
+        }
+
+    def analytics(self, user_id) -> dict:
+        reports = list(self.collection.find({"user_id": user_id}, {"analysis_results": 1}))
+        critical_alerts = 0
+        normal_results = 0
+        for report in reports:
+            for analysis in report.get("analysis_results", []):
+                if analysis.get("status") == "critical":
+                    critical_alerts += 1
+                elif analysis.get("status") == "normal":
+                    normal_results += 1
+
+        # Health score is the percentage of normal results
+        total_tests = critical_alerts + normal_results
+        health_score = round((normal_results / total_tests * 100) if total_tests > 0 else 0)
+
+        analytics = {
+            analyte: self.observations.trend(user_id, analyte, max_points=50)["points"]
+            for analyte in ("blood_sugar", "cholesterol", "hemoglobin")
+        }
+        analytics.update({
+            "total_reports": len(reports),
+            "critical_alerts": critical_alerts,
+            "normal_results": normal_results,
+            "health_score": health_score
+        })
+        return analytics
+
+
+report_service = ReportService(
+    lambda: db,
+    ContentStore(settings.LAB_REPORT_STORAGE_DIR),
+    AnalysisPipeline.from_names(settings.LAB_REPORT_ANALYZERS.split(",")),
+)
@@ -0,0 +1,58 @@
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import BinaryIO
+
+CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class StoredFile:
+    sha256: str
+    path: str
+    size: int
+    existed: bool  # True when identical content was already stored
+
+
+class ContentStore:
+    """Content-addressed file store for uploaded reports.
+
+    Files are named after the SHA-256 of their content, which is computed
+    while the upload is streamed to a temporary file in the same directory.
+    If a file with that hash already exists the temporary copy is dropped,
+    so identical uploads share one file on disk.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path_for(self, sha256: str, extension: str) -> str:
+        return os.path.join(self.root, f"{sha256}.{extension}")
+
+    def save(self, fileobj: BinaryIO, extension: str) -> StoredFile:
+        os.makedirs(self.root, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                while True:
+                    chunk = fileobj.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+
+            sha256 = digest.hexdigest()
+            path = self.path_for(sha256, extension)
+            if os.path.exists(path):
+                os.remove(tmp_path)
+                return StoredFile(sha256, path, size, existed=True)
+            os.replace(tmp_path, path)
+            return StoredFile(sha256, path, size, existed=False)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
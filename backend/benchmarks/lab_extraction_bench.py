@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark for lab value extraction on large multi-page OCR text.
+
+Compares the single-pass extractor (app/reports/extractor.py) with the
+previous per-line loop that ran a dozen separate re.search calls per line.
+
+    python benchmarks/lab_extraction_bench.py [--pages 50] [--lines-per-page 80]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.reports.extractor import extract_lab_values
+
+# The scanning part of smart_analysis before the extractor, kept as the baseline
+LEGACY_PATTERNS = {
+    'blood_sugar': [
+        r'glucose.*?(\d+\.?\d*)\s*(mg/dl|mmol/l)',
+        r'sugar.*?(\d+\.?\d*)\s*(mg/dl|mmol/l)',
+        r'fbs.*?(\d+\.?\d*)\s*(mg/dl|mmol/l)',
+        r'rbs.*?(\d+\.?\d*)\s*(mg/dl|mmol/l)'
+    ],
+    'cholesterol': [
+        r'cholesterol.*?(\d+\.?\d*)\s*(mg/dl)',
+        r'total cholesterol.*?(\d+\.?\d*)\s*(mg/dl)'
+    ],
+    'hemoglobin': [
+        r'hemoglobin.*?(\d+\.?\d*)\s*(g/dl|gm/dl)',
+        r'hb.*?(\d+\.?\d*)\s*(g/dl|gm/dl)'
+    ],
+    'creatinine': [
+        r'creatinine.*?(\d+\.?\d*)\s*(mg/dl)',
+        r'serum creatinine.*?(\d+\.?\d*)\s*(mg/dl)'
+    ]
+}
+
+
+def legacy_extract(text):
+    found = []
+    for line_no, line in enumerate(text.split('\n')):
+        line = line.lower().strip()
+        for analyte, patterns in LEGACY_PATTERNS.items():
+            for pattern in patterns:
+                match = re.search(pattern, line, re.IGNORECASE)
+                if match:
+                    found.append((line_no, analyte, match.group(1), match.group(2)))
+    return found
+
+
+ANALYTE_LINES = [
+    "Blood Sugar (Fasting)      {v:.0f} mg/dL      70-100 mg/dL     NORMAL",
+    "FBS {v:.0f} mg/dl",
+    "Glucose, Random: {v:.1f} mmol/L",
+    "Total Cholesterol          {v:.0f} mg/dL      <200 mg/dL       HIGH",
+    "Hemoglobin (Hb)            {v:.1f} g/dL       13.5-17.5 g/dL   NORMAL",
+    "Serum Creatinine           {v:.2f} mg/dL      0.6-1.2 mg/dL",
+]
+
+NOISE_LINES = [
+    "MEDIFY+ DIAGNOSTIC CENTER - 123 Health Street, Medical City Phone: +91-9876543210",
+    "Patient Name: John Doe   Age: 35 Years   Gender: Male   Report Date: 17-Aug-2025",
+    "White Blood Cells          7,500 /uL          4,000-11,000 /uL     NORMAL",
+    "Platelets                  250,000 /uL        150,000-450,000 /uL  NORMAL",
+    "Doctor's Remarks: Patient shows elevated levels. Recommend dietary modifications and regular exercise.",
+    "Method: Enzymatic colorimetric (GOD-POD), sample type serum, collected 08:30, processed 10:15 in lab 4",
+    "This is an electronically generated report and does not require a signature. Page {page} of {pages}",
+    "",
+]
+
+
+def synthetic_report(pages, lines_per_page, analyte_ratio, seed):
+    rng = random.Random(seed)
+    lines = []
+    for page in range(1, pages + 1):
+        for _ in range(lines_per_page):
+            if rng.random() < analyte_ratio:
+                lines.append(rng.choice(ANALYTE_LINES).format(v=rng.uniform(0.5, 300)))
+            else:
+                lines.append(rng.choice(NOISE_LINES).format(page=page, pages=pages))
+        lines.append("\f")
+    return "\n".join(lines)
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lab value extraction benchmark")
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--lines-per-page", type=int, default=80)
+    parser.add_argument("--analyte-ratio", type=float, default=0.15)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    text = synthetic_report(args.pages, args.lines_per_page, args.analyte_ratio, args.seed)
+    legacy_time, legacy = best_of(lambda: legacy_extract(text), args.repeat)
+    new_time, new = best_of(lambda: extract_lab_values(text), args.repeat)
+
+    # The old loop reports an analyte once per matching pattern; compare distinct hits
+    legacy_hits = {(line, analyte, value) for line, analyte, value, _ in legacy}
+    new_hits = {(v.line, v.analyte, v.value) for v in new}
+
+    print(json.dumps({
+        "text_chars": len(text),
+        "text_lines": text.count("\n") + 1,
+        "legacy": {"ms": round(legacy_time * 1000, 3), "matches": len(legacy), "distinct": len(legacy_hits)},
+        "extractor": {"ms": round(new_time * 1000, 3), "matches": len(new)},
+        "speedup": round(legacy_time / new_time, 2) if new_time else None,
+        "missed_vs_legacy": len(legacy_hits - new_hits),
+        "extra_vs_legacy": len(new_hits - legacy_hits),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
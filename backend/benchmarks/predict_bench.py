@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the disease prediction subsystem (app/api/predict.py).
+
+Runs offline against the bundled .pkl models and measures:
+  - in-process single-row latency (sklearn path and compiled NumPy fast path)
+  - vectorized batch throughput
+  - end-to-end HTTP throughput through the ASGI app at several concurrencies
+  - worker memory (RSS) before and after loading the models
+
+Results are written as JSON so runs from different commits can be compared:
+
+    python benchmarks/predict_bench.py --output bench_before.json
+    python benchmarks/predict_bench.py --output bench_after.json --compare bench_before.json
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import warnings
+from datetime import datetime
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+# Metrics where a smaller number is better; everything else is a throughput
+LOWER_IS_BETTER = ("_ms", "_mb")
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process in MB"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is the peak, in KB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def synthetic_heart(rng, n):
+    """HeartInput payloads drawn from plausible clinical ranges"""
+    return [{
+        "age": int(rng.integers(29, 78)),
+        "sex": int(rng.integers(0, 2)),
+        "chest_pain_type": int(rng.integers(0, 4)),
+        "resting_bp": int(rng.integers(94, 200)),
+        "cholesterol": int(rng.integers(126, 564)),
+        "fasting_blood_sugar": int(rng.integers(0, 2)),
+        "rest_ecg": int(rng.integers(0, 3)),
+        "max_heart_rate": int(rng.integers(71, 202)),
+        "exercise_angina": int(rng.integers(0, 2)),
+        "oldpeak": round(float(rng.uniform(0, 6.2)), 1),
+        "slope": int(rng.integers(0, 3)),
+        "major_vessels": int(rng.integers(0, 4)),
+        "thal": int(rng.integers(0, 4)),
+    } for _ in range(n)]
+
+
+def synthetic_diabetes(rng, n):
+    """DiabetesInput payloads drawn from plausible clinical ranges"""
+    return [{
+        "Pregnancies": int(rng.integers(0, 17)),
+        "Glucose": int(rng.integers(44, 199)),
+        "BloodPressure": int(rng.integers(24, 122)),
+        "SkinThickness": int(rng.integers(0, 99)),
+        "Insulin": int(rng.integers(0, 846)),
+        "BMI": round(float(rng.uniform(18, 67)), 1),
+        "DiabetesPedigreeFunction": round(float(rng.uniform(0.08, 2.42)), 3),
+        "Age": int(rng.integers(21, 81)),
+    } for _ in range(n)]
+
+
+WORKLOADS = {"heart": synthetic_heart, "diabetes": synthetic_diabetes}
+
+
+def summarize(samples_ms):
+    samples = sorted(samples_ms)
+    return {
+        "p50_ms": round(statistics.median(samples), 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+        "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 4),
+        "mean_ms": round(statistics.fmean(samples), 4),
+    }
+
+
+def bench_single_row(disease, payloads, model, scaler, scorer):
+    from app.ml_models.inference import INPUT_SCHEMAS, feature_vector, predict_features
+
+    rows = [feature_vector(disease, INPUT_SCHEMAS[disease](**p)) for p in payloads]
+    results = {}
+    paths = {"sklearn": None, "fast_path": scorer} if scorer is not None else {"sklearn": None}
+    for name, path_scorer in paths.items():
+        predict_features(disease, model, scaler, rows[0], path_scorer)  # warm-up
+        samples = []
+        for row in rows:
+            start = time.perf_counter()
+            predict_features(disease, model, scaler, row, path_scorer)
+            samples.append((time.perf_counter() - start) * 1000)
+        results[name] = summarize(samples)
+    return results
+
+
+def bench_batch(disease, payloads, model, scaler, scorer, batch_sizes):
+    from app.ml_models.inference import INPUT_SCHEMAS, feature_vector
+
+    X_all = np.array([feature_vector(disease, INPUT_SCHEMAS[disease](**p)) for p in payloads], dtype=np.float64)
+    results = {}
+    for size in batch_sizes:
+        X = X_all[:size] if size <= len(X_all) else np.resize(X_all, (size, X_all.shape[1]))
+        entry = {}
+
+        def sklearn_batch():
+            Xs = scaler.transform(X)
+            model.predict(Xs)
+            if hasattr(model, "predict_proba"):
+                model.predict_proba(Xs)
+            else:
+                model.decision_function(Xs)
+
+        candidates = {"sklearn": sklearn_batch}
+        if scorer is not None:
+            candidates["fast_path"] = lambda: scorer.score_batch(X)
+        for name, fn in candidates.items():
+            fn()
+            repeats = max(3, min(50, 20000 // size))
+            start = time.perf_counter()
+            for _ in range(repeats):
+                fn()
+            elapsed = (time.perf_counter() - start) / repeats
+            entry[name] = {"rows_per_s": round(size / elapsed, 1), "batch_ms": round(elapsed * 1000, 4)}
+        results[str(size)] = entry
+    return results
+
+
+async def bench_http(app, disease, payloads, concurrency, requests_total):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(payload):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(f"/api/predict/{disease}", json=payload)
+                latencies.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    errors += 1
+
+        await one(payloads[0])  # warm-up
+        latencies.clear()
+        start = time.perf_counter()
+        await asyncio.gather(*(one(payloads[i % len(payloads)]) for i in range(requests_total)))
+        elapsed = time.perf_counter() - start
+
+    return {"requests_per_s": round(requests_total / elapsed, 1), "errors": errors, **summarize(latencies)}
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def flatten(data, prefix=""):
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    old, new = flatten(baseline["results"]), flatten(current["results"])
+    print(f"\nComparison against {baseline_path} ({baseline.get('git_revision')} -> {current.get('git_revision')})")
+    for name in sorted(set(old) & set(new)):
+        if not old[name]:
+            continue
+        change = (new[name] - old[name]) / old[name] * 100
+        better = change < 0 if name.endswith(LOWER_IS_BETTER) else change > 0
+        marker = "" if abs(change) < 5 else ("  better" if better else "  WORSE")
+        print(f"  {name:60s} {old[name]:>12} -> {new[name]:>12} ({change:+.1f}%){marker}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prediction subsystem benchmarks")
+    parser.add_argument("--rows", type=int, default=500, help="single-row latency samples per disease")
+    parser.add_argument("--batch-sizes", default="1,32,256,4096")
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--http-requests", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--compare", help="baseline JSON file from an earlier run")
+    parser.add_argument("--verbose", action="store_true", help="keep the app's per-request logging")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    rng = np.random.default_rng(args.seed)
+    results = {"memory": {"rss_start_mb": round(rss_mb(), 1)}}
+
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with quiet:
+        from fastapi import FastAPI
+        from app.api import predict
+
+    results["memory"]["rss_after_model_load_mb"] = round(rss_mb(), 1)
+    app = FastAPI()
+    app.include_router(predict.router, prefix="/api/predict")
+
+    for disease, generator in WORKLOADS.items():
+        loaded = predict.registry.get(disease)
+        if loaded is None:
+            results[disease] = {"error": "model not available"}
+            continue
+        model, scaler, scorer, _ = loaded
+        payloads = generator(rng, args.rows)
+        section = {
+            "single_row": bench_single_row(disease, payloads, model, scaler, scorer),
+            "batch": bench_batch(disease, payloads, model, scaler, scorer,
+                                 [int(s) for s in args.batch_sizes.split(",")]),
+            "http": {},
+        }
+
+        for concurrency in [int(c) for c in args.concurrency.split(",")]:
+            for mode in ("cold", "cached"):
+                if mode == "cold":
+                    # Unique payloads and an empty cache measure the full inference path
+                    predict.prediction_cache.invalidate()
+                    http_payloads = generator(rng, args.http_requests)
+                else:
+                    http_payloads = payloads[:16]
+                quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+                with quiet:
+                    stats = asyncio.run(bench_http(app, disease, http_payloads, concurrency, args.http_requests))
+                section["http"][f"c{concurrency}_{mode}"] = stats
+        results[disease] = section
+
+    results["memory"]["rss_end_mb"] = round(rss_mb(), 1)
+    results["prediction_cache"] = predict.prediction_cache.stats()
+
+    import sklearn
+    report = {
+        "git_revision": git_revision(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "sklearn": sklearn.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "prediction_backend": predict.settings.PREDICTION_BACKEND,
+            "fast_path": predict.settings.PREDICTION_FAST_PATH,
+        },
+        "results": results,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+        print(f"Results written to {args.output}")
+    else:
+        print(output)
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
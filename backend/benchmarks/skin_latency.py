@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+CPU latency benchmark for the skin disease pipeline.
+
+Measures in-memory decode/resize against the old save-to-disk path and, when
+an ONNX model is available, end-to-end inference for several batch sizes.
+
+    python benchmarks/skin_latency.py [--model path/to/skindisease.onnx] [--repeat 20]
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.ml_models.skin_classifier import SkinClassifier, SkinModelUnavailable
+
+
+def synthetic_photo(width=3024, height=4032, seed=0) -> bytes:
+    """JPEG roughly the size of a 12 MP phone photo"""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 255, size=(height // 16, width // 16, 3), dtype=np.uint8)
+    img = Image.fromarray(small).resize((width, height), Image.BILINEAR)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+    }
+
+
+def decode_via_tempfile(data: bytes):
+    # What the TensorFlow version did: write the upload, then load it back
+    with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as f:
+        f.write(data)
+        path = f.name
+    try:
+        img = Image.open(path).convert("RGB").resize((224, 224))
+        return np.asarray(img, dtype=np.float32) / 255.0
+    finally:
+        os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default=None, help="ONNX model (defaults to app/ml_models/skindisease.onnx)")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=1)
+    args = parser.parse_args()
+
+    classifier = SkinClassifier(model_path=args.model, threads=args.threads)
+    photo = synthetic_photo()
+    report = {
+        "image_bytes": len(photo),
+        "preprocess_in_memory": timed(lambda: classifier.preprocess(photo), args.repeat),
+        "preprocess_tempfile": timed(lambda: decode_via_tempfile(photo), args.repeat),
+    }
+
+    try:
+        start = time.perf_counter()
+        classifier.predict(photo)
+        report["cold_start_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        for batch_size in (1, 4, 16):
+            batch = [photo] * batch_size
+            stats = timed(lambda: classifier.predict_batch(batch), args.repeat)
+            stats["per_image_ms"] = round(stats["mean_ms"] / batch_size, 3)
+            report[f"inference_batch_{batch_size}"] = stats
+    except SkinModelUnavailable as e:
+        report["inference"] = f"skipped: {e}"
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Re-run lab report analysis over stored reports.
+
+Only stages whose analyzer version or inputs changed run, so after editing
+the analyte catalog a plain run re-classifies exactly the affected reports.
+Reports from the old upload routes are moved into the content store and,
+when they have no extracted text, OCR'd again.
+
+    python reprocess_reports.py                      # stale stages of every processed report
+    python reprocess_reports.py --stages rules --force
+    python reprocess_reports.py --user temp_user_id --since 2024-01-01 --reextract
+    python reprocess_reports.py --dry-run
+"""
+import argparse
+import json
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch reprocessing of lab reports")
+    parser.add_argument("--stages", help="comma separated analyzers to run (default: all enabled)")
+    parser.add_argument("--force", action="store_true", help="re-run the stages even if they are up to date")
+    parser.add_argument("--reextract", action="store_true", help="extract the text (OCR) of every report again")
+    parser.add_argument("--user", help="only reports of this user id")
+    parser.add_argument("--since", help="only reports uploaded on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--dry-run", action="store_true", help="count what would change without writing")
+    args = parser.parse_args()
+
+    from app.reports.service import ocr_pool, pdf_ocr_pool, report_service
+
+    only = [name.strip() for name in args.stages.split(",")] if args.stages else None
+    unknown = [name for name in only or [] if name not in report_service.pipeline.names]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)} (enabled: {', '.join(report_service.pipeline.names)})")
+
+    query = {}
+    if args.user:
+        query["user_id"] = args.user
+    if args.since:
+        query["upload_date"] = {"$gte": args.since}
+
+    print(f"🔁 Reprocessing lab reports with stages: {', '.join(only or report_service.pipeline.names)}")
+    try:
+        stats = report_service.reprocess(
+            query,
+            only=only,
+            force=(only or report_service.pipeline.names) if args.force else (),
+            reextract=args.reextract,
+            batch_size=args.batch_size,
+            dry_run=args.dry_run,
+            log=lambda message: print(f"   - {message}"),
+        )
+    finally:
+        pdf_ocr_pool.shutdown()
+        ocr_pool.shutdown()
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
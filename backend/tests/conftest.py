@@ -0,0 +1,32 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Test settings must be in place before app.core.config is imported
+os.environ.setdefault("MONGODB_URL", "mongodb://127.0.0.1:1")  # unreachable: the mock DB is used
+os.environ.setdefault("MONGODB_DB", "test")
+os.environ.setdefault("CHAT_MEMORY_PERSIST", "false")
+os.environ.setdefault("CHAT_CACHE_ENABLED", "false")
+os.environ.setdefault("TTS_BACKEND", "thread")
+os.environ.setdefault("LLM_PROVIDER", "stub")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The mock DB reads and writes mock_db.json (and audio goes to responses/) in
+# the working directory: run in a scratch directory so the checked-in data
+# is never touched
+os.chdir(tempfile.mkdtemp(prefix="medify-tests-"))
+
+
+@pytest.fixture
+def mock_db():
+    """The app's database handle (the mock DB here), with the collections tests write to emptied"""
+    from app.core.database import db
+    from app.core.mock_db import get_mock_db
+
+    data = get_mock_db().data
+    for name in ("chats", "lab_reports", "test_jobs"):
+        data[name] = []
+    return db
@@ -0,0 +1,77 @@
+import os
+import time
+
+from app.llm.audio_cache import AudioCache
+
+
+def write(cache: AudioCache, text: str, size: int = 100) -> str:
+    key = AudioCache.key(text, "en", 150)
+    with open(cache.path(key), "wb") as f:
+        f.write(b"\0" * size)
+    cache.add(key)
+    return key
+
+
+def test_key_depends_on_text_voice_and_rate():
+    assert AudioCache.key("hello", "en", 150) == AudioCache.key("hello", "en", 150)
+    assert len({AudioCache.key("hello", "en", 150), AudioCache.key("hello", "en", 180),
+                AudioCache.key("hello", "fr", 150), AudioCache.key("hello!", "en", 150)}) == 4
+
+
+def test_hit_and_miss(tmp_path):
+    cache = AudioCache(str(tmp_path), url_prefix="/responses")
+    key = write(cache, "hello")
+    assert cache.get(key) == f"/responses/tts_{key}.mp3"
+    assert cache.get(AudioCache.key("other", "en", 150)) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"], stats["cache_bytes"]) == (1, 1, 1, 100)
+
+
+def test_least_recently_used_file_is_evicted(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=250)
+    first = write(cache, "first")
+    second = write(cache, "second")
+    assert cache.get(first) is not None  # first is now the most recently used
+    third = write(cache, "third")
+
+    assert not os.path.exists(cache.path(second))
+    assert cache.get(second) is None
+    assert cache.get(first) is not None and cache.get(third) is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["cache_bytes"] == 200
+
+
+def test_lru_order_survives_a_restart(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=250)
+    old = write(cache, "old")
+    new = write(cache, "new")
+    past = time.time() - 100
+    os.utime(cache.path(old), (past, past))
+
+    restarted = AudioCache(str(tmp_path), max_bytes=250)
+    write(restarted, "newest")
+    assert not os.path.exists(restarted.path(old))
+    assert restarted.get(new) is not None
+
+
+def test_deleted_file_is_a_miss(tmp_path):
+    cache = AudioCache(str(tmp_path))
+    key = write(cache, "hello")
+    os.remove(cache.path(key))
+    assert cache.get(key) is None
+    assert cache.stats()["cache_bytes"] == 0
+
+
+def test_cleanup_removes_old_unreferenced_files(tmp_path):
+    cache = AudioCache(str(tmp_path), url_prefix="/responses")
+    key = write(cache, "cached")
+    past = time.time() - 7200
+    for name in ("response_old.mp3", "response_in_use.mp3", "response_fresh.mp3"):
+        (tmp_path / name).write_bytes(b"x")
+    for name in ("response_old.mp3", "response_in_use.mp3"):
+        os.utime(tmp_path / name, (past, past))
+    os.utime(cache.path(key), (past, past))
+
+    removed = cache.cleanup(lambda urls: {url for url in urls if "in_use" in url}, grace_seconds=3600)
+    assert removed == 1
+    assert sorted(os.listdir(tmp_path)) == sorted(["response_in_use.mp3", "response_fresh.mp3", f"tts_{key}.mp3"])
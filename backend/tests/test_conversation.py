@@ -0,0 +1,84 @@
+from app.llm import conversation as conversation_module
+from app.llm.conversation import ConversationStore
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ring_buffer_keeps_the_last_turns():
+    store = ConversationStore(max_turns=3)
+    for i in range(5):
+        store.append("s1", f"question {i}", f"answer {i}")
+    assert store.turns("s1") == [("question 2", "answer 2"), ("question 3", "answer 3"), ("question 4", "answer 4")]
+    assert store.turns("s2") == []
+    assert store.turns("") == []
+
+
+def test_long_texts_are_clipped():
+    store = ConversationStore(max_turn_chars=10)
+    store.append("s1", "x" * 50, "short")
+    assert store.turns("s1") == [("x" * 10 + "…", "short")]
+
+
+def test_idle_sessions_expire(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(conversation_module.time, "monotonic", clock)
+    store = ConversationStore(ttl_seconds=60)
+    store.append("old", "q", "a")
+    clock.now += 40
+    store.append("recent", "q", "a")
+    clock.now += 30  # "old" idle for 70s, "recent" for 30s
+
+    assert store.stats()["sessions"] == 1
+    assert store.turns("old") == []
+    assert store.turns("recent") == [("q", "a")]
+    assert store.evictions == 1
+
+
+def test_reading_a_session_keeps_it_alive(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(conversation_module.time, "monotonic", clock)
+    store = ConversationStore(ttl_seconds=60)
+    store.append("s1", "q", "a")
+    for _ in range(3):
+        clock.now += 50
+        assert store.turns("s1") == [("q", "a")]
+
+
+def test_least_recently_used_session_is_evicted_at_capacity():
+    store = ConversationStore(max_sessions=2)
+    store.append("a", "q", "a")
+    store.append("b", "q", "b")
+    store.turns("a")
+    store.append("c", "q", "c")
+    assert store.stats()["sessions"] == 2
+    assert store.turns("b") == []
+    assert store.turns("a") == [("q", "a")]
+
+
+def test_evicted_session_is_rebuilt_by_the_loader():
+    stored = {"s1": [(f"q{i}", f"a{i}") for i in range(6)]}
+    calls = []
+
+    def loader(session_id, limit):
+        calls.append((session_id, limit))
+        return stored.get(session_id, [])
+
+    store = ConversationStore(max_turns=4, loader=loader)
+    assert store.turns("s1") == [("q2", "a2"), ("q3", "a3"), ("q4", "a4"), ("q5", "a5")]
+    assert store.turns("s1")[-1] == ("q5", "a5")
+    assert calls == [("s1", 4)]  # loaded once, then served from memory
+    assert store.stats()["loads"] == 1
+
+
+def test_loader_failure_gives_an_empty_history():
+    def loader(session_id, limit):
+        raise ConnectionError("database down")
+
+    store = ConversationStore(loader=loader)
+    assert store.turns("s1") == []
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException, Response
+
+from app.api import chat
+from app.reports.service import ReportService
+
+START = datetime(2024, 5, 1, 9, 0, 0)
+
+
+@pytest.fixture
+def chats(mock_db, monkeypatch):
+    monkeypatch.setattr(chat, "db", mock_db)
+    # Pairs of messages share a timestamp, so paging must fall back to _id order
+    for i in range(10):
+        mock_db.chats.insert_one({"_id": f"m{i:02d}", "sender": "patient1", "session_id": "s1",
+                                  "message": f"message {i}", "created_at": START + timedelta(minutes=i // 2)})
+    mock_db.chats.insert_one({"_id": "other", "sender": "patient2", "session_id": "s2",
+                              "message": "someone else", "created_at": START})
+    return mock_db
+
+
+def history(**params):
+    response = Response()
+    messages = chat.get_chat_messages(response, sender=params.pop("sender", "patient1"), **params)
+    return [m["_id"] for m in messages], response.headers
+
+
+def test_history_pages_back_without_gaps_or_repeats(chats):
+    seen, before = [], None
+    while True:
+        ids, headers = history(limit=3, before=before)
+        seen += ids
+        before = headers.get("x-next-cursor")
+        if before is None:
+            break
+    assert seen == [f"m{i:02d}" for i in range(9, -1, -1)]
+
+
+def test_since_returns_newer_messages_oldest_first(chats):
+    ids, headers = history(limit=4)
+    assert ids == ["m09", "m08", "m07", "m06"]
+    since = headers["x-since-cursor"]
+
+    assert history(since=since)[0] == []
+    chats.chats.insert_one({"_id": "m10", "sender": "patient1", "session_id": "s1", "message": "new",
+                            "created_at": START + timedelta(minutes=4)})  # same time as m08/m09
+    ids, headers = history(since=since)
+    assert ids == ["m10"]
+    assert history(since=headers["x-since-cursor"])[0] == []
+
+
+def test_before_and_since_combine(chats):
+    _, headers = history(limit=2)  # m09, m08
+    newest = headers["x-since-cursor"]
+    oldest = chat.encode_chat_cursor(chats.chats.find_one({"_id": "m03"}))
+    ids, _ = history(before=newest, since=oldest)
+    assert ids == ["m04", "m05", "m06", "m07", "m08"]
+
+
+def test_plain_timestamp_is_accepted_as_since(chats):
+    ids, _ = history(since=(START + timedelta(minutes=3)).isoformat())
+    assert ids == ["m08", "m09"]
+
+
+def test_invalid_cursor_is_rejected(chats):
+    with pytest.raises(HTTPException) as error:
+        history(before="not a cursor")
+    assert error.value.status_code == 400
+
+
+def test_report_pages(mock_db):
+    service = ReportService(lambda: mock_db, store=None, pipeline=None)
+    for i in range(7):
+        mock_db.lab_reports.insert_one({"_id": f"r{i}", "user_id": "u1", "filename": f"report{i}.pdf",
+                                        "upload_date": f"2024-05-0{1 + i // 2}T10:00:00"})
+    mock_db.lab_reports.insert_one({"_id": "x", "user_id": "u2", "filename": "other.pdf",
+                                    "upload_date": "2024-05-09T10:00:00"})
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = service.list_page("u1", 3, cursor, ("filename",))
+        seen += [report["id"] for report in page]
+        if cursor is None:
+            break
+    assert seen == ["r6", "r5", "r4", "r3", "r2", "r1", "r0"]
+
+    with pytest.raises(ValueError):
+        service.list_page("u1", 3, "garbage", ("filename",))
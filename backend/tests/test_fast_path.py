@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
+from sklearn.svm import SVC
+from sklearn.tree import DecisionTreeClassifier
+
+from app.ml_models.fast_path import compile_scorer, verification_corpus, verify_scorer
+from app.ml_models.inference import predict_features
+from app.ml_models.registry import ModelRegistry
+
+
+def training_data(n_rows=300, n_features=8, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(50, 15, size=(n_rows, n_features))
+    y = (X[:, 0] + 0.5 * X[:, 1] - X[:, 2] + rng.normal(0, 10, n_rows) > 25).astype(int)
+    return X, y
+
+
+ESTIMATORS = [
+    LogisticRegression(max_iter=1000),
+    SVC(kernel="linear"),
+    SVC(kernel="rbf", gamma="scale"),
+    DecisionTreeClassifier(max_depth=6, random_state=0),
+    RandomForestClassifier(n_estimators=20, max_depth=6, random_state=0),
+    ExtraTreesClassifier(n_estimators=20, random_state=0),
+]
+
+
+@pytest.mark.parametrize("model", ESTIMATORS, ids=lambda m: f"{type(m).__name__}-{getattr(m, 'kernel', '')}")
+def test_compiled_scorer_matches_sklearn(model):
+    X, y = training_data()
+    scaler = StandardScaler().fit(X)
+    model.fit(scaler.transform(X), y)
+
+    scorer = compile_scorer(model, scaler)
+    assert scorer is not None
+    assert verify_scorer(scorer, model, scaler)
+
+    # Single rows give the same response as the sklearn code path
+    for row in verification_corpus(scaler, n_rows=20, seed=1).tolist():
+        fast = predict_features("diabetes", model, scaler, row, scorer)
+        slow = predict_features("diabetes", model, scaler, row)
+        assert fast["prediction"] == slow["prediction"]
+        for key, value in slow["probability"].items():
+            assert fast["probability"][key] == pytest.approx(value, rel=1e-9, abs=1e-12)
+
+
+def test_unsupported_models_stay_on_sklearn():
+    X, y = training_data()
+    scaler = StandardScaler().fit(X)
+    assert compile_scorer(SVC(kernel="poly").fit(scaler.transform(X), y), scaler) is None
+    assert compile_scorer(SVC(probability=True).fit(scaler.transform(X), y), scaler) is None
+
+    other_scaler = MinMaxScaler().fit(X)
+    assert compile_scorer(LogisticRegression().fit(other_scaler.transform(X), y), other_scaler) is None
+
+    three_classes = np.arange(len(y)) % 3
+    assert compile_scorer(LogisticRegression(max_iter=1000).fit(scaler.transform(X), three_classes), scaler) is None
+
+
+def test_wrong_feature_count_is_rejected():
+    X, y = training_data()
+    scaler = StandardScaler().fit(X)
+    scorer = compile_scorer(LogisticRegression().fit(scaler.transform(X), y), scaler)
+    with pytest.raises(ValueError):
+        scorer.score_row([1.0, 2.0])
+    with pytest.raises(ValueError):
+        scorer.score_batch(np.zeros((3, 5)))
+
+
+def test_bundled_models_get_a_verified_fast_path():
+    registry = ModelRegistry().load()
+    assert set(registry.models) == {"heart", "diabetes"}
+    for disease in registry.models:
+        model, scaler, scorer, _ = registry.get(disease)
+        assert scorer is not None, f"{disease} model has no fast path"
+        assert verify_scorer(scorer, model, scaler, verification_corpus(scaler, seed=7))
@@ -0,0 +1,118 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.llm.gateway import LlmDeadlineExceeded, LlmError, LlmGateway, LlmOverloaded
+from app.llm.providers import OpenAICompatibleProvider, StubProvider
+
+MESSAGES = [{"role": "user", "content": "I have a headache"}]
+COMPLETION = {"model": "test-model", "choices": [{"message": {"content": "Drink water."}}],
+              "usage": {"total_tokens": 12}}
+
+
+@pytest.fixture
+def http_gateway():
+    """Gateway to an OpenAI-compatible server answered by ``replies`` (one response per request)"""
+    replies, requests = [], []
+
+    def handler(request):
+        requests.append(request)
+        return replies.pop(0) if replies else httpx.Response(200, json=COMPLETION)
+
+    gateway = LlmGateway(OpenAICompatibleProvider("test", "http://llm.test"), max_retries=2,
+                         backoff_base=0.01, backoff_cap=0.05, deadline=5.0)
+    loop = gateway._ensure_started()
+
+    async def use_mock_transport():
+        await gateway._client.aclose()
+        gateway._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    asyncio.run_coroutine_threadsafe(use_mock_transport(), loop).result()
+    yield gateway, replies, requests
+    gateway.close()
+
+
+def test_transient_errors_are_retried(http_gateway):
+    gateway, replies, requests = http_gateway
+    replies += [httpx.Response(503), httpx.Response(429, headers={"Retry-After": "0"})]
+
+    completion = gateway.complete_sync(MESSAGES)
+    assert (completion.text, completion.model, completion.attempts) == ("Drink water.", "test-model", 3)
+    assert len(requests) == 3
+    assert gateway.counters["retries"] == 2
+    assert gateway.counters["completed"] == 1
+
+
+def test_retries_are_bounded(http_gateway):
+    gateway, replies, requests = http_gateway
+    replies += [httpx.Response(502)] * 5
+
+    with pytest.raises(LlmError, match="after 3 attempts"):
+        gateway.complete_sync(MESSAGES)
+    assert len(requests) == 3
+    assert gateway.counters["failed"] == 1
+
+
+def test_client_errors_are_not_retried(http_gateway):
+    gateway, replies, requests = http_gateway
+    replies.append(httpx.Response(400, text="bad request"))
+
+    with pytest.raises(LlmError, match="HTTP 400"):
+        gateway.complete_sync(MESSAGES)
+    assert len(requests) == 1
+
+
+def test_malformed_completion_is_an_error(http_gateway):
+    gateway, replies, _ = http_gateway
+    replies.append(httpx.Response(200, json={"choices": []}))
+
+    with pytest.raises(LlmError, match="malformed"):
+        gateway.complete_sync(MESSAGES)
+
+
+def test_backoff_honours_retry_after():
+    gateway = LlmGateway(StubProvider(), backoff_base=0.5, backoff_cap=8.0)
+    assert gateway._backoff(0, "3") == 3.0
+    assert gateway._backoff(0, "120") == 8.0
+    assert all(0 <= gateway._backoff(attempt, None) <= min(8.0, 0.5 * 2 ** attempt) for attempt in range(6))
+
+
+def test_calls_beyond_the_queue_are_shed():
+    gateway = LlmGateway(StubProvider(first_token_ms=300, token_ms=0, tokens=3), max_in_flight=1, max_queue=1)
+
+    async def burst():
+        return await asyncio.gather(*(gateway.complete(MESSAGES) for _ in range(3)), return_exceptions=True)
+
+    try:
+        results = asyncio.run(burst())
+    finally:
+        gateway.close()
+    shed = [r for r in results if isinstance(r, LlmOverloaded)]
+    assert len(shed) == 1
+    assert sum(1 for r in results if not isinstance(r, Exception)) == 2
+    assert gateway.counters["shed"] == 1
+    assert gateway.in_flight == 0 and gateway.waiting == 0
+
+
+def test_check_capacity():
+    gateway = LlmGateway(StubProvider(), max_in_flight=2, max_queue=1)
+    gateway.check_capacity()
+    gateway.in_flight, gateway.waiting = 2, 1
+    with pytest.raises(LlmOverloaded):
+        gateway.check_capacity()
+
+
+def test_waiting_for_a_slot_counts_against_the_deadline():
+    gateway = LlmGateway(StubProvider(first_token_ms=500, token_ms=0, tokens=1), max_in_flight=1, max_queue=4)
+
+    async def two_calls():
+        return await asyncio.gather(gateway.complete(MESSAGES, deadline=2.0), gateway.complete(MESSAGES, deadline=0.2),
+                                    return_exceptions=True)
+
+    try:
+        first, second = asyncio.run(two_calls())
+    finally:
+        gateway.close()
+    assert first.text == "You"
+    assert isinstance(second, LlmDeadlineExceeded)
@@ -0,0 +1,150 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.job_queue import DONE, FAILED, PROCESSING, QUEUED, JobQueue
+
+
+def make_queue(db, handler, **kwargs):
+    return JobQueue("test", lambda: db.test_jobs, handler, **kwargs)
+
+
+def add_job(db, job_id, **fields):
+    db.test_jobs.insert_one({"_id": job_id, "status": QUEUED, **fields})
+
+
+def job(db, job_id):
+    return db.test_jobs.find_one({"_id": job_id})
+
+
+def ago(seconds):
+    return (datetime.utcnow() - timedelta(seconds=seconds)).isoformat()
+
+
+def test_workers_run_queued_jobs(mock_db):
+    def handler(doc, progress):
+        progress("parsing", 50, partial=[1])
+        return {"result": doc["_id"].upper()}
+
+    async def run():
+        queue = make_queue(mock_db, handler, concurrency=2)
+        add_job(mock_db, "a")  # persisted before start: recovered
+        await queue.start()
+        add_job(mock_db, "b")
+        queue.enqueue("b")
+        for _ in range(200):
+            if queue.completed == 2:
+                break
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return queue
+
+    queue = asyncio.run(run())
+    assert queue.completed == 2
+    for job_id in ("a", "b"):
+        doc = job(mock_db, job_id)
+        assert doc["status"] == DONE
+        assert doc["result"] == job_id.upper()
+        assert doc["partial"] == [1]
+        assert doc["progress"] == {"stage": "done", "percent": 100}
+        assert doc["attempts"] == 1
+
+
+def test_claim_holds_a_lease(mock_db):
+    queue = make_queue(mock_db, lambda doc, progress: {})
+    add_job(mock_db, "a")
+    doc = queue._claim("a")
+    assert doc["status"] == PROCESSING
+    assert doc["worker"] == queue.worker_id
+    assert doc["heartbeat_at"]
+    assert queue._claim("a") is None  # already running
+
+
+def test_expired_leases_are_reclaimed(mock_db):
+    queue = make_queue(mock_db, lambda doc, progress: {}, lease_seconds=60)
+    add_job(mock_db, "dead", status=PROCESSING, worker="gone:1", heartbeat_at=ago(120))
+    add_job(mock_db, "alive", status=PROCESSING, worker="other:2", heartbeat_at=ago(5))
+    add_job(mock_db, "mine", status=PROCESSING, worker=queue.worker_id, heartbeat_at=ago(120))
+    queue._active.add("mine")
+
+    assert queue._reclaim_expired() == ["dead"]
+    assert job(mock_db, "dead")["status"] == QUEUED
+    assert job(mock_db, "dead")["worker"] is None
+    assert job(mock_db, "alive")["status"] == PROCESSING
+    assert job(mock_db, "mine")["status"] == PROCESSING
+    assert queue.stats()["reclaimed"] == 1
+
+    # Recovery on start picks the reclaimed job up with the queued ones
+    add_job(mock_db, "waiting")
+    assert sorted(queue._recover()) == ["dead", "waiting"]
+
+
+def test_renewed_lease_is_not_reclaimed(mock_db):
+    queue = make_queue(mock_db, lambda doc, progress: {}, lease_seconds=60)
+    add_job(mock_db, "a")
+    queue._claim("a")
+    queue._active.add("a")
+    mock_db.test_jobs.update_one({"_id": "a"}, {"$set": {"heartbeat_at": ago(120)}})
+    queue._renew_leases()
+    queue._active.clear()
+    assert queue._reclaim_expired() == []
+
+
+def test_failed_job_is_retried_then_succeeds(mock_db):
+    calls = []
+
+    def handler(doc, progress):
+        calls.append(doc["_id"])
+        if len(calls) == 1:
+            raise RuntimeError("OCR engine busy")
+        return {"result": "ok"}
+
+    queue = make_queue(mock_db, handler, max_attempts=3)
+    add_job(mock_db, "a")
+
+    assert queue._run("a") == 2.0  # backoff before the second attempt
+    doc = job(mock_db, "a")
+    assert doc["status"] == QUEUED
+    assert doc["error"] == "OCR engine busy"
+    assert doc["attempts"] == 1
+
+    assert queue._run("a") is None
+    doc = job(mock_db, "a")
+    assert doc["status"] == DONE
+    assert doc["error"] is None
+    assert doc["attempts"] == 2
+    assert queue.stats()["retried"] == 1
+
+
+def test_job_fails_after_max_attempts(mock_db):
+    def handler(doc, progress):
+        raise RuntimeError("unreadable file")
+
+    queue = make_queue(mock_db, handler, max_attempts=2)
+    add_job(mock_db, "a")
+    assert queue._run("a") is not None
+    assert queue._run("a") is None
+    doc = job(mock_db, "a")
+    assert doc["status"] == FAILED
+    assert doc["error"] == "unreadable file"
+    assert queue.failed == 1
+
+
+def test_job_that_keeps_crashing_the_process_is_given_up(mock_db):
+    queue = make_queue(mock_db, lambda doc, progress: pytest.fail("must not run again"), max_attempts=3)
+    add_job(mock_db, "a", attempts=3)  # three earlier claims never finished
+    assert queue._run("a") is None
+    doc = job(mock_db, "a")
+    assert doc["status"] == FAILED
+    assert "Gave up" in doc["error"]
+
+
+def test_result_is_discarded_when_the_lease_was_lost(mock_db):
+    queue = make_queue(mock_db, lambda doc, progress: {})
+    add_job(mock_db, "a")
+    queue._claim("a")
+    # Reclaimed and claimed by another process meanwhile
+    mock_db.test_jobs.update_one({"_id": "a"}, {"$set": {"worker": "other:2"}})
+    queue._finish("a", {"status": DONE})
+    assert job(mock_db, "a")["status"] == PROCESSING
@@ -0,0 +1,81 @@
+import pytest
+
+from app.reports.analytes import AnalyteCatalog, catalog
+from app.reports.extractor import extract_lab_values
+
+REPORT = """CITY DIAGNOSTICS
+Patient: Jane Doe   Age: 34   Sex: F
+Fasting Blood Sugar (FBS): 95 mg/dL
+Total Cholesterol 180 mg/dl   Haemoglobin 13.5 g/dL
+Serum Creatinine: 88 umol/L
+Blood pressure: systolic 128 mmHg, diastolic 84 mmHg
+Glucose repeat: 102 mg/dL
+"""
+
+
+def test_extracts_values_units_and_lines():
+    values = [(v.analyte, v.value, v.unit, v.line) for v in extract_lab_values(REPORT)]
+    assert values == [
+        ("blood_sugar", "95", "mg/dl", 2),
+        ("cholesterol", "180", "mg/dl", 3),
+        ("hemoglobin", "13.5", "g/dl", 3),
+        ("creatinine", "88", "umol/l", 4),
+        ("systolic_bp", "128", "mmhg", 5),
+        ("diastolic_bp", "84", "mmhg", 5),
+        ("blood_sugar", "102", "mg/dl", 6),
+    ]
+
+
+def test_one_value_per_analyte_and_line():
+    # "sugar" and "fbs" both name blood sugar: the line yields one value
+    values = extract_lab_values("Blood sugar (FBS) 110 mg/dl")
+    assert [(v.analyte, v.value) for v in values] == [("blood_sugar", "110")]
+
+
+def test_keyword_without_value_is_skipped():
+    assert extract_lab_values("Glucose: pending\nCholesterol - see note") == []
+
+
+@pytest.mark.parametrize("value, status", [
+    (69.9, "low"), (70, "normal"), (100, "normal"), (100.01, "high"), (125, "high"), (125.5, "critical"),
+])
+def test_band_boundaries(value, status):
+    assert catalog.classify("blood_sugar", value, "mg/dl").status == status
+
+
+def test_units_are_converted_to_the_canonical_unit():
+    result = catalog.classify("blood_sugar", "5.5", "mmol/L")
+    assert result.status == "normal"
+    assert result.value == pytest.approx(99.0)
+    assert result.canonical_unit == "mg/dl"
+    assert catalog.classify("creatinine", 88.4, "umol/l").value == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize("sex, age, status, reference", [
+    (None, None, "normal", "12-15 g/dL"),
+    ("M", 40, "low", "13.5-17.5 g/dL"),
+    ("female", 40, "normal", "12-15.5 g/dL"),
+    ("male", 8, "normal", "11.5-15.5 g/dL (children)"),
+    ("male", None, "low", "13.5-17.5 g/dL"),  # unknown age counts as adult
+])
+def test_sex_and_age_specific_rules(sex, age, status, reference):
+    result = catalog.classify("hemoglobin", 13, "g/dl", sex=sex, age=age)
+    assert (result.status, result.reference_range) == (status, reference)
+
+
+def test_unusable_values_are_unknown():
+    assert catalog.classify("blood_sugar", "n/a", "mg/dl").status == "unknown"
+    assert catalog.classify("blood_sugar", 95, "furlongs").status == "unknown"
+    assert catalog.classify("vitamin_q", 1, None).status == "unknown"
+
+
+def test_classify_many_matches_single_classification():
+    analytes = ["blood_sugar", "hemoglobin", "hemoglobin", "creatinine", "systolic_bp", "blood_sugar"]
+    values = [130, "11", 16, 1.3, 95, None]
+    units = ["mg/dl", "g/dl", "g/dl", "mg/dl", "mmhg", "mg/dl"]
+    sex = [None, "f", "m", "male", None, None]
+    age = [50, 30, "45", 60, None, None]
+    many = AnalyteCatalog().classify_many(analytes, values, units, sex, age)
+    single = [catalog.classify(*args) for args in zip(analytes, values, units, sex, age)]
+    assert many == single
+    assert [c.status for c in many] == ["critical", "low", "normal", "normal", "normal", "unknown"]
@@ -0,0 +1,75 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.ml_models.prediction_cache import PredictionCache
+
+HEART_INPUT = {
+    "age": 63, "sex": 1, "chest_pain_type": 3, "resting_bp": 145, "cholesterol": 233,
+    "fasting_blood_sugar": 1, "rest_ecg": 0, "max_heart_rate": 150, "exercise_angina": 0,
+    "oldpeak": 2.3, "slope": 0, "major_vessels": 0, "thal": 1,
+}
+
+
+def test_equal_feature_values_share_a_key():
+    assert PredictionCache.make_key("heart", "v1", [63, "1", -0.0]) == PredictionCache.make_key("heart", "v1", [63.0, 1, 0.0])
+    assert PredictionCache.make_key("heart", "v1", [63]) != PredictionCache.make_key("heart", "v2", [63])
+
+
+def test_lru_eviction_and_copies():
+    cache = PredictionCache(max_entries=2)
+    a, b, c = (PredictionCache.make_key("heart", "v1", [i]) for i in range(3))
+    cache.put(a, {"prediction": "A"})
+    cache.put(b, {"prediction": "B"})
+    assert cache.get(a) == {"prediction": "A"}  # a is now the most recently used
+    cache.put(c, {"prediction": "C"})
+
+    assert cache.get(b) is None
+    assert cache.get(a) is not None and cache.get(c) is not None
+    assert cache.stats()["evictions"] == 1
+
+    cache.get(a)["prediction"] = "changed by a caller"
+    assert cache.get(a) == {"prediction": "A"}
+
+
+def test_byte_limit():
+    cache = PredictionCache(max_entries=100, max_bytes=1000)
+    for i in range(50):
+        cache.put(PredictionCache.make_key("heart", "v1", [i] * 13), {"prediction": "x" * 50})
+    stats = cache.stats()
+    assert 0 < stats["entries"] < 50
+    assert stats["bytes"] <= 1000
+
+
+@pytest.fixture
+def predict_client():
+    from app.api import predict
+    from app.api.admin import get_admin_user
+
+    app = FastAPI()
+    app.include_router(predict.router, prefix="/api/predict")
+    app.dependency_overrides[get_admin_user] = lambda: {"role": "admin"}
+    predict.prediction_cache.invalidate()
+    return TestClient(app), predict.prediction_cache
+
+
+def test_models_reload_invalidates_cached_predictions(predict_client):
+    client, cache = predict_client
+
+    first = client.post("/api/predict/heart", json=HEART_INPUT)
+    assert first.status_code == 200
+    assert client.post("/api/predict/heart", json=HEART_INPUT).json() == first.json()
+    stats = cache.stats()
+    assert stats["entries"] == 1 and stats["hits"] == 1
+    invalidations = stats["invalidations"]
+
+    response = client.post("/api/predict/models/reload")
+    assert response.status_code == 200
+    assert "heart" in response.json()["model_versions"]
+    stats = cache.stats()
+    assert stats["entries"] == 0
+    assert stats["invalidations"] == invalidations + 1
+
+    hits = stats["hits"]
+    assert client.post("/api/predict/heart", json=HEART_INPUT).json() == first.json()
+    assert cache.stats()["hits"] == hits  # recomputed, not served from the flushed cache
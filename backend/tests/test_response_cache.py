@@ -0,0 +1,69 @@
+from app.llm import response_cache as response_cache_module
+from app.llm.response_cache import ResponseCache, normalize
+
+QUESTION = "What should I do about a bad headache that started this morning?"
+
+
+def filled_cache(**kwargs) -> ResponseCache:
+    cache = ResponseCache(**kwargs)
+    cache.put(QUESTION, "Rest and drink water.")
+    cache.put("How do I lower my blood pressure?", "Less salt, more exercise.")
+    cache.put("I have a cough and a fever since yesterday", "See a doctor if it lasts.")
+    return cache
+
+
+def test_normalize():
+    assert normalize("  I have a HEADACHE!!") == "i have a headache"
+    assert normalize(None) == ""
+
+
+def test_exact_tier_ignores_case_and_punctuation():
+    cache = filled_cache()
+    assert cache.get("what should i do about a bad headache, that started this morning") == ("Rest and drink water.", "exact")
+    assert cache.stats()["exact_hits"] == 1
+
+
+def test_similar_tier_reuses_a_close_question():
+    cache = filled_cache()
+    assert cache.get(QUESTION + " please") == ("Rest and drink water.", "similar")
+    assert cache.stats()["similar_hits"] == 1
+
+
+def test_different_questions_miss():
+    cache = filled_cache()
+    assert cache.get("I have a cough and no fever since yesterday") == (None, None)
+    assert cache.get("What is the best diet for diabetes?") == (None, None)
+    assert cache.stats()["misses"] == 2
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache_module.time, "time", lambda: now[0])
+    cache = filled_cache(ttl_seconds=60)
+    now[0] += 61
+    assert cache.get(QUESTION) == (None, None)
+    assert cache.get(QUESTION + " please") == (None, None)
+    assert cache.stats()["expired"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(max_entries=2)
+    cache.put("first question about sleep", "A")
+    cache.put("second question about diet", "B")
+    assert cache.get("first question about sleep")[0] == "A"
+    cache.put("third question about exercise", "C")
+    assert cache.get("second question about diet") == (None, None)
+    assert cache.get("first question about sleep")[0] == "A"
+    assert cache.stats()["evictions"] == 1
+
+    # Slots of evicted entries are reused without leaking into the similarity index
+    for i in range(10):
+        cache.put(f"question number {i} about vitamins", str(i))
+    assert cache.stats()["entries"] == 2
+    assert cache.get("question number 9 about vitamins") == ("9", "exact")
+
+
+def test_disabled_cache_stores_nothing():
+    cache = filled_cache(enabled=False)
+    assert cache.get(QUESTION) == (None, None)
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,156 @@
+import base64
+import io
+import json
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+
+onnx = pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+from onnx import TensorProto, helper  # noqa: E402
+
+from app.ml_models.skin_classifier import DEFAULT_CLASSES, SkinClassifier, SkinModelUnavailable  # noqa: E402
+
+SIZE = 32
+# Class 0 follows the red channel, 1 green, 2 blue; 3 and 4 stay below them
+WEIGHTS = np.array([[4, 0, 0, 1, 0],
+                    [0, 4, 0, 0, 1],
+                    [0, 0, 4, 1, 1]], dtype=np.float32)
+
+
+def build_model(path, channels_first=False, softmax=True, classes=5):
+    """Tiny stand-in for the exported Keras model: mean colour -> linear layer (-> softmax)"""
+    shape = ["N", 3, SIZE, SIZE] if channels_first else ["N", SIZE, SIZE, 3]
+    nodes = [
+        helper.make_node("ReduceMean", ["image"], ["mean"], axes=[2, 3] if channels_first else [1, 2], keepdims=0),
+        helper.make_node("MatMul", ["mean", "weights"], ["scores"]),
+        helper.make_node("Add", ["scores", "bias"], ["logits"]),
+    ]
+    if softmax:
+        nodes.append(helper.make_node("Softmax", ["logits"], ["output"], axis=-1))
+    graph = helper.make_graph(
+        nodes, "skin",
+        [helper.make_tensor_value_info("image", TensorProto.FLOAT, shape)],
+        [helper.make_tensor_value_info("output" if softmax else "logits", TensorProto.FLOAT, ["N", classes])],
+        initializer=[
+            helper.make_tensor("weights", TensorProto.FLOAT, [3, classes], WEIGHTS[:, :classes].flatten()),
+            helper.make_tensor("bias", TensorProto.FLOAT, [classes], np.zeros(classes, dtype=np.float32)),
+        ],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.checker.check_model(model)
+    onnx.save(model, str(path))
+    return str(path)
+
+
+def image_bytes(color, size=(80, 60), fmt="PNG") -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+RED, GREEN, BLUE = image_bytes((230, 20, 20)), image_bytes((20, 230, 20)), image_bytes((20, 20, 230), fmt="JPEG")
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    return build_model(tmp_path / "skindisease.onnx")
+
+
+def test_preprocess_reads_the_model_input_size(model_path):
+    classifier = SkinClassifier(model_path)
+    classifier._load()
+    array = classifier.preprocess(image_bytes((255, 0, 128), size=(300, 200), fmt="JPEG"))
+    assert array.shape == (SIZE, SIZE, 3)
+    assert array.dtype == np.float32
+    assert 0.0 <= array.min() and array.max() <= 1.0
+    assert array[..., 0].mean() == pytest.approx(1.0, abs=0.02)
+    assert array[..., 1].mean() == pytest.approx(0.0, abs=0.02)
+
+
+@pytest.mark.parametrize("channels_first", [False, True], ids=["nhwc", "nchw"])
+def test_predicts_the_expected_class(tmp_path, channels_first):
+    classifier = SkinClassifier(build_model(tmp_path / "skin.onnx", channels_first=channels_first))
+    result = classifier.predict(RED)
+    assert result["prediction"] == DEFAULT_CLASSES[0]
+    assert list(result["all_probabilities"]) == DEFAULT_CLASSES
+    assert sum(result["all_probabilities"].values()) == pytest.approx(1.0)
+    assert result["confidence"] == max(result["all_probabilities"].values())
+    assert classifier.status()["loaded"]
+
+
+def test_batches_are_chunked_and_match_single_predictions(model_path):
+    classifier = SkinClassifier(model_path, max_batch=2)
+    session = classifier._load()
+    batch_sizes = []
+
+    class CountingSession:
+        def run(self, outputs, feed):
+            batch_sizes.append(len(next(iter(feed.values()))))
+            return session.run(outputs, feed)
+
+    classifier._session = CountingSession()
+    images = [RED, GREEN, BLUE, GREEN, RED]
+    results = classifier.predict_batch(images)
+
+    assert batch_sizes == [2, 2, 1]
+    assert [r["prediction"] for r in results] == [DEFAULT_CLASSES[i] for i in (0, 1, 2, 1, 0)]
+    for data, result in zip(images, results):
+        single = classifier.predict(data)
+        assert single["prediction"] == result["prediction"]
+        assert single["confidence"] == pytest.approx(result["confidence"], rel=1e-5)
+
+
+def test_format_applies_softmax_to_raw_scores(tmp_path):
+    classifier = SkinClassifier(build_model(tmp_path / "skin.onnx", softmax=False))
+    result = classifier.predict(GREEN)
+    assert result["prediction"] == DEFAULT_CLASSES[1]
+    assert sum(result["all_probabilities"].values()) == pytest.approx(1.0)
+
+    formatted = SkinClassifier()._format(np.array([2.0, -1.0, 0.0, 0.5, 1.0]))
+    expected = np.exp([2.0, -1.0, 0.0, 0.5, 1.0]) / np.exp([2.0, -1.0, 0.0, 0.5, 1.0]).sum()
+    assert formatted["confidence"] == pytest.approx(expected.max())
+    # Already normalized output is kept as is
+    assert SkinClassifier()._format(np.array([0.1, 0.6, 0.1, 0.1, 0.1]))["confidence"] == pytest.approx(0.6)
+
+
+def test_labels_file_and_class_count_mismatch(tmp_path):
+    path = build_model(tmp_path / "skin.onnx", classes=3)
+    assert SkinClassifier(path).predict(BLUE)["prediction"] == "class_2"
+
+    (tmp_path / "skin_labels.json").write_text(json.dumps(["red", "green", "blue"]))
+    result = SkinClassifier(path).predict(BLUE)
+    assert result["prediction"] == "blue"
+    assert list(result["all_probabilities"]) == ["red", "green", "blue"]
+
+
+def test_missing_model_is_reported(tmp_path):
+    classifier = SkinClassifier(str(tmp_path / "missing.onnx"))
+    with pytest.raises(SkinModelUnavailable):
+        classifier.predict(RED)
+    assert "not found" in classifier.status()["error"]
+
+
+def test_skin_endpoints(model_path, monkeypatch):
+    from app.api import predict
+
+    app = FastAPI()
+    app.include_router(predict.router, prefix="/api/predict")
+    client = TestClient(app)
+
+    monkeypatch.setattr(predict, "skin_classifier", SkinClassifier(model_path + ".absent"))
+    assert client.post("/api/predict/skin/upload", files={"file": ("red.png", RED)}).status_code == 503
+
+    monkeypatch.setattr(predict, "skin_classifier", SkinClassifier(model_path, max_batch=2))
+    response = client.post("/api/predict/skin", json={"image": "data:image/png;base64," + base64.b64encode(RED).decode()})
+    assert response.status_code == 200
+    assert response.json()["result"]["prediction"] == DEFAULT_CLASSES[0]
+
+    files = [("files", (f"{i}.png", data)) for i, data in enumerate([RED, GREEN, BLUE])]
+    response = client.post("/api/predict/skin/batch", files=files)
+    assert response.status_code == 200
+    assert [r["result"]["prediction"] for r in response.json()["results"]] == DEFAULT_CLASSES[:3]
@@ -12,6 +12,16 @@ import { motion, AnimatePresence } from 'framer-motion';
 
 const API_URL = import.meta.env.VITE_BACKEND_URL_DEV;
 
+// One conversation per browser tab; the server keeps its recent turns as context
+const getChatSessionId = () => {
+  let id = sessionStorage.getItem('chatSessionId');
+  if (!id) {
+    id = crypto.randomUUID ? crypto.randomUUID() : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+    sessionStorage.setItem('chatSessionId', id);
+  }
+  return id;
+};
+
 const Chatbot = () => {
   const [inputMessage, setInputMessage] = useState('');
   const [messages, setMessages] = useState([]);
@@ -170,6 +180,7 @@ const Chatbot = () => {
 
     const formData = new FormData();
     formData.append('sender', 'user');
+    formData.append('session_id', getChatSessionId());
     formData.append('timestamp', new Date().toISOString());
     if (inputMessage.trim()) formData.append('text', inputMessage.trim());
     if (selectedFile) formData.append('file', selectedFile);
@@ -186,7 +197,8 @@ const Chatbot = () => {
     setIsLoading(true);
 
     try {
-      const response = await fetch(`${API_URL}/api/chat`, {
+      // Reply arrives as server-sent events: start, token..., done (stored message)
+      const response = await fetch(`${API_URL}/api/chat/stream`, {
         method: 'POST',
         body: formData,
       });
@@ -197,24 +209,66 @@ const Chatbot = () => {
         throw new Error('Chat error');
       }
 
-      const raw = await response.json();
-
-      const botMessage = {
-        sender: 'bot',
-        text: raw.response_text,
-        timestamp: raw.created_at,
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let replyText = '';
+      let started = false;
+
+      // The bot message is added with the first token (or on done/error when no token came)
+      const showBotMessage = (fields) => {
+        if (!started) {
+          started = true;
+          setIsLoading(false);
+          setMessages((prev) => [...prev, { sender: 'bot', text: replyText, timestamp: new Date(), ...fields }]);
+          return;
+        }
+        setMessages((prev) => {
+          const next = [...prev];
+          next[next.length - 1] = { ...next[next.length - 1], ...fields };
+          return next;
+        });
       };
 
-      if (raw.response_audio) {
-        botMessage.audio = {
-          url: raw.response_audio.startsWith('/')
-            ? `${API_URL}${raw.response_audio}`
-            : raw.response_audio,
-          duration: 10,
-        };
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const frames = buffer.split('\n\n');
+        buffer = frames.pop();
+
+        for (const frame of frames) {
+          const eventLine = frame.split('\n').find((line) => line.startsWith('event: '));
+          const dataLine = frame.split('\n').find((line) => line.startsWith('data: '));
+          if (!eventLine || !dataLine) continue;
+          const event = eventLine.slice(7);
+          const data = JSON.parse(dataLine.slice(6));
+
+          if (event === 'token') {
+            replyText += data.text;
+            showBotMessage({ text: replyText });
+          } else if (event === 'error') {
+            // The reply failed; any fallback text arrived as tokens, the stored message follows in done
+            console.error('Reply failed:', data.detail);
+            if (!replyText) {
+              replyText = "I'm sorry, something went wrong. Please try again.";
+              showBotMessage({ text: replyText });
+            }
+          } else if (event === 'done') {
+            const botMessage = { text: data.response_text || replyText, timestamp: data.created_at };
+            // The audio URL may still be pending; it answers once the speech is synthesized
+            if (data.response_audio) {
+              botMessage.audio = {
+                url: data.response_audio.startsWith('/')
+                  ? `${API_URL}${data.response_audio}`
+                  : data.response_audio,
+                duration: 10,
+              };
+            }
+            showBotMessage(botMessage);
+          }
+        }
       }
-
-      setMessages((prev) => [...prev, botMessage]);
     } catch (err) {
       console.error('Message failed:', err);
       alert('Failed to send message');
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import {
   DocumentTextIcon,
@@ -20,6 +20,7 @@ const LabReports = () => {
   console.log('LabReports component loaded successfully!');
   const navigate = useNavigate();
   const [reports, setReports] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [analytics, setAnalytics] = useState(null);
   const [loading, setLoading] = useState(true);
   const [showUploadModal, setShowUploadModal] = useState(false);
@@ -33,6 +34,8 @@ const LabReports = () => {
     file: null
   });
   const [uploading, setUploading] = useState(false);
+  // Status streams of reports still being analyzed, by report id
+  const watchers = useRef({});
 
   // Authentication check
   useEffect(() => {
@@ -48,10 +51,84 @@ const LabReports = () => {
     fetchAnalytics();
   }, [navigate]);
 
-  const fetchReports = async () => {
+  // Close the status streams when leaving the page
+  useEffect(() => () => {
+    Object.values(watchers.current).forEach((watcher) => watcher.close());
+    watchers.current = {};
+  }, []);
+
+  const isPending = (status) => status === 'queued' || status === 'processing';
+
+  // Follow a queued report until its analysis finishes, then refresh it
+  const watchReport = (reportId, showWhenDone = false) => {
+    if (watchers.current[reportId]) return;
+
+    const finish = (payload) => {
+      stopWatching(reportId);
+      fetchReports();
+      fetchAnalytics();
+      if (payload.status === 'processed') {
+        if (showWhenDone) {
+          toast.success('Report analyzed successfully!');
+          viewReportDetails(reportId);
+        }
+      } else {
+        toast.error(`Analysis failed${payload.error ? `: ${payload.error}` : ''}`);
+      }
+    };
+
+    const update = (payload) => {
+      setReports((previous) => previous.map((report) => (
+        report.id === reportId ? { ...report, status: payload.status } : report
+      )));
+      if (!isPending(payload.status)) finish(payload);
+    };
+
+    // Polling fallback when the event stream is unavailable
+    const poll = () => {
+      const timer = setInterval(async () => {
+        try {
+          const response = await fetch(`${API_BASE_URL}/api/lab-reports/report/${reportId}/status`);
+          if (response.status === 404) {
+            stopWatching(reportId);
+          } else if (response.ok) {
+            update(await response.json());
+          }
+        } catch (error) {
+          console.error('Error polling report status:', error);
+        }
+      }, 2000);
+      watchers.current[reportId] = { close: () => clearInterval(timer) };
+    };
+
+    if (typeof EventSource === 'undefined') {
+      poll();
+      return;
+    }
+    const source = new EventSource(`${API_BASE_URL}/api/lab-reports/report/${reportId}/events`);
+    source.addEventListener('status', (event) => update(JSON.parse(event.data)));
+    source.addEventListener('deleted', () => stopWatching(reportId));
+    source.onerror = () => {
+      if (watchers.current[reportId] !== source) return;
+      source.close();
+      poll();
+    };
+    watchers.current[reportId] = source;
+  };
+
+  const stopWatching = (reportId) => {
+    const watcher = watchers.current[reportId];
+    if (watcher) {
+      watcher.close();
+      delete watchers.current[reportId];
+    }
+  };
+
+  const fetchReports = async (cursor = null) => {
     try {
       const token = localStorage.getItem('accessToken');
-      const response = await fetch(`${API_BASE_URL}/api/lab-reports/my-reports`, {
+      const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+      const response = await fetch(`${API_BASE_URL}/api/lab-reports/my-reports${query}`, {
         headers: {
           'Authorization': `Bearer ${token}`,
         },
@@ -59,7 +136,9 @@ const LabReports = () => {
 
       if (response.ok) {
         const data = await response.json();
-        setReports(data);
+        setReports(cursor ? (previous) => [...previous, ...data] : data);
+        setNextCursor(response.headers.get('X-Next-Cursor'));
+        data.filter((report) => isPending(report.status)).forEach((report) => watchReport(report.id));
       } else {
         toast.error('Failed to fetch reports');
       }
@@ -117,7 +196,7 @@ const LabReports = () => {
 
       if (response.ok) {
         const data = await response.json();
-        toast.success('Report uploaded and analyzed successfully!');
+        toast.success(isPending(data.status) ? 'Report uploaded and queued for analysis' : data.message);
         setShowUploadModal(false);
         setUploadForm({
           report_name: '',
@@ -130,8 +209,11 @@ const LabReports = () => {
         fetchReports();
         fetchAnalytics();
         
-        // Show analysis results
-        if (data.analysis_results && Array.isArray(data.analysis_results) && data.analysis_results.length > 0) {
+        if (isPending(data.status)) {
+          // Results are shown once the background analysis finishes
+          watchReport(data.report_id, true);
+        } else if (data.analysis_results && Array.isArray(data.analysis_results) && data.analysis_results.length > 0) {
+          // Duplicate of an analyzed report: results are already there
           setSelectedReport({
             ...data,
             analysis_results: data.analysis_results
@@ -183,6 +265,7 @@ const LabReports = () => {
       });
 
       if (response.ok) {
+        stopWatching(reportId);
         toast.success('Report deleted successfully');
         fetchReports();
         fetchAnalytics();
@@ -329,6 +412,13 @@ const LabReports = () => {
                         <p className="text-sm text-gray-600">Lab: {report.lab_name}</p>
                       )}
                     </div>
+                    {(isPending(report.status) || report.status === 'failed') && (
+                      <span className={`flex items-center gap-1 text-xs px-2 py-1 rounded-md border capitalize ${
+                        report.status === 'failed' ? 'text-red-600 bg-red-50 border-red-200' : getStatusColor(report.status)}`}>
+                        {isPending(report.status) && <ClockIcon className="h-4 w-4" />}
+                        {report.status}
+                      </span>
+                    )}
                   </div>
 
                   {/* Analysis Summary */}
@@ -375,6 +465,17 @@ const LabReports = () => {
               ))}
             </div>
           )}
+
+          {nextCursor && (
+            <div className="text-center mt-6">
+              <button
+                onClick={() => fetchReports(nextCursor)}
+                className="bg-blue-50 text-blue-600 px-6 py-2 rounded-xl hover:bg-blue-100 font-semibold"
+              >
+                Load More Reports
+              </button>
+            </div>
+          )}
         </div>
 
         {/* Upload Modal */}
@@ -451,12 +552,12 @@ const LabReports = () => {
                   </label>
                   <input
                     type="file"
-                    accept=".jpg,.jpeg,.png,.pdf"
+                    accept=".jpg,.jpeg,.png,.pdf,.txt"
                     onChange={(e) => setUploadForm({...uploadForm, file: e.target.files[0]})}
                     className="w-full p-3 border border-gray-300 rounded-lg focus:ring-blue-500 focus:border-blue-500"
                     required
                   />
-                  <p className="text-xs text-gray-500 mt-1">Supports JPG, PNG, PDF files</p>
+                  <p className="text-xs text-gray-500 mt-1">Supports JPG, PNG, PDF and TXT files</p>
                 </div>
 
                 <div>